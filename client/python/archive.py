@@ -0,0 +1,304 @@
+import os
+import glob
+import mmap
+import time
+import struct
+import zlib
+import hashlib
+import logging
+import argparse
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Segmented Audio/Transcript Archive ---
+# Chunks are appended as records to rotating segment files instead of two
+# tiny files per chunk. Each segment (<name>.seg) has a fixed-width index
+# (<name>.idx) that is loaded with one np.fromfile call, so finding every
+# record for a session or time range is a vectorized filter, and reading a
+# record is a single slice of a memory-mapped segment.
+#
+# Record layout (little-endian):
+#   header   RECORD_HEADER (see below)
+#   payload  session id | model name | raw text | processed text | int16 PCM
+# The CRC32 in the header covers the payload.
+
+RECORD_MAGIC = b'ARC1'
+RECORD_HEADER = struct.Struct('<4sIddIIHHIII')
+#   magic, seq, start_time, end_time, sample_rate, n_samples,
+#   session_len, model_len, raw_len, processed_len, crc32
+
+INDEX_DTYPE = np.dtype([
+    ('session_hash', '<u8'),
+    ('seq', '<u4'),
+    ('start_time', '<f8'),
+    ('end_time', '<f8'),
+    ('offset', '<u8'),
+    ('length', '<u4'),
+])
+
+
+def session_hash(session_id):
+    """Stable 64-bit key for a session id (the index stores this, not the string)."""
+    return int.from_bytes(hashlib.blake2b(session_id.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class ArchiveRecord:
+    """One archived chunk, as returned by ArchiveReader."""
+
+    __slots__ = ('session_id', 'seq', 'start_time', 'end_time', 'sample_rate',
+                 'model_name', 'raw_transcription', 'processed_transcription', 'audio')
+
+    def __init__(self, session_id, seq, start_time, end_time, sample_rate,
+                 model_name, raw_transcription, processed_transcription, audio):
+        self.session_id = session_id
+        self.seq = seq
+        self.start_time = start_time
+        self.end_time = end_time
+        self.sample_rate = sample_rate
+        self.model_name = model_name
+        self.raw_transcription = raw_transcription
+        self.processed_transcription = processed_transcription
+        self.audio = audio
+
+    def audio_float32(self):
+        return self.audio.astype(np.float32) / 32768.0
+
+
+def encode_record(session_id, seq, start_time, end_time, sample_rate, model_name,
+                  raw_transcription, processed_transcription, audio):
+    """Serialize one record; `audio` is float32 in [-1, 1] or int16."""
+    if audio.dtype != np.int16:
+        audio = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    session = session_id.encode('utf-8')
+    model = model_name.encode('utf-8')
+    raw = (raw_transcription or '').encode('utf-8')
+    processed = (processed_transcription or '').encode('utf-8')
+    payload = b''.join((session, model, raw, processed, audio.astype('<i2', copy=False).tobytes()))
+    header = RECORD_HEADER.pack(
+        RECORD_MAGIC, seq, start_time, end_time, sample_rate, len(audio),
+        len(session), len(model), len(raw), len(processed), zlib.crc32(payload)
+    )
+    return header + payload
+
+
+def decode_record(buffer, offset=0):
+    """Parse the record at `offset`; audio is a zero-copy int16 view of `buffer`."""
+    (magic, seq, start_time, end_time, sample_rate, n_samples,
+     session_len, model_len, raw_len, processed_len, crc) = RECORD_HEADER.unpack_from(buffer, offset)
+    if magic != RECORD_MAGIC:
+        raise ValueError(f"Bad archive record magic at offset {offset}: {magic!r}")
+
+    start = offset + RECORD_HEADER.size
+    text_len = session_len + model_len + raw_len + processed_len
+    end = start + text_len + n_samples * 2
+    if zlib.crc32(buffer[start:end]) != crc:
+        raise ValueError(f"Archive record at offset {offset} is corrupt (CRC mismatch)")
+
+    fields = []
+    position = start
+    for length in (session_len, model_len, raw_len, processed_len):
+        fields.append(bytes(buffer[position:position + length]).decode('utf-8'))
+        position += length
+    audio = np.frombuffer(buffer, dtype='<i2', count=n_samples, offset=position)
+
+    session_id, model_name, raw, processed = fields
+    return ArchiveRecord(session_id, seq, start_time, end_time, sample_rate,
+                         model_name, raw, processed or None, audio), end - offset
+
+
+class ArchiveStore:
+    """
+    Append-only writer used by BackgroundWriter (same write_batch/close API
+    as ChunkFileStore). A new segment is started at open, and whenever the
+    current one passes `max_segment_bytes` or `max_segment_age` seconds.
+    """
+
+    MAX_TRACKED_SESSIONS = 100000
+
+    def __init__(self, archive_dir, model_name='', max_segment_bytes=256 * 1024 * 1024,
+                 max_segment_age=3600):
+        self.archive_dir = archive_dir
+        self.model_name = model_name
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+        self._sequences = OrderedDict() # session_id -> next seq (LRU-bounded)
+        self._segment = None
+        self._index = None
+        self._segment_opened = 0.0
+        self._segment_count = 0
+
+    def _open_segment(self):
+        self._close_segment()
+        self._segment_count += 1
+        # Unique per process so several workers can share one directory
+        name = f"segment_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}_{self._segment_count:04d}"
+        base = os.path.join(self.archive_dir, name)
+        self._segment = open(base + '.seg', 'ab')
+        self._index = open(base + '.idx', 'ab')
+        self._segment_opened = time.monotonic()
+        logger.info("Writing archive segment %s.seg", base)
+
+    def _close_segment(self):
+        for f in (self._segment, self._index):
+            if f:
+                f.close()
+        self._segment = self._index = None
+
+    def _needs_rotation(self):
+        return (self._segment is None
+                or self._segment.tell() >= self.max_segment_bytes
+                or time.monotonic() - self._segment_opened >= self.max_segment_age)
+
+    def next_seq(self, session_id):
+        seq = self._sequences.pop(session_id, 0)
+        self._sequences[session_id] = seq + 1
+        if len(self._sequences) > self.MAX_TRACKED_SESSIONS:
+            self._sequences.popitem(last=False)
+        return seq
+
+    def write_batch(self, records, fsync=False):
+        if self._needs_rotation():
+            self._open_segment()
+
+        entries = np.zeros(len(records), dtype=INDEX_DTYPE)
+        for i, record in enumerate(records):
+            end_time = record.timestamp.timestamp()
+            start_time = end_time - len(record.audio) / record.sample_rate
+            seq = self.next_seq(record.session_id)
+            data = encode_record(
+                record.session_id, seq, start_time, end_time, record.sample_rate,
+                self.model_name, record.raw_transcription, record.processed_transcription,
+                record.audio
+            )
+            entries[i] = (session_hash(record.session_id), seq, start_time, end_time,
+                          self._segment.tell(), len(data))
+            self._segment.write(data)
+
+        # The index is only appended once the records it points at are written
+        self._segment.flush()
+        self._index.write(entries.tobytes())
+        self._index.flush()
+        if fsync:
+            os.fsync(self._segment.fileno())
+            os.fsync(self._index.fileno())
+
+    def close(self):
+        self._close_segment()
+
+
+class ArchiveReader:
+    """Random access to an archive directory by session and time range."""
+
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self._maps = {}
+
+    def segments(self):
+        return sorted(glob.glob(os.path.join(self.archive_dir, 'segment_*.seg')))
+
+    def load_index(self, segment_path):
+        index_path = segment_path[:-4] + '.idx'
+        if not os.path.exists(index_path):
+            return rebuild_index(segment_path)
+        # Ignore a partially written trailing entry
+        count = os.path.getsize(index_path) // INDEX_DTYPE.itemsize
+        return np.fromfile(index_path, dtype=INDEX_DTYPE, count=count)
+
+    def find(self, session_id=None, start_time=None, end_time=None):
+        """Return [(segment_path, index_entry), ...] overlapping the filters, in time order."""
+        matches = []
+        key = session_hash(session_id) if session_id is not None else None
+        for segment_path in self.segments():
+            index = self.load_index(segment_path)
+            mask = np.ones(len(index), dtype=bool)
+            if key is not None:
+                mask &= index['session_hash'] == key
+            if start_time is not None:
+                mask &= index['end_time'] >= start_time
+            if end_time is not None:
+                mask &= index['start_time'] <= end_time
+            matches.extend((segment_path, entry) for entry in index[mask])
+        matches.sort(key=lambda match: match[1]['start_time'])
+        return matches
+
+    def _map(self, segment_path):
+        mapped = self._maps.get(segment_path)
+        if mapped is None or len(mapped) < os.path.getsize(segment_path):
+            if mapped is not None:
+                _unmap(mapped) # The segment grew; map it again at its new size
+            with open(segment_path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment_path] = mapped
+        return mapped
+
+    def read(self, segment_path, entry):
+        """Decode one record; its audio is a view into the memory-mapped segment."""
+        record, _ = decode_record(self._map(segment_path), int(entry['offset']))
+        return record
+
+    def records(self, session_id=None, start_time=None, end_time=None):
+        """Iterate matching records; hash collisions are filtered by the stored session id."""
+        for segment_path, entry in self.find(session_id, start_time, end_time):
+            record = self.read(segment_path, entry)
+            if session_id is None or record.session_id == session_id:
+                yield record
+
+    def close(self):
+        for mapped in self._maps.values():
+            _unmap(mapped)
+        self._maps = {}
+
+
+def _unmap(mapped):
+    try:
+        mapped.close()
+    except BufferError:
+        pass # Audio views of this segment are still alive; GC closes it
+
+
+def rebuild_index(segment_path):
+    """Scan a segment and rebuild its index (e.g. after a crash lost the .idx)."""
+    entries = []
+    with open(segment_path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        try:
+            record, length = decode_record(data, offset)
+        except (ValueError, struct.error):
+            break # Truncated tail from an interrupted write
+        entries.append((session_hash(record.session_id), record.seq, record.start_time,
+                        record.end_time, offset, length))
+        offset += length
+    return np.array(entries, dtype=INDEX_DTYPE)
+
+
+# --- Main Entry Point ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="List or export records from an audio archive.")
+    parser.add_argument('archive_dir')
+    parser.add_argument('--session', help="Only this browserSocketId")
+    parser.add_argument('--start', type=float, help="Unix time lower bound")
+    parser.add_argument('--end', type=float, help="Unix time upper bound")
+    parser.add_argument('--export', help="Write matching audio as WAV files into this directory")
+    args = parser.parse_args()
+
+    reader = ArchiveReader(args.archive_dir)
+    if args.export:
+        import soundfile as sf
+        os.makedirs(args.export, exist_ok=True)
+
+    for record in reader.records(args.session, args.start, args.end):
+        started = datetime.fromtimestamp(record.start_time)
+        print(f"{started:%Y-%m-%d %H:%M:%S} {record.session_id} #{record.seq} "
+              f"[{record.model_name}] {len(record.audio) / record.sample_rate:.1f}s: {record.raw_transcription}")
+        if args.export and len(record.audio):
+            path = os.path.join(args.export, f"{record.session_id}_{record.seq:06d}.wav")
+            sf.write(path, record.audio, record.sample_rate)
+    reader.close()
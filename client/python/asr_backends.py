@@ -0,0 +1,701 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import numpy as np
+import soundfile as sf
+
+from devices import DeviceConfig
+from sessions import SessionPool
+from whisper_streaming import RollingTranscriber
+
+# --- ASR Backends ---
+# Each backend wraps one model family behind the same small interface so the
+# worker engine never has to know which library it is talking to. Heavy
+# imports (torch, whisper, transformers, nemo, vosk) happen inside load(),
+# so only the selected backend's stack is ever imported.
+
+SAMPLE_RATE = 16000
+
+# Frontend language modes -> ISO codes understood by Whisper-style models.
+# 'malay-english' is deliberately absent: no hint lets the model auto-detect,
+# which works best for code-switching.
+LANGUAGE_CODES = {
+    'english-only': 'en',
+    'malay-only': 'ms',
+}
+
+
+def synthetic_audio(seconds=1.0, seed=0):
+    """
+    Deterministic speech-like signal for warm-up: a voiced harmonic stack with
+    a gliding pitch, syllable-rate amplitude modulation and a little noise.
+    Unlike silence it is not short-circuited by no-speech detection, so the
+    decoder, tokenizer and attention kernels all get exercised.
+    """
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    f0 = 140 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t)) # ~4 syllables per second
+    noise = np.random.default_rng(seed).standard_normal(len(t)) * 0.01
+    return (0.1 * voiced * envelope + noise).astype(np.float32)
+
+
+def merge_counters(stats_list):
+    """Sum stats dicts key by key (nested dicts are merged the same way)."""
+    merged = {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                merged[key] = merge_counters([merged.get(key, {}), value])
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+class ASRBackend:
+    """Base class: load once, then transcribe 16kHz mono float32 chunks."""
+
+    name = "base"
+    # Streaming backends keep decoder state per session and are driven
+    # through transcribe_stream()/end_session() instead of transcribe()
+    streaming = False
+    # Resolved device/precision (devices.DeviceConfig) once a torch backend is loaded
+    config = None
+    # Memory each streaming session preallocates (0 when none or not known)
+    session_bytes = 0
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.model = None
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def import_modules(self):
+        """Import the backend's libraries (split out so boot() can time it)."""
+
+    def load(self):
+        """Import the backend's libraries and load the model weights."""
+        raise NotImplementedError
+
+    def transcribe(self, audio, language_mode='malay-english'):
+        """Transcribe one chunk and return the raw text."""
+        raise NotImplementedError
+
+    def transcribe_batch(self, audios, language_modes):
+        """Transcribe several chunks. Backends override this when they can batch."""
+        return [self.transcribe(audio, mode) for audio, mode in zip(audios, language_modes)]
+
+    def transcribe_stream(self, session_id, audio, language_mode='malay-english'):
+        """Feed one chunk of a session; return [(text, is_final), ...] available so far."""
+        raise NotImplementedError
+
+    def end_session(self, session_id):
+        """Flush and forget a session; return [(text, is_final), ...] still pending."""
+        return []
+
+    def evict_idle(self):
+        """Flush sessions idle past their timeout; return [(session_id, language_mode, results)]."""
+        return []
+
+    def limit_sessions(self, max_sessions, idle_timeout=None):
+        """
+        Cap the streaming sessions kept alive (least recently used are evicted
+        and flushed) and, if given, align their idle timeout with the caller's.
+        """
+        sessions = getattr(self, 'sessions', None)
+        if sessions is not None:
+            sessions.max_sessions = max_sessions
+            if idle_timeout is not None:
+                sessions.idle_timeout = idle_timeout
+
+    def warm_up(self, seconds=1.0, passes=1, batch_size=1):
+        """
+        Run `passes` inferences on synthetic audio so the first real chunk
+        doesn't pay for lazy kernel init, tokenizer setup and allocator
+        growth. With batch_size > 1 the batched path is warmed up too.
+        """
+        audio = synthetic_audio(seconds)
+        for _ in range(passes):
+            self.transcribe(audio)
+            if batch_size > 1:
+                self.transcribe_batch([audio] * batch_size, ['malay-english'] * batch_size)
+
+    def boot(self, warm_up_passes=1, warm_up_seconds=1.0, batch_size=1):
+        """Import, load and warm up; returns the seconds spent in each phase."""
+        timings = {}
+        started = time.perf_counter()
+        self.import_modules()
+        timings['import'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        self.load()
+        timings['load'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        if warm_up_passes > 0:
+            self.warm_up(warm_up_seconds, warm_up_passes, batch_size)
+        timings['warm_up'] = time.perf_counter() - started
+        return timings
+
+    def close(self):
+        """Release connections/threads held by the backend (called on shutdown)."""
+
+    def register_metrics(self, metrics, stats=None):
+        """
+        Add backend-specific gauges to the worker's WorkerMetrics. Gauges read
+        `stats()` (self.stats by default; a ReplicaPool passes its replicas'
+        combined counters).
+        """
+
+    def stats(self):
+        """Backend-specific counters for the worker's stats() ({} when there are none)."""
+        return {}
+
+    def merge_stats(self, stats_list):
+        """Combine stats() from several copies of this backend (ReplicaPool replicas)."""
+        return merge_counters(stats_list)
+
+    def describe(self):
+        return f"{self.name}:{self.model_name}"
+
+    def runtime_info(self):
+        """Device/precision/threads for the worker banner ('' when not applicable)."""
+        return self.config.describe() if self.config else ''
+
+    def cache_scope(self):
+        """What a transcript depends on besides the audio: the model and the device/precision it runs at."""
+        if self.config is None:
+            return self.describe()
+        return f"{self.describe()}@{self.config.device}/{self.config.precision}"
+
+
+class WhisperBackend(ASRBackend):
+    """
+    openai-whisper models (tiny/base/medium/large).
+
+    With streaming=True each session gets a rolling audio buffer that is
+    re-transcribed with overlap, committing only the words that two
+    consecutive windows agree on (see whisper_streaming.py).
+    """
+
+    name = "whisper"
+
+    def __init__(self, model_name="base", device=None, streaming=False,
+                 max_buffer=15.0, overlap=1.0, idle_timeout=30.0, precision=None):
+        super().__init__(model_name)
+        self.device = device
+        self.precision = precision
+        self.streaming = streaming
+        if streaming:
+            self.rolling = RollingTranscriber(self._transcribe_words, SAMPLE_RATE, max_buffer, overlap)
+            self.sessions = SessionPool(lambda session_id: self.rolling.new_session(), idle_timeout=idle_timeout)
+            self.session_bytes = self.rolling.capacity * np.dtype(np.float32).itemsize
+
+    def import_modules(self):
+        import whisper # noqa: F401
+
+    def load(self):
+        import whisper
+        self.config = DeviceConfig(self.device, self.precision)
+        model = whisper.load_model(self.model_name, device=self.config.device)
+        self.model = self.config.prepare(model)
+
+    def _options(self, language_mode):
+        # fp16 decoding only on GPU; whisper warns and falls back otherwise
+        options = {'fp16': self.config.precision == 'float16'}
+        if language_mode in LANGUAGE_CODES:
+            options['language'] = LANGUAGE_CODES[language_mode]
+        return options
+
+    def transcribe(self, audio, language_mode='malay-english'):
+        return self.transcribe_scored(audio, language_mode)[0]
+
+    def transcribe_scored(self, audio, language_mode='malay-english'):
+        """(text, segments) where each segment has start/end, avg_logprob, compression_ratio and no_speech_prob."""
+        with self.config.autocast():
+            result = self.model.transcribe(audio, **self._options(language_mode))
+        return result.get('text', '').strip(), result.get('segments', [])
+
+    def _transcribe_words(self, audio, prompt, language_mode):
+        with self.config.autocast():
+            result = self.model.transcribe(
+                audio,
+                initial_prompt=prompt or None,
+                word_timestamps=True,
+                condition_on_previous_text=False,
+                **self._options(language_mode)
+            )
+        return [
+            (word['start'], word['end'], word['word'])
+            for segment in result.get('segments', [])
+            for word in segment.get('words', [])
+        ]
+
+    def transcribe_stream(self, session_id, audio, language_mode='malay-english'):
+        session = self.sessions.get(session_id)
+        with session.lock:
+            session.language_mode = language_mode
+            committed, tentative = self.rolling.feed(session, audio)
+
+        results = []
+        if committed:
+            results.append((committed, True))
+        if tentative:
+            results.append((tentative, False))
+        return results
+
+    def _flush(self, session):
+        with session.lock:
+            text = self.rolling.flush(session)
+        return [(text, True)] if text else []
+
+    def end_session(self, session_id):
+        session = self.sessions.pop(session_id)
+        return self._flush(session) if session else []
+
+    def evict_idle(self):
+        return [
+            (session_id, session.language_mode, self._flush(session))
+            for session_id, session in self.sessions.evict_idle()
+        ]
+
+
+class HFPipelineBackend(ASRBackend):
+    """Hugging Face 'automatic-speech-recognition' pipelines (e.g. mesolitica Whisper)."""
+
+    name = "hf-pipeline"
+
+    def __init__(self, model_name, device=None, torch_dtype=None, precision=None):
+        super().__init__(model_name)
+        self.device = device
+        # torch_dtype is the older name for precision ("float16", ...)
+        self.precision = precision or torch_dtype
+
+    def import_modules(self):
+        import torch # noqa: F401
+        from transformers import pipeline # noqa: F401
+
+    def load(self):
+        from transformers import pipeline
+        self.config = DeviceConfig(self.device, self.precision)
+        self.model = pipeline(
+            "automatic-speech-recognition",
+            model=self.model_name,
+            device=self.config.device,
+            torch_dtype=self.config.torch_dtype
+        )
+        self.model.model = self.config.prepare(self.model.model)
+
+    @staticmethod
+    def _generate_kwargs(language_mode):
+        generate_kwargs = {}
+        if language_mode in LANGUAGE_CODES:
+            generate_kwargs['language'] = LANGUAGE_CODES[language_mode]
+        return generate_kwargs
+
+    def transcribe(self, audio, language_mode='malay-english'):
+        result = self.model(audio, generate_kwargs=self._generate_kwargs(language_mode))
+        return result.get('text', '').strip()
+
+    def transcribe_batch(self, audios, language_modes):
+        # generate_kwargs apply to the whole call, so batch per language mode
+        texts = [None] * len(audios)
+        by_mode = {}
+        for index, mode in enumerate(language_modes):
+            by_mode.setdefault(mode, []).append(index)
+
+        for mode, indices in by_mode.items():
+            results = self.model(
+                [audios[i] for i in indices],
+                batch_size=len(indices),
+                generate_kwargs=self._generate_kwargs(mode)
+            )
+            for i, result in zip(indices, results):
+                texts[i] = result.get('text', '').strip()
+        return texts
+
+
+class Wav2Vec2Backend(ASRBackend):
+    """
+    Wav2Vec2 CTC models (English only).
+
+    Audio is cut into `chunk_seconds` windows overlapping by `stride_seconds`
+    on each side, so attention memory is bounded whatever the clip length.
+    Windows from every input of a call are sorted by length and run
+    `batch_size` at a time (padded, with an attention mask when the model
+    uses one). The logit frames inside the strides are dropped, the
+    remaining argmax ids stitched per input, and everything is decoded in
+    one batch_decode call.
+    """
+
+    name = "wav2vec2"
+
+    def __init__(self, model_name="facebook/wav2vec2-base-960h", device=None, torch_dtype=None, precision=None,
+                 chunk_seconds=20.0, stride_seconds=2.0, batch_size=8):
+        super().__init__(model_name)
+        self.device = device
+        # torch_dtype is the older name for precision ("float16", ...)
+        self.precision = precision or torch_dtype
+        self.processor = None
+        self.chunk_samples = int(chunk_seconds * SAMPLE_RATE)
+        self.stride_samples = int(stride_seconds * SAMPLE_RATE)
+        if self.chunk_samples <= 2 * self.stride_samples:
+            raise ValueError("chunk_seconds must be more than twice stride_seconds")
+        self.batch_size = batch_size
+
+    def import_modules(self):
+        import torch # noqa: F401
+        from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor # noqa: F401
+
+    def load(self):
+        import torch
+        from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+        self._torch = torch
+        self.config = DeviceConfig(self.device, self.precision)
+        self._dtype = self.config.torch_dtype
+        self.processor = Wav2Vec2Processor.from_pretrained(self.model_name)
+        # Models with group norm (e.g. base-960h) must not get a mask, only zero padding
+        self._use_mask = self.processor.feature_extractor.return_attention_mask
+        model = Wav2Vec2ForCTC.from_pretrained(self.model_name).to(self._dtype).to(self.config.device)
+        self.model = self.config.prepare(model.eval())
+
+    def windows(self, length):
+        """(start, end, left stride, right stride) covering `length` samples."""
+        if length <= self.chunk_samples:
+            return [(0, length, 0, 0)] if length else []
+        step = self.chunk_samples - 2 * self.stride_samples
+        windows = []
+        for start in range(0, length, step):
+            end = min(start + self.chunk_samples, length)
+            left = self.stride_samples if start > 0 else 0
+            right = self.stride_samples if end < length else 0
+            windows.append((start, end, left, right))
+            if end == length:
+                break
+        return windows
+
+    def _forward(self, segments):
+        """Argmax ids per segment for one padded batch, trimmed to each segment's frames."""
+        torch = self._torch
+        inputs = self.processor(segments, sampling_rate=SAMPLE_RATE, return_tensors="pt",
+                                padding=True, return_attention_mask=self._use_mask)
+        input_values = inputs.input_values.to(self._dtype).to(self.config.device)
+        attention_mask = inputs.attention_mask.to(self.config.device) if self._use_mask else None
+
+        with torch.no_grad(), self.config.autocast():
+            logits = self.model(input_values, attention_mask=attention_mask).logits
+        ids = torch.argmax(logits, dim=-1).cpu().numpy()
+        lengths = self.model._get_feat_extract_output_lengths(torch.tensor([len(segment) for segment in segments]))
+        return [row[:int(frames)] for row, frames in zip(ids, lengths)]
+
+    def transcribe(self, audio, language_mode='english-only'):
+        return self.transcribe_batch([audio], [language_mode])[0]
+
+    def transcribe_batch(self, audios, language_modes):
+        # Every window of every input, longest first so each batch pads little
+        pieces = [
+            (index, order, window)
+            for index, audio in enumerate(audios)
+            for order, window in enumerate(self.windows(len(audio)))
+        ]
+        pieces.sort(key=lambda piece: piece[2][1] - piece[2][0], reverse=True)
+
+        stitched = [[] for _ in audios]
+        for first in range(0, len(pieces), self.batch_size):
+            batch = pieces[first:first + self.batch_size]
+            segments = [audios[index][start:end] for index, _, (start, end, _, _) in batch]
+            for (index, order, (start, end, left, right)), ids in zip(batch, self._forward(segments)):
+                # Drop the frames that belong to the overlap with a neighbouring window
+                frames_per_sample = len(ids) / (end - start)
+                first_frame = int(round(left * frames_per_sample))
+                last_frame = len(ids) - int(round(right * frames_per_sample))
+                stitched[index].append((order, ids[first_frame:last_frame]))
+
+        sequences = [
+            np.concatenate([ids for _, ids in sorted(parts, key=lambda part: part[0])])
+            if parts else np.zeros(0, dtype=np.int64)
+            for parts in stitched
+        ]
+        # Wav2Vec models output in ALL CAPS
+        return [text.lower() for text in self.processor.batch_decode(sequences)]
+
+
+class _VoskStream:
+    """One session's recognizer; Kaldi recognizers are not thread-safe."""
+
+    __slots__ = ('recognizer', 'language_mode', 'lock')
+
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+        self.language_mode = 'malay-english'
+        self.lock = threading.Lock()
+
+
+class VoskBackend(ASRBackend):
+    """
+    Vosk/Kaldi offline models with one persistent recognizer per session.
+
+    Recognizers keep acoustic and decoder context across chunks, so an
+    utterance that crosses a chunk boundary is decoded as one. Finished
+    utterances are returned as final results and the in-progress hypothesis
+    as a partial; the tail is flushed when the session ends or goes idle.
+    """
+
+    name = "vosk"
+    streaming = True
+
+    # Feed audio in ~0.25s blocks so several utterances in one chunk each
+    # produce their own final result
+    BLOCK_SAMPLES = 4000
+
+    def __init__(self, model_name="vosk-model-small-en-us-0.15", idle_timeout=30.0, max_sessions=1000):
+        super().__init__(model_name)
+        self.sessions = SessionPool(self._new_stream, idle_timeout=idle_timeout, max_sessions=max_sessions)
+
+    def import_modules(self):
+        import vosk # noqa: F401
+
+    def load(self):
+        if not os.path.exists(self.model_name):
+            raise FileNotFoundError(
+                f"Vosk model not found at '{self.model_name}'. "
+                "Download one from https://alphacephei.com/vosk/models and unpack it here."
+            )
+        from vosk import Model, KaldiRecognizer
+        self._recognizer_cls = KaldiRecognizer
+        self.model = Model(self.model_name)
+
+    def _new_stream(self, session_id):
+        return _VoskStream(self._recognizer_cls(self.model, SAMPLE_RATE))
+
+    @staticmethod
+    def _to_int16(audio):
+        # Vosk prefers Int16 PCM
+        return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+    def _feed(self, recognizer, audio):
+        """Accept audio block by block; return ([final texts], partial text)."""
+        finals = []
+        pcm = self._to_int16(audio)
+        for start in range(0, len(pcm), self.BLOCK_SAMPLES):
+            if recognizer.AcceptWaveform(pcm[start:start + self.BLOCK_SAMPLES].tobytes()):
+                text = json.loads(recognizer.Result()).get('text', '')
+                if text:
+                    finals.append(text)
+        return finals, json.loads(recognizer.PartialResult()).get('partial', '')
+
+    @staticmethod
+    def _flush(stream):
+        with stream.lock:
+            text = json.loads(stream.recognizer.FinalResult()).get('text', '')
+        return [(text, True)] if text else []
+
+    def transcribe(self, audio, language_mode='malay-english'):
+        # Stateless one-shot decode (warm-up, batch jobs): keep the tail too
+        recognizer = self._recognizer_cls(self.model, SAMPLE_RATE)
+        finals, _ = self._feed(recognizer, audio)
+        tail = json.loads(recognizer.FinalResult()).get('text', '')
+        return ' '.join(finals + ([tail] if tail else []))
+
+    def transcribe_stream(self, session_id, audio, language_mode='malay-english'):
+        stream = self.sessions.get(session_id)
+        with stream.lock:
+            stream.language_mode = language_mode
+            finals, partial = self._feed(stream.recognizer, audio)
+
+        results = [(text, True) for text in finals]
+        if partial:
+            results.append((partial, False))
+        return results
+
+    def end_session(self, session_id):
+        stream = self.sessions.pop(session_id)
+        return self._flush(stream) if stream else []
+
+    def evict_idle(self):
+        return [
+            (session_id, stream.language_mode, self._flush(stream))
+            for session_id, stream in self.sessions.evict_idle()
+        ]
+
+
+class NemoBackend(ASRBackend):
+    """NVIDIA NeMo CTC models."""
+
+    name = "nemo"
+
+    # - 'stt_en_conformer_ctc_small'  (fastest, lower accuracy)
+    # - 'stt_en_conformer_ctc_medium' (balanced)
+    # - 'stt_en_conformer_ctc_large'  (slowest, highest accuracy)
+    def __init__(self, model_name="stt_en_conformer_ctc_small", device=None, precision=None):
+        super().__init__(model_name)
+        self.device = device
+        self.precision = precision
+
+    def import_modules(self):
+        import nemo.collections.asr # noqa: F401
+
+    def load(self):
+        import nemo.collections.asr as nemo_asr
+        self.config = DeviceConfig(self.device, self.precision)
+        model = nemo_asr.models.EncDecCTCModel.from_pretrained(model_name=self.model_name)
+        # Weights stay fp32; half/bf16 precision runs under autocast instead
+        self.model = self.config.prepare(model.to(self.config.device).eval())
+
+    def transcribe(self, audio, language_mode='english-only'):
+        return self.transcribe_batch([audio], [language_mode])[0]
+
+    def transcribe_batch(self, audios, language_modes):
+        # NeMo transcribes from files, so stage the chunks as temporary WAVs
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for index, audio in enumerate(audios):
+                path = os.path.join(temp_dir, f"chunk_{index}.wav")
+                sf.write(path, audio, SAMPLE_RATE)
+                paths.append(path)
+            with self.config.autocast():
+                transcriptions = self.model.transcribe(paths2audio_files=paths, batch_size=len(paths))
+        return [text.strip() for text in transcriptions]
+
+
+class WhisperServerBackend(ASRBackend):
+    """
+    whisper.cpp `whisper-server` instances over HTTP (ggml/quantized models).
+
+    `model_name` is a comma-separated list of server URLs, e.g.
+    "http://127.0.0.1:8011,http://127.0.0.1:8012". Batches are fanned out
+    over the instances concurrently; see whisper_server.py for pooling,
+    balancing and ejection.
+    """
+
+    name = "whisper-server"
+
+    def __init__(self, model_name="http://127.0.0.1:8011", timeout=30.0, max_idle=4,
+                 max_failures=3, eject_seconds=10.0, health_interval=5.0, temperature=0.0):
+        super().__init__(model_name)
+        self.urls = [url.strip() for url in model_name.split(',') if url.strip()]
+        self.options = dict(timeout=timeout, max_idle=max_idle, max_failures=max_failures,
+                            eject_seconds=eject_seconds, health_interval=health_interval)
+        self.temperature = temperature
+        self.executor = None
+
+    def load(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from whisper_server import WhisperServerPool
+        pool = WhisperServerPool(self.urls, **self.options)
+        if not any(pool.check_all()):
+            pool.close()
+            raise ConnectionError(f"No whisper-server answered /health at {', '.join(self.urls)}")
+        pool.start()
+        # Enough threads to keep every instance's pooled connections busy
+        self.executor = ThreadPoolExecutor(max_workers=len(self.urls) * self.options['max_idle'],
+                                           thread_name_prefix="whisper-server")
+        self.model = pool
+
+    def transcribe(self, audio, language_mode='malay-english'):
+        from whisper_server import encode_wav, encode_multipart, parse_inference
+        # No language field for mixed speech: the server's own -l setting applies
+        fields = {'response_format': 'json', 'temperature': self.temperature}
+        if language_mode in LANGUAGE_CODES:
+            fields['language'] = LANGUAGE_CODES[language_mode]
+        body, content_type = encode_multipart(fields, 'file', 'chunk.wav', encode_wav(audio, SAMPLE_RATE))
+        data = self.model.post('/inference', body, {'Content-Type': content_type})
+        return parse_inference(data)
+
+    def transcribe_batch(self, audios, language_modes):
+        if len(audios) == 1:
+            return [self.transcribe(audios[0], language_modes[0])]
+        return list(self.executor.map(self.transcribe, audios, language_modes))
+
+    def runtime_info(self):
+        if not self.loaded:
+            return ''
+        status = self.model.status()
+        return f"{sum(healthy for _, healthy, _, _ in status)}/{len(status)} servers healthy"
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=False)
+        if self.model:
+            self.model.close()
+
+
+class FakeBackend(ASRBackend):
+    """
+    Deterministic stand-in model for benchmarks and CPU-only testing.
+
+    Needs no downloads: each call sleeps for `overhead` seconds plus `rtf`
+    times the audio duration (a batch pays the overhead once, like a real
+    batched forward pass), then returns words derived from a hash of the
+    audio, so the same chunk always gives the same text.
+    """
+
+    name = "fake"
+    WORDS = ('saya', 'nak', 'pergi', 'meeting', 'esok', 'pagi', 'okay', 'terima',
+             'kasih', 'the', 'report', 'dah', 'siap', 'boleh', 'check', 'lah')
+
+    def __init__(self, model_name="fake", rtf=0.05, overhead=0.01, words_per_second=2.0):
+        super().__init__(model_name)
+        self.rtf = rtf
+        self.overhead = overhead
+        self.words_per_second = words_per_second
+
+    def load(self):
+        self.model = self.name
+
+    def _text(self, audio):
+        count = int(len(audio) / SAMPLE_RATE * self.words_per_second)
+        if not count:
+            return ''
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        digest = hashlib.blake2b(pcm.tobytes(), digest_size=32).digest()
+        return ' '.join(self.WORDS[digest[i % len(digest)] % len(self.WORDS)] for i in range(count))
+
+    def transcribe(self, audio, language_mode='malay-english'):
+        return self.transcribe_batch([audio], [language_mode])[0]
+
+    def transcribe_batch(self, audios, language_modes):
+        seconds = sum(len(audio) for audio in audios) / SAMPLE_RATE
+        time.sleep(self.overhead + self.rtf * seconds)
+        return [self._text(audio) for audio in audios]
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    HFPipelineBackend.name: HFPipelineBackend,
+    Wav2Vec2Backend.name: Wav2Vec2Backend,
+    VoskBackend.name: VoskBackend,
+    NemoBackend.name: NemoBackend,
+    WhisperServerBackend.name: WhisperServerBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+# Backends whose constructor takes device= and precision= (torch-based models)
+DEVICE_BACKENDS = ('whisper', 'hf-pipeline', 'wav2vec2', 'nemo')
+
+
+def create_backend(name, **kwargs):
+    """Build a backend by registry name, e.g. create_backend('whisper', model_name='tiny')."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
+
+
+def backend_from_spec(spec, device=None, precision=None):
+    """Build a backend from 'name[:model]', e.g. 'whisper:tiny' or 'hf-pipeline:mesolitica/whisper-tiny-ms-en'."""
+    name, _, model = spec.partition(':')
+    kwargs = {}
+    if model:
+        kwargs['model_name'] = model
+    if name in DEVICE_BACKENDS:
+        if device:
+            kwargs['device'] = device
+        if precision:
+            kwargs['precision'] = precision
+    return create_backend(name, **kwargs)
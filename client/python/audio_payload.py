@@ -0,0 +1,81 @@
+import struct
+import numpy as np
+
+# --- Binary Audio Frame Format ---
+# Browsers/relays can send raw PCM as a Socket.IO binary attachment in
+# data['audioFrame'] instead of a JSON list in data['audioFloat32'].
+#
+#   offset  size  field
+#   0       4     magic b'PCM1'
+#   4       4     sample rate (uint32, little-endian)
+#   8       1     dtype code (1 = float32, 2 = int16)
+#   9       1     channel count (interleaved when > 1)
+#   10      2     reserved (zero)
+#   12      ...   little-endian samples
+FRAME_MAGIC = b'PCM1'
+FRAME_HEADER = struct.Struct('<4sIBBH')
+DEFAULT_SAMPLE_RATE = 16000
+
+# Capture rates browsers actually use. Anything else is refused rather than
+# resampled: each new rate pair designs (and caches) its own filter bank,
+# which for a rate like 47999 is enormous.
+SUPPORTED_SAMPLE_RATES = frozenset({8000, 16000, 22050, 24000, 32000, 44100, 48000})
+
+DTYPE_CODES = {
+    1: np.dtype('<f4'),
+    2: np.dtype('<i2'),
+}
+DTYPE_NAMES = {dtype: code for code, dtype in DTYPE_CODES.items()}
+
+
+def encode_audio_frame(samples, sample_rate=DEFAULT_SAMPLE_RATE, channels=1):
+    """Pack a float32 or int16 array into a binary audio frame."""
+    samples = np.asarray(samples)
+    dtype = samples.dtype.newbyteorder('<')
+    if dtype not in DTYPE_NAMES:
+        raise ValueError(f"Unsupported sample dtype: {samples.dtype}")
+    header = FRAME_HEADER.pack(FRAME_MAGIC, sample_rate, DTYPE_NAMES[dtype], channels, 0)
+    return header + samples.astype(dtype, copy=False).tobytes()
+
+
+def check_sample_rate(sample_rate):
+    """Raise ValueError unless `sample_rate` is one of SUPPORTED_SAMPLE_RATES."""
+    if sample_rate not in SUPPORTED_SAMPLE_RATES:
+        raise ValueError(f"Unsupported audio sample rate: {sample_rate}")
+
+
+def _parse_frame(frame):
+    """Return (samples, sample_rate, channels) as a zero-copy view of the frame."""
+    if len(frame) < FRAME_HEADER.size:
+        raise ValueError("Audio frame is shorter than its header")
+
+    magic, sample_rate, dtype_code, channels, _ = FRAME_HEADER.unpack_from(frame)
+    if magic != FRAME_MAGIC:
+        raise ValueError(f"Bad audio frame magic: {magic!r}")
+    if dtype_code not in DTYPE_CODES:
+        raise ValueError(f"Unknown audio frame dtype code: {dtype_code}")
+    if channels < 1:
+        raise ValueError("Audio frame declares zero channels")
+    check_sample_rate(sample_rate)
+
+    dtype = DTYPE_CODES[dtype_code]
+    body = len(frame) - FRAME_HEADER.size
+    if body % (dtype.itemsize * channels):
+        raise ValueError("Audio frame body is not a whole number of samples")
+
+    samples = np.frombuffer(frame, dtype=dtype, offset=FRAME_HEADER.size)
+    return samples, sample_rate, channels
+
+
+def read_audio_payload(data):
+    """
+    (samples, sample_rate, channels) of an 'audio_to_python' payload, as sent:
+    a zero-copy view of the binary 'audioFrame', or the JSON 'audioFloat32'
+    list with its 'sampleRate'/'channels' fields.
+    """
+    frame = data.get('audioFrame')
+    if frame is not None:
+        return _parse_frame(frame)
+    samples = np.asarray(data['audioFloat32'], dtype=np.float32)
+    return samples, int(data.get('sampleRate') or DEFAULT_SAMPLE_RATE), int(data.get('channels') or 1)
+
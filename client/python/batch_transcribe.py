@@ -0,0 +1,234 @@
+import os
+import glob
+import json
+import time
+import argparse
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import soundfile as sf
+
+from archive import ArchiveReader
+from asr_backends import SAMPLE_RATE, backend_from_spec
+from preprocess import resample
+from language_tagging import tag_spans
+
+# --- Batch Re-transcription ---
+# Re-runs stored audio through any worker backend, outside the live socket
+# path. Sources are archive directories (segment_*.seg) and directories of
+# audio files (audio_uploads, audio_uploads_flac, audio_uploads_vosk).
+#
+#   python batch_transcribe.py audio_uploads audio_uploads_flac \
+#       --backend hf-pipeline:mesolitica/whisper-medium-ms-en --workers 2 \
+#       --batch-size 16 --manifest retranscribe.jsonl
+#
+# Items are sorted by duration and batched with neighbours of similar
+# length (little padding waste), then spread over a process pool where each
+# process loads the model once. Every finished batch is appended to the JSON
+# lines manifest and fsynced; a rerun skips keys the same backend, device
+# and precision already have in the manifest, so an interrupted run resumes
+# where it stopped (and a run with other settings transcribes everything
+# again).
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg')
+
+# kind is 'archive' (path = segment, start = record offset) or
+# 'file' (path = audio file, start/frames = window in source frames)
+Item = namedtuple('Item', 'key kind path start frames duration')
+
+
+def scan(paths, max_seconds=30.0):
+    """Yield an Item per archived chunk / per max_seconds window of each audio file."""
+    for root in paths:
+        reader = ArchiveReader(root)
+        segments = reader.segments() if os.path.isdir(root) else []
+        for segment in segments:
+            index = reader.load_index(segment)
+            durations = index['end_time'] - index['start_time']
+            name = os.path.basename(segment)
+            for entry, duration in zip(index, durations):
+                if duration > 0: # Flushed streaming results carry no audio
+                    yield Item(f"{name}@{int(entry['offset'])}", 'archive', segment,
+                               int(entry['offset']), 0, float(duration))
+
+        # Archive segments share audio_uploads with the older per-chunk files
+        files = [root] if os.path.isfile(root) else sorted(
+            path for path in glob.glob(os.path.join(root, '**', '*'), recursive=True)
+            if path.lower().endswith(AUDIO_EXTENSIONS)
+        )
+        for path in files:
+            try:
+                info = sf.info(path)
+            except RuntimeError as e:
+                print(f"⚠️ Skipping unreadable file {path}: {e}")
+                continue
+            window = int(max_seconds * info.samplerate)
+            for start in range(0, info.frames, window):
+                frames = min(window, info.frames - start)
+                yield Item(f"{os.path.abspath(path)}@{start}", 'file', path, start, frames,
+                           frames / info.samplerate)
+
+
+def make_batches(items, batch_size=8, max_batch_seconds=240.0):
+    """Group duration-sorted items into batches of similar length, longest first."""
+    batches, current, seconds = [], [], 0.0
+    for item in sorted(items, key=lambda item: item.duration, reverse=True):
+        if current and (len(current) >= batch_size or seconds + item.duration > max_batch_seconds):
+            batches.append(current)
+            current, seconds = [], 0.0
+        current.append(item)
+        seconds += item.duration
+    if current:
+        batches.append(current)
+    return batches
+
+
+def run_settings(backend_name, device=None, precision=None):
+    """What a manifest entry records about how it was produced (device/precision as requested)."""
+    return {'model': backend_name, 'device': device or 'auto', 'precision': precision or 'auto'}
+
+
+def load_manifest(path, settings):
+    """Keys already transcribed with `settings` (a torn last line from a crash is ignored)."""
+    done = set()
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    # Entries from before device/precision were recorded count as 'auto'
+                    if all(entry.get(field, 'auto') == value for field, value in settings.items()):
+                        done.add(entry['key'])
+                except (ValueError, KeyError):
+                    continue
+    return done
+
+
+# --- Pool Worker Process ---
+_backend = None
+_readers = {}
+
+
+def _init_worker(spec, device, precision):
+    global _backend
+    _backend = backend_from_spec(spec, device, precision)
+    _backend.load()
+    _backend.warm_up()
+
+
+def _load_audio(item):
+    """Read one item as 16kHz mono float32 (archive via mmap, files by seeking)."""
+    if item.kind == 'archive':
+        directory = os.path.dirname(item.path)
+        reader = _readers.get(directory)
+        if reader is None:
+            reader = _readers[directory] = ArchiveReader(directory)
+        record = reader.read(item.path, {'offset': item.start})
+        audio, sample_rate = record.audio_float32(), record.sample_rate
+    else:
+        with sf.SoundFile(item.path) as f:
+            f.seek(item.start)
+            audio = f.read(item.frames, dtype='float32', always_2d=True).mean(axis=1)
+            sample_rate = f.samplerate
+    return resample(audio, sample_rate, SAMPLE_RATE)
+
+
+def _transcribe(items, language_mode):
+    audios = [_load_audio(item) for item in items]
+    started = time.perf_counter()
+    if len(audios) == 1:
+        texts = [_backend.transcribe(audios[0], language_mode)]
+    else:
+        texts = _backend.transcribe_batch(audios, [language_mode] * len(audios))
+    return items, texts, time.perf_counter() - started
+
+
+# --- Main Entry Point ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-transcribe archived audio with any backend (resumable).")
+    parser.add_argument('paths', nargs='+', help="Archive directories, audio directories or files")
+    parser.add_argument('--backend', default='whisper:base', help="name[:model], e.g. whisper:medium")
+    parser.add_argument('--device', help="Torch device for backends that take one")
+    parser.add_argument('--precision', help="float16, bfloat16, int8 or float32 (default: auto)")
+    parser.add_argument('--language', default='malay-english',
+                        choices=('malay-english', 'english-only', 'malay-only'))
+    parser.add_argument('--manifest', default='transcriptions.jsonl', help="JSON lines output / checkpoint")
+    parser.add_argument('--workers', type=int, default=1, help="Processes, each with its own model copy")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-batch-seconds', type=float, default=240.0)
+    parser.add_argument('--max-seconds', type=float, default=30.0, help="Split longer files into windows this long")
+    parser.add_argument('--tag', action='store_true', help="Also store Malay/English spans for each text")
+    args = parser.parse_args()
+
+    # Built only to name the model; each pool process loads its own copy
+    backend_name = backend_from_spec(args.backend, args.device, args.precision).describe()
+    settings = run_settings(backend_name, args.device, args.precision)
+    done = load_manifest(args.manifest, settings)
+    items = [item for item in scan(args.paths, args.max_seconds) if item.key not in done]
+    batches = make_batches(items, args.batch_size, args.max_batch_seconds)
+    total_seconds = sum(item.duration for item in items)
+    print(f"📂 {len(items)} items ({total_seconds / 3600:.2f} h of audio) in {len(batches)} batches; "
+          f"{len(done)} already in {args.manifest} for {backend_name} "
+          f"({settings['device']}, {settings['precision']})")
+    if not batches:
+        raise SystemExit(0)
+
+    context = multiprocessing.get_context('spawn')
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=context,
+                               initializer=_init_worker, initargs=(args.backend, args.device, args.precision))
+    manifest = open(args.manifest, 'a', encoding='utf-8')
+    pending = set()
+    queued = iter(batches)
+    finished_items = failed_items = 0
+    finished_seconds = model_seconds = 0.0
+    started = time.perf_counter()
+
+    try:
+        while True:
+            # Keep every process busy without materializing all futures up front
+            while len(pending) < args.workers * 2:
+                batch = next(queued, None)
+                if batch is None:
+                    break
+                future = pool.submit(_transcribe, batch, args.language)
+                future.batch = batch
+                pending.add(future)
+            if not pending:
+                break
+
+            completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in completed:
+                try:
+                    batch_items, texts, elapsed = future.result()
+                except Exception as e:
+                    failed_items += len(future.batch)
+                    print(f"❌ Batch of {len(future.batch)} failed ({e}); it will be retried on the next run")
+                    continue
+
+                for item, text in zip(batch_items, texts):
+                    entry = {'key': item.key, 'source': item.path, 'start_frame': item.start,
+                             'duration': round(item.duration, 3), **settings, 'text': text}
+                    if args.tag:
+                        entry['spans'] = tag_spans(text)
+                    manifest.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                # Checkpoint: this batch survives a crash from here on
+                manifest.flush()
+                os.fsync(manifest.fileno())
+
+                finished_items += len(batch_items)
+                finished_seconds += sum(item.duration for item in batch_items)
+                model_seconds += elapsed
+                wall = time.perf_counter() - started
+                print(f"✅ {finished_items}/{len(items)} items, {finished_seconds / 3600:.2f} h audio, "
+                      f"{finished_seconds / wall:.1f}x real time, model RTF {model_seconds / finished_seconds:.3f}")
+    except KeyboardInterrupt:
+        print("\n👋 Interrupted; finished batches are saved and will be skipped on the next run.")
+        pool.shutdown(wait=False, cancel_futures=True)
+    else:
+        pool.shutdown()
+    finally:
+        manifest.close()
+
+    if failed_items:
+        print(f"⚠️ {failed_items} items failed; rerun to retry them.")
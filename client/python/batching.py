@@ -0,0 +1,39 @@
+import time
+
+
+# Job kinds. Markers travel through the queue with a session's chunks so
+# they are handled in order with them:
+#   silence - a chunk the VAD found silent: answered without inference
+#             (streaming backends end the utterance there)
+#   end     - the browser disconnected: streaming backends flush the session
+AUDIO = 'audio'
+SILENCE = 'silence'
+END = 'end'
+
+
+class Job:
+    """One audio chunk (or session marker) waiting for inference."""
+
+    __slots__ = ('session_id', 'language_mode', 'audio', 'sample_rate', 'kind', 'enqueued_at')
+
+    def __init__(self, session_id, language_mode, audio, sample_rate, kind=AUDIO):
+        self.session_id = session_id
+        self.language_mode = language_mode
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.kind = kind
+        self.enqueued_at = time.monotonic()
+
+
+def group_by_language(jobs):
+    """
+    Split a micro-batch into lists that can share one generate call.
+
+    Chunks from concurrent browser sessions are batched together, but
+    generate_kwargs (the language hint) apply to a whole call, so each
+    language mode gets its own batch.
+    """
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.language_mode, []).append(job)
+    return list(groups.values())
@@ -0,0 +1,372 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+import soundfile as sf
+
+from audio_payload import encode_audio_frame
+from preprocess import AudioPreprocessor, resample
+from asr_backends import SAMPLE_RATE, backend_from_spec
+from batching import Job, AUDIO, END
+from vad import EnergyVAD
+from worker_runtime import JobQueue, InferenceRuntime
+from worker_engine import enhance_transcription, gate_chunk, marker_job
+
+# --- Offline Replay Benchmark ---
+# Replays a corpus of WAV files through a backend in-process, using the same
+# frame decoding, per-session VAD gating, SILENCE/END markers, job queue and
+# inference runtime as worker_engine (no Socket.IO, no relay). Each simulated browser session sends its chunks one
+# after another; `concurrency` sessions run at once.
+#
+#   python benchmark.py audio_uploads --backend fake --backend whisper:tiny \
+#       --backend hf-pipeline:mesolitica/whisper-tiny-ms-en --concurrency 4
+#
+# Every backend runs in a fresh process so peak RSS and model memory of one
+# run don't leak into the next.
+
+STAGES = ('decode', 'vad', 'queue_wait', 'inference', 'postprocess')
+
+
+def load_corpus(paths, chunk_seconds):
+    """[(name, [float32 chunks at SAMPLE_RATE]), ...] from WAV files or directories."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.wav'))))
+        else:
+            files.append(path)
+
+    corpus = []
+    chunk_length = int(chunk_seconds * SAMPLE_RATE)
+    for filename in files:
+        audio, sample_rate = sf.read(filename, dtype='float32', always_2d=True)
+        audio = resample(audio.mean(axis=1), sample_rate, SAMPLE_RATE)
+        chunks = [audio[start:start + chunk_length] for start in range(0, len(audio), chunk_length)]
+        corpus.append((os.path.basename(filename), [chunk for chunk in chunks if len(chunk)]))
+    return corpus
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unavailable)."""
+    try:
+        import resource
+    except ImportError: # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1024 / 1024
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+class ChunkTiming:
+    """Per-stage timestamps of one replayed chunk."""
+
+    __slots__ = ('submitted', 'done', 'skipped', 'enqueued_at', 'decode', 'vad',
+                 'queue_wait', 'inference', 'postprocess', 'event')
+
+    def __init__(self):
+        self.submitted = time.perf_counter()
+        self.done = None
+        self.skipped = False
+        self.enqueued_at = None
+        self.decode = self.vad = self.queue_wait = self.inference = self.postprocess = 0.0
+        self.event = threading.Event()
+
+    def finish(self):
+        self.done = time.perf_counter()
+        self.event.set()
+
+
+class TimedBackend:
+    """
+    Pass-through wrapper that times every model call. The call's start/end
+    are kept per thread so the completion callback (same inference thread)
+    can attribute them to its job; busy time is summed once per call, so a
+    batch isn't counted once per chunk.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.busy = 0.0
+        self.calls = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _timed(self, method, *args):
+        # Job.enqueued_at is on the monotonic clock; durations use perf_counter
+        start_monotonic = time.monotonic()
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            end = time.perf_counter()
+            self._local.call = (start, end, start_monotonic)
+            with self._lock:
+                self.busy += end - start
+                self.calls += 1
+
+    def last_call(self):
+        return getattr(self._local, 'call', (0.0, 0.0, 0.0))
+
+    def transcribe(self, audio, language_mode='malay-english'):
+        return self._timed(self.backend.transcribe, audio, language_mode)
+
+    def transcribe_batch(self, audios, language_modes):
+        return self._timed(self.backend.transcribe_batch, audios, language_modes)
+
+    def transcribe_stream(self, session_id, audio, language_mode='malay-english'):
+        return self._timed(self.backend.transcribe_stream, session_id, audio, language_mode)
+
+    def end_session(self, session_id):
+        # Finishing an utterance may decode the audio still buffered
+        return self._timed(self.backend.end_session, session_id)
+
+
+class ReplayBenchmark:
+    """Replay `corpus` through one backend and collect latency/stage numbers."""
+
+    def __init__(self, backend, corpus, concurrency=1, repeat=1, max_batch=1, window_ms=0,
+                 inference_threads=1, vad=True, realtime=False, language_mode='malay-english'):
+        self.backend = TimedBackend(backend)
+        self.corpus = corpus
+        self.concurrency = concurrency
+        self.repeat = repeat
+        self.preprocessor = AudioPreprocessor(SAMPLE_RATE)
+        self.vad = EnergyVAD(SAMPLE_RATE) if vad else None
+        self.realtime = realtime
+        self.language_mode = language_mode
+
+        self.job_queue = JobQueue(maxsize=max(32, concurrency * 4), overflow='reject')
+        self.runtime = InferenceRuntime(
+            self.backend, self.job_queue,
+            on_result=lambda job, text, is_final: None,
+            on_error=self._on_error,
+            on_complete=self._on_complete,
+            num_workers=inference_threads,
+            max_batch=max_batch,
+            window_ms=window_ms
+        )
+        self.timings = []
+        self.errors = 0
+        self._pending = {} # session_id -> ChunkTiming being processed
+        self._lock = threading.Lock()
+
+    # --- Runtime callbacks ---
+    def _on_complete(self, job, results):
+        # Called once per job, markers and result-less streaming calls included
+        timing = self._pending.get(job.session_id)
+        if timing is None or job.kind == END:
+            return
+        if job.kind == AUDIO or self.backend.streaming:
+            start, end, start_monotonic = self.backend.last_call()
+            timing.queue_wait = max(0.0, start_monotonic - job.enqueued_at)
+            timing.inference = end - start
+        else:
+            # A chunk backend answers SILENCE without a model call
+            timing.queue_wait = max(0.0, time.monotonic() - job.enqueued_at)
+        started = time.perf_counter()
+        for text, is_final in results:
+            enhance_transcription(text, job.language_mode, highlight=is_final)
+        timing.postprocess = time.perf_counter() - started
+        timing.finish()
+
+    def _on_error(self, job, error):
+        with self._lock:
+            self.errors += 1
+        timing = self._pending.get(job.session_id)
+        if timing is not None:
+            timing.finish()
+
+    # --- Simulated sessions ---
+    def _replay_session(self, index, streams):
+        session_id = f"bench-{index}"
+        floor = self.vad.new_floor() if self.vad else None
+        next_send = time.perf_counter()
+        for chunks in streams:
+            for chunk in chunks:
+                if self.realtime:
+                    time.sleep(max(0.0, next_send - time.perf_counter()))
+                    next_send += len(chunk) / SAMPLE_RATE
+                # What the browser would send, built outside the timed path
+                payload = {'browserSocketId': session_id, 'audioFrame': encode_audio_frame(chunk)}
+                timing = ChunkTiming()
+                self._pending[session_id] = timing
+
+                started = time.perf_counter()
+                audio, sample_rate = self.preprocessor.payload(payload)
+                timing.decode = time.perf_counter() - started
+                job = Job(session_id, self.language_mode, audio, sample_rate)
+
+                if self.vad:
+                    started = time.perf_counter()
+                    timing.skipped = not gate_chunk(self.vad, job, floor, self.backend.streaming)
+                    timing.vad = time.perf_counter() - started
+
+                job.enqueued_at = timing.enqueued_at = time.monotonic()
+                self.job_queue.put(job)
+                timing.event.wait()
+                self._record(timing)
+        if self.backend.streaming:
+            # As on a browser disconnect: flushed behind the session's last chunk
+            self.job_queue.put(marker_job(session_id, self.language_mode, END))
+
+    def _record(self, timing):
+        with self._lock:
+            self.timings.append(timing)
+
+    def run(self):
+        streams = [chunks for _ in range(self.repeat) for _, chunks in self.corpus]
+        sessions = [streams[i::self.concurrency] for i in range(self.concurrency)]
+        audio_seconds = sum(len(chunk) for chunks in streams for chunk in chunks) / SAMPLE_RATE
+
+        self.runtime.start()
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self._replay_session, args=(i, work), name=f"session-{i}")
+                   for i, work in enumerate(sessions) if work]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        self.runtime.stop()
+        return self.report(wall, audio_seconds)
+
+    def report(self, wall, audio_seconds):
+        latencies = np.array([t.done - t.submitted for t in self.timings]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+        processed = [t for t in self.timings if not t.skipped]
+        return {
+            'chunks': len(self.timings),
+            'skipped_by_vad': len(self.timings) - len(processed),
+            'errors': self.errors,
+            'audio_seconds': round(audio_seconds, 2),
+            'wall_seconds': round(wall, 3),
+            # Model time per second of audio, and wall time per second of audio
+            'rtf': round(self.backend.busy / audio_seconds, 4) if audio_seconds else None,
+            'wall_rtf': round(wall / audio_seconds, 4) if audio_seconds else None,
+            'model_calls': self.backend.calls,
+            'latency_ms': {'p50': round(float(p50), 1), 'p95': round(float(p95), 1), 'p99': round(float(p99), 1),
+                           'max': round(float(latencies.max()), 1) if len(latencies) else 0.0},
+            'throughput_chunks_per_s': round(len(self.timings) / wall, 2) if wall else None,
+            'stage_ms': {stage: round(float(np.mean([getattr(t, stage) for t in self.timings])) * 1000, 3)
+                         if self.timings else 0.0 for stage in STAGES},
+        }
+
+
+def run_benchmark(spec, paths, options):
+    """Load one backend and replay the corpus; runs inside a fresh process."""
+    backend = backend_from_spec(spec, options['device'], options['precision'])
+
+    started = time.perf_counter()
+    backend.load()
+    loaded = time.perf_counter()
+    backend.warm_up()
+    warmed = time.perf_counter()
+
+    corpus = load_corpus(paths, options['chunk_seconds'])
+    benchmark = ReplayBenchmark(
+        backend, corpus,
+        concurrency=options['concurrency'],
+        repeat=options['repeat'],
+        max_batch=options['max_batch_size'],
+        window_ms=options['batch_window_ms'],
+        inference_threads=options['inference_threads'],
+        vad=options['vad'],
+        realtime=options['realtime']
+    )
+    result = benchmark.run()
+    result['backend'] = backend.describe()
+    result['runtime'] = backend.runtime_info()
+    result['load_seconds'] = round(loaded - started, 2)
+    result['warm_up_seconds'] = round(warmed - loaded, 2)
+    rss = peak_rss_mb()
+    result['peak_rss_mb'] = round(rss, 1) if rss is not None else None
+    return result
+
+
+def _label(result):
+    # Same model at different precisions/devices needs telling apart
+    return f"{result['backend']} ({result['runtime']})" if result['runtime'] else result['backend']
+
+
+def print_report(results, options):
+    print(f"\nConcurrency {options['concurrency']}, batch {options['max_batch_size']}, "
+          f"{options['inference_threads']} inference thread(s), VAD {'on' if options['vad'] else 'off'}"
+          f"{', real-time pacing' if options['realtime'] else ''}")
+    header = f"{'backend':<42} {'chunks':>6} {'RTF':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'chunk/s':>8} {'RSS MB':>8} {'load s':>7}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else 'n/a'
+        print(f"{_label(r)[:42]:<42} {r['chunks']:>6} {r['rtf']:>7.3f} {r['latency_ms']['p50']:>8.1f} "
+              f"{r['latency_ms']['p95']:>8.1f} {r['latency_ms']['p99']:>8.1f} "
+              f"{r['throughput_chunks_per_s']:>8.2f} {rss:>8} {r['load_seconds']:>7.1f}")
+
+    print("\nMean time per chunk by stage (ms):")
+    print(f"{'backend':<42} " + ' '.join(f"{stage:>11}" for stage in STAGES))
+    for r in results:
+        print(f"{_label(r)[:42]:<42} " + ' '.join(f"{r['stage_ms'][stage]:>11.3f}" for stage in STAGES))
+
+
+# --- Main Entry Point ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay WAV files through ASR backends and report RTF/latency.")
+    parser.add_argument('paths', nargs='*', default=['audio_uploads'], help="WAV files or directories")
+    parser.add_argument('--backend', action='append', dest='backends',
+                        help="name[:model], e.g. whisper:tiny or hf-pipeline:mesolitica/whisper-tiny-ms-en "
+                             "(repeatable; default: fake)")
+    parser.add_argument('--device', help="Torch device for backends that take one")
+    parser.add_argument('--precision', help="float16, bfloat16, int8 or float32 (default: auto)")
+    parser.add_argument('--concurrency', type=int, default=1, help="Simulated browser sessions")
+    parser.add_argument('--repeat', type=int, default=1, help="Replay the corpus this many times")
+    parser.add_argument('--chunk-seconds', type=float, default=3.0)
+    parser.add_argument('--max-batch-size', type=int, default=1)
+    parser.add_argument('--batch-window-ms', type=float, default=30)
+    parser.add_argument('--inference-threads', type=int, default=1)
+    parser.add_argument('--no-vad', dest='vad', action='store_false')
+    parser.add_argument('--realtime', action='store_true', help="Pace each session's chunks at real-time speed")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    options = {
+        'device': args.device,
+        'precision': args.precision,
+        'concurrency': args.concurrency,
+        'repeat': args.repeat,
+        'chunk_seconds': args.chunk_seconds,
+        'max_batch_size': args.max_batch_size,
+        'batch_window_ms': args.batch_window_ms,
+        'inference_threads': args.inference_threads,
+        'vad': args.vad,
+        'realtime': args.realtime,
+    }
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for spec in args.backends or ['fake']:
+        print(f"🏁 Benchmarking {spec}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                results.append(pool.submit(run_benchmark, spec, args.paths, options).result())
+            except Exception as e:
+                print(f"❌ {spec} failed: {e}")
+
+    if results:
+        print_report(results, options)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'options': options, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
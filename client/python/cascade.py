@@ -0,0 +1,172 @@
+import os
+import logging
+import threading
+
+from asr_backends import ASRBackend, SAMPLE_RATE
+
+# --- Confidence Cascade ---
+# Most chunks are clear speech that tiny/base transcribe as well as large
+# does, so paying large-model cost on every chunk wastes most of the
+# compute. CascadeBackend runs a small Whisper model first and looks at
+# its segment statistics:
+#
+#   avg_logprob        - mean token log-probability (low = unsure)
+#   compression_ratio  - gzip ratio of the text (high = repetition loop)
+#   no_speech_prob     - probability the audio held no speech at all
+#
+# Only chunks that fail a threshold are transcribed again by the larger
+# model, loaded in the same process. Both models share the worker's
+# queue, batching and result cache; the escalation rate is reported in
+# the banner, in stats() and as asr_cascade_* gauges.
+#
+#   CASCADE_LARGE=large python transcriber-cascade.py
+
+logger = logging.getLogger(__name__)
+
+CASCADE_MIN_LOGPROB = float(os.getenv("CASCADE_MIN_LOGPROB", "-0.7"))
+CASCADE_MAX_COMPRESSION = float(os.getenv("CASCADE_MAX_COMPRESSION", "2.4"))
+CASCADE_NO_SPEECH = float(os.getenv("CASCADE_NO_SPEECH", "0.6"))
+
+
+def escalation_reason(segments, min_logprob=CASCADE_MIN_LOGPROB, max_compression=CASCADE_MAX_COMPRESSION,
+                      no_speech=CASCADE_NO_SPEECH):
+    """Why a small-model transcription should be redone by the large model (None if it's fine)."""
+    if not segments:
+        return None # Nothing was said; the larger model has nothing to fix
+    # Weigh each segment's log-probability by its duration
+    durations = [max(segment['end'] - segment['start'], 0.01) for segment in segments]
+    logprob = sum(d * segment['avg_logprob'] for d, segment in zip(durations, segments)) / sum(durations)
+    if logprob < min_logprob:
+        return 'logprob'
+    if max(segment['compression_ratio'] for segment in segments) > max_compression:
+        return 'compression'
+    # Text over audio the model thinks is silence: likely a hallucination
+    if max(segment['no_speech_prob'] for segment in segments) > no_speech:
+        return 'no_speech'
+    return None
+
+
+class CascadeBackend(ASRBackend):
+    """
+    `small` (a backend with transcribe_scored(), e.g. WhisperBackend) answers
+    every chunk; `large` (any chunk backend) redoes the low-confidence ones.
+    """
+
+    name = "cascade"
+    REASONS = ('logprob', 'compression', 'no_speech')
+
+    def __init__(self, small, large, min_logprob=CASCADE_MIN_LOGPROB,
+                 max_compression=CASCADE_MAX_COMPRESSION, no_speech=CASCADE_NO_SPEECH):
+        if small.streaming or large.streaming:
+            raise ValueError("The cascade needs chunk backends, not streaming ones")
+        if not hasattr(small, 'transcribe_scored'):
+            raise ValueError(f"{small.describe()} reports no segment confidence to cascade on")
+        super().__init__(f"{small.model_name}>{large.model_name}")
+        self.small = small
+        self.large = large
+        self.min_logprob = min_logprob
+        self.max_compression = max_compression
+        self.no_speech = no_speech
+
+        self.chunks = 0
+        self.escalations = dict.fromkeys(self.REASONS, 0)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Picklable for ReplicaPool (each replica counts its own escalations; the pool merges them)
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def import_modules(self):
+        self.small.import_modules()
+        self.large.import_modules()
+
+    def load(self):
+        self.small.load()
+        self.large.load()
+        self.config = self.small.config
+        self.model = self.small.model
+
+    def warm_up(self, seconds=1.0, passes=1, batch_size=1):
+        self.small.warm_up(seconds, passes, batch_size)
+        self.large.warm_up(seconds, passes, batch_size)
+
+    def _first_pass(self, audio, language_mode):
+        text, segments = self.small.transcribe_scored(audio, language_mode)
+        reason = escalation_reason(segments, self.min_logprob, self.max_compression, self.no_speech)
+        with self._lock:
+            self.chunks += 1
+            if reason:
+                self.escalations[reason] += 1
+        if reason:
+            logger.debug("⬆️ Escalating %.1f s chunk (%s): %r", len(audio) / SAMPLE_RATE, reason, text)
+        return text, reason
+
+    def transcribe(self, audio, language_mode='malay-english'):
+        text, reason = self._first_pass(audio, language_mode)
+        return self.large.transcribe(audio, language_mode) if reason else text
+
+    def transcribe_batch(self, audios, language_modes):
+        texts, reasons = zip(*map(self._first_pass, audios, language_modes))
+        texts = list(texts)
+        escalated = [i for i, reason in enumerate(reasons) if reason]
+        if escalated:
+            redone = self.large.transcribe_batch([audios[i] for i in escalated],
+                                                 [language_modes[i] for i in escalated])
+            for i, text in zip(escalated, redone):
+                texts[i] = text
+        return texts
+
+    @property
+    def escalation_rate(self):
+        with self._lock:
+            return sum(self.escalations.values()) / self.chunks if self.chunks else 0.0
+
+    def stats(self):
+        with self._lock:
+            escalated = sum(self.escalations.values())
+            return {
+                'chunks': self.chunks,
+                'escalated': escalated,
+                'escalation_rate': round(escalated / self.chunks, 3) if self.chunks else 0.0,
+                'reasons': dict(self.escalations),
+            }
+
+    def merge_stats(self, stats_list):
+        merged = super().merge_stats(stats_list)
+        if merged:
+            chunks = merged['chunks']
+            merged['escalation_rate'] = round(merged['escalated'] / chunks, 3) if chunks else 0.0
+        return merged
+
+    def register_metrics(self, metrics, stats=None):
+        stats = stats or self.stats
+        metrics.gauge('asr_cascade_chunks', "Chunks answered by the small model first", lambda: stats()['chunks'])
+        for reason in self.REASONS:
+            metrics.gauge(f'asr_cascade_escalated_{reason}', f"Chunks sent to the large model ({reason})",
+                          lambda reason=reason: stats()['reasons'][reason])
+        metrics.gauge('asr_cascade_escalation_rate', "Share of chunks redone by the large model",
+                      lambda: stats()['escalation_rate'])
+
+    def close(self):
+        self.small.close()
+        self.large.close()
+
+    def describe(self):
+        return f"{self.small.describe()}>{self.large.describe()}"
+
+    def cache_scope(self):
+        # The thresholds decide which model's text a chunk ends up with
+        return (f"{self.small.cache_scope()}>{self.large.cache_scope()}"
+                f"@{self.min_logprob}/{self.max_compression}/{self.no_speech}")
+
+    def runtime_info(self):
+        info = self.small.runtime_info()
+        thresholds = (f"cascade on logprob < {self.min_logprob}, compression > {self.max_compression}, "
+                      f"no-speech > {self.no_speech}")
+        return f"{info}; {thresholds}" if info else thresholds
@@ -0,0 +1,145 @@
+import os
+import logging
+import contextlib
+
+# --- Device And Precision Selection ---
+# Backends used to hardcode device="cuda" with float16, so the scripts could
+# not start on CPU-only nodes. Everything here resolves at load() time (torch
+# is only imported then):
+#   DEVICE        auto | cuda | cuda:N | cpu      (auto = cuda if available)
+#   PRECISION     auto | float16 | bfloat16 | int8 | float32
+#                 auto = float16 on GPU, int8 on CPU
+#   CPU_THREADS / CPU_INTEROP_THREADS   torch intra-/inter-op thread pools
+#
+# On CPU, int8 is dynamic quantization of the Linear layers (weights stored
+# as int8, activations quantized per batch), which is where almost all of
+# Whisper's and wav2vec2's time goes. bfloat16 runs under CPU autocast and
+# is only chosen when the CPU has native bf16 support.
+
+logger = logging.getLogger(__name__)
+
+DEVICE = os.getenv("DEVICE", "auto")
+PRECISION = os.getenv("PRECISION", "auto")
+CPU_THREADS = int(os.getenv("CPU_THREADS", "0")) # 0 = all cores
+CPU_INTEROP_THREADS = int(os.getenv("CPU_INTEROP_THREADS", "1"))
+
+PRECISIONS = ('float16', 'bfloat16', 'int8', 'float32')
+
+# What each precision trades, shown in the worker banner next to the
+# measured warm-up speed
+PRECISION_NOTES = {
+    'float16': "GPU half precision: full accuracy, fastest on CUDA",
+    'bfloat16': "CPU bf16 autocast: near-fp32 accuracy, faster on CPUs with native bf16",
+    'int8': "dynamic int8 Linear layers: fastest on CPU, small accuracy loss (check WER on your data)",
+    'float32': "full precision: reference accuracy, slowest",
+}
+
+
+def resolve_device(device=None):
+    """'auto' (or None with DEVICE=auto) -> 'cuda' when available, else 'cpu'."""
+    device = device or DEVICE
+    if device != 'auto':
+        return device
+    import torch
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+
+def cpu_supports_bf16():
+    import torch
+    try:
+        return bool(torch.backends.mkldnn.is_available() and torch.cpu._is_avx512_bf16_supported())
+    except AttributeError: # Older torch without the capability probe
+        return False
+
+
+def resolve_precision(device, precision=None):
+    """Pick the precision for `device`, falling back when it can't be used there."""
+    precision = precision or PRECISION
+    if precision not in PRECISIONS and precision != 'auto':
+        raise ValueError(f"Unknown precision '{precision}'. Choose from: auto, {', '.join(PRECISIONS)}")
+
+    on_gpu = device.startswith('cuda')
+    if precision == 'auto':
+        return 'float16' if on_gpu else 'int8'
+    if on_gpu and precision == 'int8':
+        logger.warning("int8 dynamic quantization is CPU-only; using float16 on %s", device)
+        return 'float16'
+    if not on_gpu and precision == 'float16':
+        logger.warning("float16 is slow or unsupported on CPU; using int8")
+        return 'int8'
+    if not on_gpu and precision == 'bfloat16' and not cpu_supports_bf16():
+        logger.warning("This CPU has no native bfloat16; using int8")
+        return 'int8'
+    return precision
+
+
+def torch_dtype(precision):
+    """dtype to load weights in (int8 quantizes fp32 weights after loading)."""
+    import torch
+    return {'float16': torch.float16, 'bfloat16': torch.bfloat16}.get(precision, torch.float32)
+
+
+def configure_cpu_threads(intra=None, inter=None):
+    """Size torch's thread pools; returns the intra-op count in effect."""
+    import torch
+    intra = intra or CPU_THREADS or os.cpu_count() or 1
+    inter = inter or CPU_INTEROP_THREADS
+    torch.set_num_threads(intra)
+    try:
+        torch.set_num_interop_threads(inter)
+    except RuntimeError:
+        pass # Can only be set once, before any inter-op work has started
+    return torch.get_num_threads()
+
+
+def quantize_linear(model):
+    """Dynamic int8 quantization of every nn.Linear in `model` (CPU only)."""
+    import torch
+    # quantize_dynamic matches exact types; whisper's Linear subclass only
+    # adds a dtype cast that fp32 CPU inference doesn't need
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    quantize_dynamic = getattr(torch, 'ao', torch).quantization.quantize_dynamic
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def autocast(device, precision):
+    """Context manager for inference: fp16/bf16 autocast, a no-op for int8/fp32."""
+    if precision not in ('float16', 'bfloat16'):
+        return contextlib.nullcontext()
+    import torch
+    return torch.autocast('cuda' if device.startswith('cuda') else 'cpu', dtype=torch_dtype(precision))
+
+
+class DeviceConfig:
+    """Resolved device/precision/threads for one backend."""
+
+    __slots__ = ('device', 'precision', 'threads')
+
+    def __init__(self, device=None, precision=None, threads=None):
+        self.device = resolve_device(device)
+        self.precision = resolve_precision(self.device, precision)
+        self.threads = configure_cpu_threads(threads) if self.device == 'cpu' else None
+
+    @property
+    def torch_dtype(self):
+        return torch_dtype(self.precision)
+
+    def prepare(self, model):
+        """Apply the precision to a loaded torch model (int8 quantization on CPU)."""
+        if self.precision == 'int8':
+            return quantize_linear(model)
+        return model
+
+    def autocast(self):
+        return autocast(self.device, self.precision)
+
+    def describe(self):
+        text = f"{self.device}, {self.precision}"
+        if self.threads:
+            text += f", {self.threads} threads"
+        return text
+
+    def tradeoff(self):
+        return PRECISION_NOTES[self.precision]
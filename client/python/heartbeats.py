@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import logging
+import argparse
+import urllib.request
+from dotenv import load_dotenv
+
+from metrics import MetricsRegistry
+
+# --- Worker Heartbeat Monitor ---
+# Workers emit 'worker_heartbeat' every few seconds (queue depth, in-flight
+# chunks, rolling RTF and queue wait, model, device). The relay keeps the
+# latest one per group and serves them on GET /workers. This helper polls
+# that endpoint, flags stale or saturated workers, and re-exposes the
+# figures as Prometheus gauges for alerting:
+#
+#   python heartbeats.py --relay http://localhost:3000 --metrics-port 9400
+#
+# HeartbeatMonitor can also be fed heartbeats directly (e.g. from a
+# Socket.IO listener) and asked for admission decisions with admit().
+
+logger = logging.getLogger("heartbeats")
+
+load_dotenv()
+NODE_SERVER_URL = os.getenv("NODE_SERVER_URL", "http://localhost:3000")
+ADMIN_SECRET_KEY = os.getenv("ADMIN_SECRET_KEY")
+
+
+class HeartbeatMonitor:
+    """
+    Latest heartbeat per worker group, judged against saturation limits.
+
+    A worker is saturated when its queue is `max_queue_fill` full, it
+    transcribes slower than real time (rtf above `max_rtf`), or chunks wait
+    longer than `max_wait_ms` on average. It is stale when no heartbeat has
+    arrived for `stale_intervals` of its own heartbeat intervals.
+    """
+
+    def __init__(self, max_queue_fill=0.8, max_rtf=1.0, max_wait_ms=2000.0, stale_intervals=3):
+        self.max_queue_fill = max_queue_fill
+        self.max_rtf = max_rtf
+        self.max_wait_ms = max_wait_ms
+        self.stale_intervals = stale_intervals
+        self.workers = {} # group -> (heartbeat, received monotonic time)
+
+    def update(self, heartbeat, received=None):
+        received = time.monotonic() if received is None else received
+        self.workers[heartbeat['group']] = (heartbeat, received)
+
+    def alerts(self, heartbeat, age):
+        """Reasons this worker needs attention (empty when healthy)."""
+        reasons = []
+        if age > self.stale_intervals * (heartbeat.get('interval') or 5):
+            reasons.append(f"no heartbeat for {age:.0f} s")
+        maxsize = heartbeat.get('queue_maxsize') or 0
+        if maxsize and heartbeat['queue_depth'] >= self.max_queue_fill * maxsize:
+            reasons.append(f"queue {heartbeat['queue_depth']}/{maxsize}")
+        if heartbeat.get('rtf') is not None and heartbeat['rtf'] > self.max_rtf:
+            reasons.append(f"RTF {heartbeat['rtf']:.2f} over {self.max_rtf}")
+        if heartbeat.get('avg_wait_ms', 0) > self.max_wait_ms:
+            reasons.append(f"avg queue wait {heartbeat['avg_wait_ms']:.0f} ms")
+        return reasons
+
+    def status(self, now=None):
+        """{group: {**heartbeat, 'age', 'alerts', 'saturated', 'stale'}}"""
+        now = time.monotonic() if now is None else now
+        status = {}
+        for group, (heartbeat, received) in self.workers.items():
+            age = now - received
+            alerts = self.alerts(heartbeat, age)
+            stale = age > self.stale_intervals * (heartbeat.get('interval') or 5)
+            status[group] = dict(heartbeat, age=round(age, 1), alerts=alerts,
+                                 stale=stale, saturated=bool(alerts) and not stale)
+        return status
+
+    def admit(self, group):
+        """Whether new audio for `group` should be accepted right now."""
+        worker = self.status().get(group)
+        return worker is not None and not worker['stale'] and not worker['saturated']
+
+    def register_metrics(self, registry):
+        """Expose per-group gauges (asr_worker_*{group=...}) on a MetricsRegistry."""
+        fields = (
+            ('queue_depth', "Chunks waiting in the worker queue"),
+            ('in_flight', "Chunks being transcribed"),
+            ('rtf', "Rolling model time per second of audio"),
+            ('avg_wait_ms', "Rolling average queue wait"),
+            ('age', "Seconds since the last heartbeat"),
+            ('saturated', "1 when the worker is over a saturation limit"),
+        )
+        for field, documentation in fields:
+            registry.register(_GroupGauge(f"asr_worker_{field}", documentation, self, field))
+
+
+class _GroupGauge:
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, monitor, field):
+        self.name = name
+        self.documentation = documentation
+        self.monitor = monitor
+        self.field = field
+
+    def samples(self):
+        for group, worker in self.monitor.status().items():
+            value = worker.get(self.field)
+            if value is not None:
+                yield self.name, f'{{group="{group}"}}', float(value)
+
+
+def fetch_heartbeats(relay_url, secret=ADMIN_SECRET_KEY, timeout=5.0):
+    """Latest heartbeats held by the relay (GET /workers)."""
+    request = urllib.request.Request(f"{relay_url.rstrip('/')}/workers", headers={'X-Admin-Secret': secret or ''})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())['workers']
+
+
+# --- Main Entry Point ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Watch worker heartbeats and alert on saturation.")
+    parser.add_argument('--relay', default=NODE_SERVER_URL)
+    parser.add_argument('--interval', type=float, default=5.0, help="Seconds between polls")
+    parser.add_argument('--metrics-port', type=int, default=0, help="Serve asr_worker_* gauges here (0 disables)")
+    parser.add_argument('--max-queue-fill', type=float, default=0.8)
+    parser.add_argument('--max-rtf', type=float, default=1.0)
+    parser.add_argument('--max-wait-ms', type=float, default=2000.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+    monitor = HeartbeatMonitor(args.max_queue_fill, args.max_rtf, args.max_wait_ms)
+    registry = MetricsRegistry()
+    if args.metrics_port:
+        monitor.register_metrics(registry)
+        registry.serve(args.metrics_port)
+        logger.info("📈 Worker gauges on http://127.0.0.1:%d/metrics", args.metrics_port)
+
+    try:
+        while True:
+            try:
+                now = time.monotonic()
+                for heartbeat in fetch_heartbeats(args.relay):
+                    # The relay reports how old each heartbeat is
+                    monitor.update(heartbeat, now - heartbeat.get('age_ms', 0) / 1000)
+            except OSError as e:
+                logger.warning("Could not reach the relay at %s: %s", args.relay, e)
+
+            for group, worker in monitor.status().items():
+                if worker['alerts']:
+                    logger.warning("⚠️ [%s] %s: %s", group, worker['model'], '; '.join(worker['alerts']))
+                else:
+                    rtf = f"{worker['rtf']:.2f}" if worker['rtf'] is not None else 'n/a'
+                    logger.info("[%s] %s on %s: queue %d/%d, in flight %d, RTF %s, wait %.0f ms",
+                                group, worker['model'], worker['device'] or 'n/a', worker['queue_depth'],
+                                worker['queue_maxsize'], worker['in_flight'], rtf, worker['avg_wait_ms'])
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        registry.close()
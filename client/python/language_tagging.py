@@ -0,0 +1,220 @@
+import os
+import re
+import glob
+import html
+import json
+import argparse
+from functools import lru_cache
+
+# --- Malay Words Dictionary (can be expanded) ---
+MALAY_WORDS = {
+    'saya', 'awak', 'kamu', 'kami', 'kita', 'mereka', 'ini', 'itu', 'sini', 'situ',
+    'sana', 'yang', 'dan', 'atau', 'tapi', 'tetapi', 'dengan', 'untuk', 'kepada',
+    'dari', 'pada', 'di', 'ke', 'oleh', 'sebagai', 'dalam', 'atas',
+    'bawah', 'depan', 'belakang', 'kiri', 'kanan', 'pergi', 'datang', 'makan',
+    'minum', 'tidur', 'bangun', 'baca', 'tulis', 'dengar', 'lihat', 'beli', 'jual',
+    'kerja', 'main', 'jalan', 'lari', 'duduk', 'berdiri', 'besar', 'kecil', 'panjang',
+    'pendek', 'tinggi', 'rendah', 'baik', 'buruk', 'cantik', 'hodoh', 'pandai',
+    'bodoh', 'kaya', 'miskin', 'baru', 'lama', 'cepat', 'lambat', 'mahal', 'murah',
+    'suka', 'benci', 'sayang', 'marah', 'gembira', 'sedih', 'lapar', 'haus', 'penat',
+    'sihat', 'sakit', 'ada', 'tiada', 'boleh', 'tidak', 'jangan', 'sudah', 'belum',
+    'akan', 'telah', 'sedang', 'perlu', 'harus', 'mesti', 'tak', 'takde',
+    'nak', 'kan', 'lah', 'pun', 'nya', 'kah', 'tah',
+    'rumah', 'kereta', 'terima', 'kasih', 'selamat', 'pagi', 'malam', 'petang', 'jom',
+    'apa', 'siapa', 'bila', 'mana', 'kenapa', 'macam', 'mahu', 'hendak', 'kalau',
+    'sebab', 'jadi', 'masa', 'sekarang', 'esok', 'semalam', 'nanti', 'dulu', 'lagi',
+    'semua', 'banyak', 'sikit', 'sahaja', 'saja', 'juga', 'sangat', 'betul', 'tahu',
+    'faham', 'cakap', 'tengok', 'balik', 'buat', 'bagi', 'ambil', 'guna', 'cari',
+    'tunggu', 'jumpa', 'khabar', 'sama', 'orang', 'anak', 'hari', 'buku', 'beri',
+    'aku', 'dia', 'bukan', 'seperti', 'lain', 'tempat', 'duit', 'sampai', 'habis',
+    'tolong', 'minta', 'nasi', 'kedai', 'sekolah', 'kawan', 'ajar', 'tanya', 'jawab',
+    'fikir', 'pakai', 'penting',
+}
+
+# Fixed expressions tagged as one unit even when a word alone would be
+# ambiguous or English-looking (e.g. "sama-sama", "apa khabar")
+MALAY_PHRASES = (
+    'terima kasih', 'selamat pagi', 'selamat petang', 'selamat malam',
+    'selamat datang', 'selamat jalan', 'apa khabar', 'sama sama', 'jumpa lagi',
+    'tak apa', 'tidak apa', 'tak ada', 'macam mana', 'boleh tak', 'jom pergi',
+)
+
+# Affixes, tried outermost first. Nasal prefixes (meN-/peN-) may have
+# swallowed the stem's first consonant: menulis -> tulis, memukul -> pukul.
+# Two-letter prefixes need a longer stem so English words like "media" or
+# "sedan" aren't read as me-dia / se-dan.
+MALAY_SUFFIXES = ('nya', 'lah', 'kah', 'kan', 'an', 'i')
+MALAY_PREFIXES = (
+    ('meng', ('', 'k')), ('meny', ('s',)), ('mem', ('', 'p')), ('men', ('', 't')),
+    ('me', ('',)), ('peng', ('', 'k')), ('peny', ('s',)), ('pem', ('', 'p')),
+    ('pen', ('', 't')), ('pe', ('',)), ('ber', ('',)), ('be', ('',)),
+    ('ter', ('',)), ('di', ('',)), ('se', ('',)), ('ke', ('',)),
+)
+MIN_STEM = 3
+
+# Words with apostrophes/hyphens stay one token ("sama-sama", "don't")
+TOKEN_RE = re.compile(r"\w+(?:['\-]\w+)*")
+
+MALAY = 'malay'
+ENGLISH = 'english'
+
+
+def _build_phrase_trie(phrases):
+    """Token-level trie; a node's None key marks the end of a phrase."""
+    root = {}
+    for phrase in phrases:
+        node = root
+        for word in phrase.split():
+            node = node.setdefault(word, {})
+        node[None] = True
+    return root
+
+
+PHRASE_TRIE = _build_phrase_trie(MALAY_PHRASES)
+
+
+def _is_malay_stem(word, depth=0):
+    if word in MALAY_WORDS:
+        return True
+    if depth >= 3:
+        return False
+    for suffix in MALAY_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            if _is_malay_stem(word[:-len(suffix)], depth + 1):
+                return True
+    for prefix, restores in MALAY_PREFIXES:
+        if word.startswith(prefix):
+            rest = word[len(prefix):]
+            min_stem = MIN_STEM + 1 if len(prefix) == 2 else MIN_STEM
+            for restore in restores:
+                if len(restore + rest) >= min_stem and _is_malay_stem(restore + rest, depth + 1):
+                    return True
+    return False
+
+
+@lru_cache(maxsize=65536)
+def classify_token(token):
+    """'malay' or 'english' for one lowercased token (affixes/reduplication handled)."""
+    if '-' in token:
+        # Reduplication (kawan-kawan, sama-sama) and hyphenated affixes (buku-nya)
+        parts = token.split('-')
+        if any(_is_malay_stem(part) or part in MALAY_SUFFIXES for part in parts):
+            return MALAY
+        return ENGLISH
+    return MALAY if _is_malay_stem(token) else ENGLISH
+
+
+# --- Language Processing Functions ---
+def tag_spans(text):
+    """
+    Tag `text` in one pass. Returns compact (start, end, lang) spans: runs of
+    same-language tokens are merged, and the text between spans (spaces,
+    punctuation) is left untagged.
+    """
+    matches = list(TOKEN_RE.finditer(text))
+    words = [match.group().lower() for match in matches]
+
+    spans = []
+    i = 0
+    while i < len(matches):
+        # Longest phrase starting at token i
+        node, phrase_end, j = PHRASE_TRIE, 0, i
+        while j < len(words):
+            key = words[j].replace('-', ' ').split() if '-' in words[j] else (words[j],)
+            for part in key:
+                node = node.get(part)
+                if node is None:
+                    break
+            if node is None:
+                break
+            j += 1
+            if None in node:
+                phrase_end = j
+
+        if phrase_end:
+            lang, next_i = MALAY, phrase_end
+        else:
+            lang, next_i = classify_token(words[i]), i + 1
+
+        start, end = matches[i].start(), matches[next_i - 1].end()
+        if spans and spans[-1][2] == lang:
+            spans[-1] = (spans[-1][0], end, lang)
+        else:
+            spans.append((start, end, lang))
+        i = next_i
+    return spans
+
+
+def tag_many(texts):
+    """Bulk tagging: a list of span lists, sharing one token cache across texts."""
+    return [tag_spans(text) for text in texts]
+
+
+def detect_language_word(word):
+    """Detect if a word is Malay or English"""
+    tokens = TOKEN_RE.findall(word.lower())
+    return classify_token(tokens[0]) if tokens else ENGLISH
+
+
+def render_spans(text, spans):
+    """Wrap each span in a highlight-<lang> HTML span (text is HTML-escaped)."""
+    pieces = []
+    position = 0
+    for start, end, lang in spans:
+        pieces.append(html.escape(text[position:start]))
+        pieces.append(f"<span class='highlight-{lang}'>{html.escape(text[start:end])}</span>")
+        position = end
+    pieces.append(html.escape(text[position:]))
+    return ''.join(pieces)
+
+
+def process_mixed_language(text, language_mode='malay-english'):
+    """Process text and add HTML tags for language highlighting"""
+    if language_mode == 'english-only':
+        return f"<span class='highlight-english'>{html.escape(text)}</span>"
+    elif language_mode == 'malay-only':
+        return f"<span class='highlight-malay'>{html.escape(text)}</span>"
+    else:  # malay-english (mixed)
+        return render_spans(text, tag_spans(text))
+
+
+# --- Bulk Retagging of Stored Transcripts ---
+def stored_transcripts(path):
+    """
+    Yield (source, raw_transcription) from a directory's archive segments
+    (segment_*.seg) and its legacy transcription_*.txt files; the archive
+    is written next to the older files, so one directory may hold both.
+    """
+    if glob.glob(os.path.join(path, 'segment_*.seg')):
+        from archive import ArchiveReader
+        reader = ArchiveReader(path)
+        try:
+            for record in reader.records():
+                yield f"{record.session_id}#{record.seq}", record.raw_transcription
+        finally:
+            reader.close()
+
+    for filename in sorted(glob.glob(os.path.join(path, 'transcription_*.txt'))):
+        with open(filename, encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('Raw: '):
+                    yield os.path.basename(filename), line[5:].rstrip('\n')
+                    break
+
+
+# --- Main Entry Point ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Retag stored transcripts with Malay/English spans (JSON lines).")
+    parser.add_argument('path', help="Directory of archive segments and/or transcription_*.txt files")
+    parser.add_argument('--output', help="Write JSON lines here instead of stdout")
+    args = parser.parse_args()
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else None
+    count = 0
+    for source, text in stored_transcripts(args.path):
+        line = json.dumps({'source': source, 'text': text, 'spans': tag_spans(text)}, ensure_ascii=False)
+        print(line, file=out)
+        count += 1
+    if out:
+        out.close()
+        print(f"Retagged {count} transcripts into {args.output}")
@@ -0,0 +1,280 @@
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Worker Metrics ---
+# Minimal Prometheus-style counters, histograms and scrape-time gauges, with
+# no dependency beyond the standard library. Hot paths bind label values
+# once (metric.labels(...)) so recording a sample is a lock and an add.
+# serve() exposes everything as text on http://<host>:<port>/metrics.
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers sub-millisecond decode up to multi-second inference
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RTF_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Counter:
+    """Monotonic count, optionally split by labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = _CounterChild()
+            return child
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield self.name, _format_labels(self.labelnames, values), child.value
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', 'lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(Counter):
+    """Bucketed distribution (cumulative buckets, _sum and _count on scrape)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def labels(self, *values):
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = _HistogramChild(self.buckets)
+            return child
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            with child.lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, values, ('le', _format_value(float(bound))))
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class Gauge:
+    """Value read from a callback at scrape time (queue depth, in-flight, ...)."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, function):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def samples(self):
+        yield self.name, '', self.function()
+
+
+class RollingWindow:
+    """
+    Inference calls of the last `window` seconds, for load figures that
+    follow the current traffic rather than the whole process lifetime
+    (heartbeats, saturation checks).
+    """
+
+    def __init__(self, window=60.0):
+        self.window = window
+        self._calls = deque() # (monotonic time, model seconds, audio seconds, total wait, jobs)
+        self._lock = threading.Lock()
+
+    def add(self, model_seconds, audio_seconds, waits):
+        now = time.monotonic()
+        with self._lock:
+            self._calls.append((now, model_seconds, audio_seconds, sum(waits), len(waits)))
+            self._prune(now)
+
+    def _prune(self, now):
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+
+    def snapshot(self):
+        """rtf (model / audio time), avg_wait_ms and chunk count over the window."""
+        with self._lock:
+            self._prune(time.monotonic())
+            calls = list(self._calls)
+        model = sum(call[1] for call in calls)
+        audio = sum(call[2] for call in calls)
+        waited = sum(call[3] for call in calls)
+        jobs = sum(call[4] for call in calls)
+        return {
+            'rtf': round(model / audio, 4) if audio else None,
+            'avg_wait_ms': round(waited / jobs * 1000, 1) if jobs else 0.0,
+            'chunks': jobs,
+            'audio_seconds': round(audio, 2),
+        }
+
+
+class MetricsRegistry:
+    """All metrics of one worker process, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+        self._server = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, function):
+        return self.register(Gauge(name, documentation, function))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                for name, labels, value in metric.samples():
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+            except Exception:
+                logger.exception("Failed to collect metric %s", metric.name)
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve /metrics from a daemon thread; returns the HTTP server."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class WorkerMetrics:
+    """The metric set shared by the worker engine and its inference runtime."""
+
+    STAGES = ('decode', 'vad', 'queue_wait', 'inference', 'postprocess', 'emit', 'persist', 'storage_write')
+
+    def __init__(self, registry=None, window=60.0):
+        self.registry = registry or MetricsRegistry()
+        self.recent = RollingWindow(window)
+        r = self.registry
+        self.chunks_received = r.counter('asr_chunks_received_total', "Audio chunks received from the relay")
+        self.chunks_skipped = r.counter('asr_chunks_skipped_total', "Chunks answered without inference (VAD silence)")
+        self.chunks_dropped = r.counter('asr_chunks_dropped_total', "Chunks dropped or rejected by the job queue")
+        self.errors = r.counter('asr_errors_total', "Errors reported back to the browser")
+        self.results = r.counter('asr_results_total', "Transcriptions emitted", ('final',))
+        self.audio_seconds = r.counter('asr_audio_seconds_total', "Seconds of audio run through the model")
+        self.stage_seconds = r.histogram('asr_stage_seconds', "Time spent per pipeline stage", ('stage',))
+        self.model_rtf = r.histogram('asr_model_rtf', "Model time / audio duration per inference call",
+                                     buckets=RTF_BUCKETS)
+
+        self.stage = {stage: self.stage_seconds.labels(stage) for stage in self.STAGES}
+        self.final_results = self.results.labels('true')
+        self.partial_results = self.results.labels('false')
+
+    def gauge(self, name, documentation, function):
+        return self.registry.gauge(name, documentation, function)
+
+    def observe_inference(self, seconds, audio_seconds, waits=()):
+        """One model call: its duration, the audio it covered and each job's queue wait."""
+        queue_wait = self.stage['queue_wait']
+        for wait in waits:
+            queue_wait.observe(wait)
+        self.stage['inference'].observe(seconds)
+        self.recent.add(seconds, audio_seconds, waits)
+        if audio_seconds > 0:
+            self.audio_seconds.inc(audio_seconds)
+            self.model_rtf.observe(seconds / audio_seconds)
@@ -0,0 +1,166 @@
+import threading
+from math import gcd
+from functools import lru_cache
+
+import numpy as np
+
+from audio_payload import DEFAULT_SAMPLE_RATE, check_sample_rate, read_audio_payload
+
+# --- Shared Audio Preprocessing ---
+# Every model here expects 16 kHz mono float32, but browsers (mobile ones
+# especially) capture at 44.1/48 kHz and may send several channels. Each
+# chunk is brought to that format in one pass:
+#
+#   int16 -> float, downmix -> DC removal -> polyphase resample -> clamp
+#
+# The resampler is a windowed-sinc polyphase filter bank, designed once per
+# (input rate, output rate) pair and cached. It works on strided views of
+# the input (no upsampled or gathered copies), and the intermediate
+# buffers are preallocated per thread and reused across chunks; the only
+# allocation per chunk is the output array that travels with the job.
+
+
+class PolyphaseResampler:
+    """
+    Rational-ratio resampler (up/down after dividing by the gcd), equivalent
+    to zero-stuffing by `up`, low-pass filtering and keeping every `down`-th
+    sample, without ever building the upsampled signal.
+    """
+
+    def __init__(self, orig_sr, target_sr, half_width=10, beta=5.0):
+        divisor = gcd(orig_sr, target_sr)
+        self.up = target_sr // divisor
+        self.down = orig_sr // divisor
+        max_rate = max(self.up, self.down)
+
+        # Kaiser-windowed sinc, cutoff at the lower Nyquist, unit DC gain per phase
+        half_length = half_width * max_rate
+        n = np.arange(-half_length, half_length + 1)
+        taps = np.sinc(n / max_rate) * np.kaiser(len(n), beta)
+        taps *= self.up / taps.sum()
+        self.delay = half_length
+
+        # Phase r holds taps r, r + up, r + 2*up, ... (zero-padded to equal length)
+        self.width = -(-len(taps) // self.up)
+        padded = np.zeros(self.width * self.up)
+        padded[:len(taps)] = taps
+        self.phases = padded.reshape(self.width, self.up).T.astype(np.float32)
+
+    def output_length(self, length):
+        return -(-length * self.up // self.down)
+
+    def padded_length(self, length):
+        return length + (self.width - 1) + self.delay // self.up + 2
+
+    def __call__(self, audio, out=None, padded=None, product=None):
+        """Resample float32 `audio`; out/padded/product may be preallocated float32 buffers."""
+        up, down, width = self.up, self.down, self.width
+        n_out = self.output_length(len(audio))
+        out = np.zeros(n_out, dtype=np.float32) if out is None else out[:n_out]
+        out.fill(0.0)
+        if n_out == 0:
+            return out
+
+        # Zero padding so every tap of every output lands inside the buffer
+        left = width - 1
+        padded = _buffer(padded, self.padded_length(len(audio)))
+        padded[:left] = 0.0
+        padded[left:left + len(audio)] = audio
+        padded[left + len(audio):] = 0.0
+        product = _buffer(product, -(-n_out // up))
+
+        # Outputs j, j + up, j + 2*up, ... share one phase, and their input
+        # positions advance by `down`, so each tap is one strided view
+        for j in range(min(up, n_out)):
+            t = j * down + self.delay
+            start, phase = t // up + left, self.phases[t % up]
+            targets = out[j::up]
+            count = len(targets)
+            step = product[:count]
+            for k in range(width):
+                coefficient = phase[k]
+                if coefficient == 0.0:
+                    continue
+                first = start - k
+                np.multiply(padded[first:first + count * down:down], coefficient, out=step)
+                targets += step
+        return out
+
+
+def _buffer(buffer, length):
+    if buffer is not None and len(buffer) >= length:
+        return buffer[:length]
+    return np.empty(length, dtype=np.float32)
+
+
+@lru_cache(maxsize=16)
+def get_resampler(orig_sr, target_sr):
+    """Filter banks are designed once per rate pair."""
+    return PolyphaseResampler(orig_sr, target_sr)
+
+
+def resample(audio, orig_sr, target_sr=DEFAULT_SAMPLE_RATE):
+    """Polyphase resample float32 mono audio to `target_sr` (no-op at the same rate)."""
+    if orig_sr == target_sr:
+        return audio
+    return get_resampler(orig_sr, target_sr)(np.ascontiguousarray(audio, dtype=np.float32))
+
+
+class AudioPreprocessor:
+    """
+    Turns decoded PCM of any rate, channel count and sample type into mono
+    float32 at `target_sr`, DC-free and clamped to [-1, 1]. Scratch buffers
+    live per thread and grow to the largest chunk seen.
+    """
+
+    def __init__(self, target_sr=DEFAULT_SAMPLE_RATE, remove_dc=True):
+        self.target_sr = target_sr
+        self.remove_dc = remove_dc
+        self._local = threading.local()
+
+    def _scratch(self, name, length):
+        buffer = getattr(self._local, name, None)
+        if buffer is None or len(buffer) < length:
+            buffer = np.empty(max(length, 16000), dtype=np.float32)
+            setattr(self._local, name, buffer)
+        return buffer[:length]
+
+    def process(self, samples, sample_rate, channels=1):
+        """(float32 mono audio at target_sr, target_sr) from interleaved int16/float samples."""
+        check_sample_rate(sample_rate)
+        frames = len(samples) // channels
+        mono = self._scratch('mono', frames)
+        if channels > 1:
+            np.mean(samples[:frames * channels].reshape(frames, channels), axis=1, dtype=np.float32, out=mono)
+        else:
+            mono[:] = samples
+        if samples.dtype == np.int16:
+            mono *= 1.0 / 32768.0
+        if self.remove_dc and frames:
+            mono -= mono.mean()
+
+        target_sr = self.target_sr or sample_rate
+        if sample_rate == target_sr:
+            audio = mono.copy() # The scratch buffer is reused by the next chunk
+        else:
+            resampler = get_resampler(sample_rate, target_sr)
+            n_out = resampler.output_length(frames)
+            audio = resampler(mono, np.empty(n_out, dtype=np.float32),
+                              self._scratch('padded', resampler.padded_length(frames)),
+                              self._scratch('product', n_out))
+        np.clip(audio, -1.0, 1.0, out=audio)
+        return audio, target_sr
+
+    def payload(self, data):
+        """Preprocess an 'audio_to_python' payload (binary frame or JSON floats)."""
+        samples, sample_rate, channels = read_audio_payload(data)
+        return self.process(samples, sample_rate, channels)
+
+
+def to_int16(audio, out=None):
+    """Clamp and round float audio into int16 PCM (into `out` when given)."""
+    out = np.empty(len(audio), dtype=np.int16) if out is None else out[:len(audio)]
+    scaled = np.clip(audio, -1.0, 1.0) * 32767.0
+    np.rint(scaled, out=scaled)
+    out[:] = scaled
+    return out
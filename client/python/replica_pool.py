@@ -0,0 +1,165 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from asr_backends import ASRBackend, SAMPLE_RATE
+
+# --- Multi-Replica Inference ---
+# The relay keeps one socket per group, so a group's throughput used to be
+# one model instance transcribing serially. ReplicaPool keeps that single
+# connection but runs N copies of the backend in separate processes:
+#
+#   REPLICAS=auto REPLICA_THREADS=4 python transcriber-base.py
+#
+# gives a 32-core box 8 replicas of 4 torch threads each. Every call goes
+# to the replica with the least audio outstanding; the worker runs one
+# inference thread per replica and releases results in per-session order
+# (worker_runtime.SessionOrder). Backend counters (stats(), e.g. cascade
+# escalations) come back with every call and are merged across replicas.
+
+logger = logging.getLogger(__name__)
+
+REPLICAS = os.getenv("REPLICAS", "1") # a count, or 'auto' = cores // REPLICA_THREADS
+REPLICA_THREADS = int(os.getenv("REPLICA_THREADS", "0")) # torch threads per replica (0 = cores // replicas)
+
+
+def replica_budget(replicas=REPLICAS, threads=REPLICA_THREADS, cores=None):
+    """(replicas, threads per replica) that fit the core budget."""
+    cores = cores or os.cpu_count() or 1
+    if replicas == 'auto':
+        replicas = max(1, cores // (threads or 4))
+    replicas = max(1, int(replicas))
+    threads = threads or max(1, cores // replicas)
+    return replicas, threads
+
+
+# --- Replica Process ---
+_backend = None
+
+
+def _init_replica(backend, threads):
+    global _backend
+    # Before torch is imported, so OpenMP/MKL size their pools to the budget too
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    os.environ.setdefault("MKL_NUM_THREADS", str(threads))
+    import devices
+    devices.CPU_THREADS = threads
+    _backend = backend
+
+
+def _call(method, *args):
+    return getattr(_backend, method)(*args)
+
+
+def _call_counted(method, *args):
+    """A call plus the replica's stats() after it, so counters need no round trip of their own."""
+    return getattr(_backend, method)(*args), _backend.stats()
+
+
+class _Replica:
+    __slots__ = ('index', 'executor', 'outstanding', 'calls', 'stats')
+
+    def __init__(self, index, executor):
+        self.index = index
+        self.executor = executor
+        self.outstanding = 0.0 # Seconds of audio submitted and not yet answered
+        self.calls = 0
+        self.stats = {} # The backend's stats() as of its last call
+
+
+class ReplicaPool(ASRBackend):
+    """
+    N processes each holding its own copy of `backend`, behind the usual
+    backend interface. `backend` is passed unloaded and loaded in every
+    replica. Streaming backends keep per-session state in one process and
+    can't be replicated.
+    """
+
+    name = "replicas"
+
+    def __init__(self, backend, replicas=2, threads=None):
+        if backend.streaming:
+            raise ValueError(f"{backend.describe()} is a streaming backend and can't be replicated")
+        super().__init__(backend.model_name)
+        self.backend = backend
+        self.replicas, self.threads = replica_budget(replicas, threads or 0)
+        self._pool = []
+        self._info = ''
+        self._scope = ''
+        self._lock = threading.Lock()
+
+    def load(self):
+        context = multiprocessing.get_context('spawn')
+        self._pool = [
+            _Replica(index, ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_replica,
+                                                initargs=(self.backend, self.threads)))
+            for index in range(self.replicas)
+        ]
+        # Load every replica at once
+        self._broadcast('load')
+        self._info = self._pool[0].executor.submit(_call, 'runtime_info').result()
+        self._scope = self._pool[0].executor.submit(_call, 'cache_scope').result()
+        self.model = self.backend.describe()
+
+    def _run(self, seconds, method, *args):
+        with self._lock:
+            replica = min(self._pool, key=lambda r: (r.outstanding, r.calls))
+            replica.outstanding += seconds
+            replica.calls += 1
+        try:
+            result, replica.stats = replica.executor.submit(_call_counted, method, *args).result()
+            return result
+        finally:
+            with self._lock:
+                replica.outstanding -= seconds
+
+    def transcribe(self, audio, language_mode='malay-english'):
+        return self._run(len(audio) / SAMPLE_RATE, 'transcribe', audio, language_mode)
+
+    def transcribe_batch(self, audios, language_modes):
+        seconds = sum(len(audio) for audio in audios) / SAMPLE_RATE
+        return self._run(seconds, 'transcribe_batch', audios, language_modes)
+
+    def warm_up(self, seconds=1.0, passes=1, batch_size=1):
+        # Every replica has its own kernels and allocator to warm
+        self._broadcast('warm_up', seconds, passes, batch_size)
+
+    def _broadcast(self, method, *args):
+        """Run a call on every replica at once; the first failure is raised."""
+        futures = {r.executor.submit(_call_counted, method, *args): r for r in self._pool}
+        for future in wait(futures).done:
+            _, futures[future].stats = future.result()
+
+    def stats(self):
+        """The backend's counters summed over all replicas (as of each one's last call)."""
+        with self._lock:
+            stats_list = [r.stats for r in self._pool]
+        return self.backend.merge_stats(stats_list)
+
+    def register_metrics(self, metrics, stats=None):
+        self.backend.register_metrics(metrics, stats or self.stats)
+
+    def status(self):
+        """[(replica, outstanding audio seconds, calls)]"""
+        with self._lock:
+            return [(r.index, r.outstanding, r.calls) for r in self._pool]
+
+    def close(self):
+        for replica in self._pool:
+            replica.executor.submit(_call, 'close')
+            replica.executor.shutdown(wait=False, cancel_futures=False)
+        self._pool = []
+
+    def describe(self):
+        return self.backend.describe()
+
+    def cache_scope(self):
+        # The device/precision are only resolved inside the replicas
+        return self._scope or self.backend.cache_scope()
+
+    def runtime_info(self):
+        if self._info:
+            return f"{self._info}; {self.replicas} replicas"
+        return f"{self.replicas} replicas x {self.threads} threads"
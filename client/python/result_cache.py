@@ -0,0 +1,211 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+# --- Transcription Result Cache ---
+# Identical audio (reconnect retries, the final flush in mediaRecorder.onstop,
+# digital silence, looped hold music) is answered from a cache instead of a
+# full model pass. Keys hash the audio quantized to int16, so float noise
+# below one LSB doesn't defeat the cache, plus model name and language mode.
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(audio, model_name, language_mode):
+    """16-byte BLAKE2b digest of normalized PCM + model (with its device/precision) + language mode."""
+    if audio.dtype == np.int16:
+        pcm = audio
+    else:
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{model_name}\0{language_mode}\0".encode('utf-8'))
+    digest.update(np.ascontiguousarray(pcm).data)
+    return digest.digest()
+
+
+class ResultCache:
+    """
+    Bounded in-memory LRU of transcriptions with an optional on-disk tier.
+
+    Memory is capped by both `max_entries` and `max_bytes` (text size). With
+    `disk_path`, entries are also written to a SQLite file that survives
+    restarts; a disk hit is promoted back into memory. Disk writes are
+    queued and committed together every `flush_interval` seconds by a
+    writer thread with its own connection, so put() never waits on the
+    disk (past `max_pending` queued writes, new ones are dropped).
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=16 * 1024 * 1024, disk_path=None,
+                 flush_interval=1.0, max_pending=4096):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._db = None
+        self._db_lock = threading.Lock() # Lookups share one connection
+        self._pending = deque()          # (key, text, created) waiting for the writer
+        self._cond = threading.Condition()
+        self._closed = False
+        self._writer = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            # WAL: lookups keep reading while the writer commits
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, text TEXT, created REAL)")
+            self._db.commit()
+            self._writer = threading.Thread(target=self._write_disk, args=(disk_path,),
+                                            name="result-cache-writer", daemon=True)
+            self._writer.start()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_dropped = 0
+
+    @property
+    def persistent(self):
+        return self._db is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+
+        # Outside the memory lock, so other threads' memory hits don't wait on the disk
+        row = None
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute("SELECT text FROM results WHERE key = ?", (key,)).fetchone()
+
+        with self._lock:
+            if row is not None:
+                self.disk_hits += 1
+                self._remember(key, row[0])
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, text):
+        with self._lock:
+            self._remember(key, text)
+        if self._writer is not None:
+            with self._cond:
+                if len(self._pending) < self.max_pending:
+                    self._pending.append((key, text, time.time()))
+                else:
+                    self.disk_dropped += 1
+
+    def _write_disk(self, disk_path):
+        """Writer thread: commit queued entries in one transaction per `flush_interval`."""
+        db = sqlite3.connect(disk_path)
+        try:
+            while True:
+                with self._cond:
+                    if not self._closed:
+                        self._cond.wait(self.flush_interval)
+                    batch = list(self._pending)
+                    self._pending.clear()
+                    closed = self._closed
+                if batch:
+                    try:
+                        db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", batch)
+                        db.commit()
+                    except sqlite3.Error:
+                        logger.exception("Could not write %d result cache entries", len(batch))
+                elif closed:
+                    return
+        finally:
+            db.close()
+
+    def _remember(self, key, text):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = text
+        self._bytes += len(text)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'disk_dropped': self.disk_dropped,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        """Write the queued disk entries, then close the database."""
+        if self._writer is not None:
+            with self._cond:
+                self._closed = True
+                self._cond.notify()
+            self._writer.join()
+            self._writer = None
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+
+
+class CachedBackend:
+    """
+    Wraps any ASRBackend so transcribe()/transcribe_batch() consult the cache
+    first; only misses reach the model. Everything else (load, streaming
+    calls, describe, ...) is passed straight through to the wrapped backend.
+    """
+
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _key(self, audio, language_mode):
+        return cache_key(audio, self.backend.cache_scope(), language_mode)
+
+    def transcribe(self, audio, language_mode='malay-english'):
+        key = self._key(audio, language_mode)
+        text = self.cache.get(key)
+        if text is None:
+            text = self.backend.transcribe(audio, language_mode)
+            self.cache.put(key, text)
+        return text
+
+    def transcribe_batch(self, audios, language_modes):
+        keys = [self._key(audio, mode) for audio, mode in zip(audios, language_modes)]
+        texts = [self.cache.get(key) for key in keys]
+
+        misses = [i for i, text in enumerate(texts) if text is None]
+        if misses:
+            results = self.backend.transcribe_batch(
+                [audios[i] for i in misses],
+                [language_modes[i] for i in misses]
+            )
+            for i, text in zip(misses, results):
+                texts[i] = text
+                self.cache.put(keys[i], text)
+        return texts
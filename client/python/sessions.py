@@ -0,0 +1,212 @@
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SessionPool:
+    """
+    Per-browserSocketId state that lives across chunks.
+
+    `factory(session_id)` builds the state on first use. Sessions untouched
+    for `idle_timeout` seconds, or pushed out by `max_sessions` (least
+    recently used first), are handed back by evict_idle() so the caller can
+    flush them; end-of-session uses pop().
+    """
+
+    def __init__(self, factory, idle_timeout=30.0, max_sessions=1000):
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+
+        self._sessions = OrderedDict() # session_id -> [state, last_active]
+        self._overflow = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def get(self, session_id):
+        """Return the session's state, creating it if needed, and mark it active."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = [self.factory(session_id), now]
+                self._sessions[session_id] = entry
+                while len(self._sessions) > self.max_sessions:
+                    self._overflow.append(self._sessions.popitem(last=False))
+            else:
+                entry[1] = now
+                self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def pop(self, session_id):
+        """Remove and return a session's state (None if unknown)."""
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        return entry[0] if entry else None
+
+    def evict_idle(self, now=None):
+        """Remove idle or over-capacity sessions and return [(session_id, state)]."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            evicted = [(session_id, entry[0]) for session_id, entry in self._overflow]
+            self._overflow = []
+            # Ordered by last activity, so stop at the first live session
+            while self._sessions:
+                session_id, entry = next(iter(self._sessions.items()))
+                if now - entry[1] < self.idle_timeout:
+                    break
+                del self._sessions[session_id]
+                evicted.append((session_id, entry[0]))
+        return evicted
+
+
+class AudioRing:
+    """
+    Fixed-capacity float32 ring holding a session's most recent audio.
+
+    The array is allocated once; appends past capacity overwrite the
+    oldest samples. `written` counts every sample ever appended, so
+    `first` (the session-time sample index of the oldest sample held)
+    keeps advancing as audio is dropped.
+    """
+
+    __slots__ = ('data', 'start', 'size', 'written')
+
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.start = 0   # index of the oldest sample in `data`
+        self.size = 0
+        self.written = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    @property
+    def first(self):
+        return self.written - self.size
+
+    def append(self, audio):
+        capacity = len(self.data)
+        count = len(audio)
+        self.written += count
+        if capacity == 0:
+            return
+        if count >= capacity:
+            self.data[:] = audio[count - capacity:]
+            self.start, self.size = 0, capacity
+            return
+        end = (self.start + self.size) % capacity
+        head = min(count, capacity - end)
+        self.data[end:end + head] = audio[:head]
+        self.data[:count - head] = audio[head:]
+        overflow = max(0, self.size + count - capacity)
+        self.start = (self.start + overflow) % capacity
+        self.size += count - overflow
+
+    def discard(self, count):
+        """Drop the oldest `count` samples."""
+        count = min(count, self.size)
+        if count > 0:
+            self.start = (self.start + count) % len(self.data)
+            self.size -= count
+
+    def clear(self):
+        self.discard(self.size)
+
+    def array(self, last=None):
+        """The newest `last` samples (all by default), oldest first. A view unless they wrap."""
+        count = self.size if last is None else min(last, self.size)
+        begin = (self.start + self.size - count) % max(1, len(self.data))
+        if begin + count <= len(self.data):
+            return self.data[begin:begin + count]
+        return np.concatenate((self.data[begin:], self.data[:begin + count - len(self.data)]))
+
+
+class Session:
+    """
+    Everything a worker keeps for one browser session between chunks.
+
+    Socket.IO handlers run on their own threads, so two chunks of a session
+    can be handled at once and in either order. Handlers hold `lock` while
+    they touch the session and call wait_turn() with the relay's sequence
+    number so chunks are decoded one at a time, in the order they were sent.
+    """
+
+    __slots__ = ('session_id', 'language_mode', 'last_active', 'decoder', 'vad', 'state', 'seq', 'lock')
+
+    def __init__(self, session_id, state=None):
+        self.session_id = session_id
+        self.language_mode = 'malay-english'
+        self.last_active = time.monotonic()
+        self.decoder = None # e.g. a WebmStreamDecoder, created on first use
+        self.vad = None     # the session's VAD noise floor, created on first use
+        self.state = state  # owner-specific (FLAC stream, ...)
+        self.seq = None     # next chunk expected (None until the session has handled one)
+        self.lock = threading.Condition()
+
+    def wait_turn(self, seq, timeout=1.0):
+        """
+        With `lock` held, wait (up to `timeout` seconds) until chunk `seq`
+        is the next one expected. Returns how many chunks before it were
+        given up on (0 when none), or None if `seq` comes after a later
+        chunk was already handled and should be dropped. A session's first
+        chunk is taken as it comes: a session can start mid-recording (a
+        worker joining late, a re-created session, a relay seq jump).
+        """
+        if seq is None:
+            return 0 # Relay without sequence numbers: arrival order
+        if self.seq is None:
+            self.seq = seq + 1
+            self.lock.notify_all()
+            return 0
+        if seq < self.seq:
+            return None
+        self.lock.wait_for(lambda: self.seq >= seq, timeout)
+        if seq < self.seq:
+            return None
+        skipped = seq - self.seq
+        self.seq = seq + 1
+        self.lock.notify_all() # Woken handlers run once this one releases the lock
+        return skipped
+
+
+class SessionRegistry(SessionPool):
+    """
+    SessionPool of Session objects under a global memory cap.
+
+    `session_bytes` is what each live session preallocates elsewhere (e.g.
+    a streaming backend's rolling audio ring); with `max_bytes` the number
+    of live sessions is capped at max_bytes // session_bytes, least
+    recently used pushed out first. `state(session_id)` builds the
+    owner-specific part of a new session.
+    """
+
+    def __init__(self, idle_timeout=30.0, max_sessions=1000, max_bytes=None, session_bytes=0, state=None):
+        if max_bytes and session_bytes:
+            max_sessions = max(1, min(max_sessions, max_bytes // session_bytes))
+        self.session_bytes = session_bytes
+        self.state = state
+        super().__init__(self._new_session, idle_timeout, max_sessions)
+
+    def _new_session(self, session_id):
+        return Session(session_id, self.state(session_id) if self.state else None)
+
+    def get(self, session_id):
+        session = super().get(session_id)
+        session.last_active = time.monotonic()
+        return session
@@ -0,0 +1,165 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+# --- Persistence Off The Hot Path ---
+# Inference threads hand finished chunks to a BackgroundWriter and emit the
+# result immediately; the writer thread batches records and commits them
+# together, so disk latency never shows up in what the browser waits for.
+
+FSYNC_POLICIES = ('none', 'batch')
+
+
+class ChunkRecord:
+    """One transcribed chunk waiting to be persisted."""
+
+    __slots__ = ('session_id', 'timestamp', 'audio', 'sample_rate',
+                 'raw_transcription', 'processed_transcription')
+
+    def __init__(self, session_id, audio, sample_rate, raw_transcription, processed_transcription=None):
+        self.session_id = session_id
+        self.timestamp = datetime.now()
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.raw_transcription = raw_transcription
+        self.processed_transcription = processed_transcription
+
+
+class ChunkFileStore:
+    """Writes each chunk as audio_<timestamp>.wav + transcription_<timestamp>.txt."""
+
+    def __init__(self, upload_dir="audio_uploads"):
+        self.upload_dir = upload_dir
+        os.makedirs(self.upload_dir, exist_ok=True)
+
+    def write_batch(self, records, fsync=False):
+        for record in records:
+            timestamp = record.timestamp.strftime("%Y%m%d_%H%M%S")
+
+            # Flushed streaming results have no audio of their own
+            if len(record.audio):
+                audio_filename = os.path.join(self.upload_dir, f"audio_{timestamp}.wav")
+                with open(audio_filename, 'wb') as f:
+                    sf.write(f, record.audio, record.sample_rate, format='WAV')
+                    if fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+
+            txt_filename = os.path.join(self.upload_dir, f"transcription_{timestamp}.txt")
+            with open(txt_filename, 'w', encoding='utf-8') as f:
+                f.write(f"Raw: {record.raw_transcription}\n")
+                if record.processed_transcription is not None:
+                    f.write(f"Processed: {record.processed_transcription}\n")
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+        if fsync and records:
+            # Make the new directory entries durable once per batch
+            dir_fd = os.open(self.upload_dir, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def close(self):
+        pass
+
+
+class BackgroundWriter:
+    """
+    Bounded queue + writer thread in front of a store (group commit).
+
+    Records are collected for up to `flush_interval` seconds (or `max_batch`
+    records) and handed to store.write_batch() together. When the queue is
+    full the record is dropped and counted rather than stalling inference.
+    close() drains everything still queued before returning.
+    """
+
+    def __init__(self, store, maxsize=256, max_batch=32, flush_interval=0.5, fsync='none', metrics=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}'. Choose from: {', '.join(FSYNC_POLICIES)}")
+        self.store = store
+        self.maxsize = maxsize
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.fsync = fsync == 'batch'
+        self.metrics = metrics
+
+        self._records = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="storage-writer", daemon=True)
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, record):
+        """Queue a record; returns False if it was dropped because the queue is full."""
+        with self._cond:
+            if self._closed or len(self._records) >= self.maxsize:
+                self.dropped += 1
+                return False
+            self._records.append(record)
+            if len(self._records) >= self.max_batch:
+                self._cond.notify()
+        return True
+
+    def _next_batch(self):
+        with self._cond:
+            deadline = time.monotonic() + self.flush_interval
+            while not self._closed and len(self._records) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(len(self._records), self.max_batch)
+            return [self._records.popleft() for _ in range(count)], self._closed
+
+    def _run(self):
+        while True:
+            batch, closed = self._next_batch()
+            if batch:
+                started = time.monotonic()
+                try:
+                    self.store.write_batch(batch, fsync=self.fsync)
+                    self.written += len(batch)
+                    self.batches += 1
+                except Exception:
+                    self.failed += len(batch)
+                    logger.exception("Error saving %d audio/text record(s)", len(batch))
+                if self.metrics is not None:
+                    self.metrics.stage['storage_write'].observe(time.monotonic() - started)
+            elif closed:
+                return
+
+    def close(self):
+        """Stop accepting records, write everything queued, then close the store."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.store.close()
+
+    def stats(self):
+        return {
+            'queued': len(self._records),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+        }
@@ -1,13 +1,19 @@
 import socketio
 import numpy as np
-from pydub import AudioSegment
+from preprocess import AudioPreprocessor, to_int16
+from sessions import SessionRegistry
+from webm_audio import MissingHeader, WebmStreamDecoder, decode_encoded, is_encoded
+import soundfile as sf
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import os
 import time
-import traceback
-from dotenv import load_dotenv # <-- ADD THIS
+import logging
+import threading
+from dotenv import load_dotenv
 
 # --- Configuration ---
+load_dotenv() # Load from .env file
 NODE_SERVER_URL = os.getenv("NODE_SERVER_URL", "http://localhost:3000")
 UPLOAD_DIR = "audio_uploads_flac"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -15,29 +21,130 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 # This key MUST match the one in your server-latest.js
 PYTHON_SECRET_KEY = os.getenv("PYTHON_SECRET_KEY")
 
+# 'chunk'   - one .flac per chunk, compressed on a process pool (default)
+# 'session' - one continuous .flac per browser session, finalized on idle/disconnect
+STORE_MODE = os.getenv("STORE_MODE", "chunk")
+FLAC_WORKERS = int(os.getenv("FLAC_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "30"))
+# Rate the FLAC files are written at (0 keeps whatever rate the browser sent)
+STORE_SAMPLE_RATE = int(os.getenv("STORE_SAMPLE_RATE", "16000"))
+# DEBUG logs every chunk; INFO only lifecycle events and saved files
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+logger = logging.getLogger("store")
+
 # Add a quick check to make sure the key loaded
 if not PYTHON_SECRET_KEY:
     raise ValueError("PYTHON_SECRET_KEY not found in .env file. Please create it.")
+
 # --- Initialize Socket.IO Client ---
 sio = socketio.Client()
 
+
+# --- FLAC Encoding (in-process via libsndfile, no ffmpeg) ---
+def encode_flac(flac_filename, pcm_bytes, sample_rate):
+    """Compress raw Int16 PCM to a FLAC file. Runs in a pool process."""
+    audio_int16 = np.frombuffer(pcm_bytes, dtype=np.int16)
+    sf.write(flac_filename, audio_int16, sample_rate, format='FLAC', subtype='PCM_16')
+    return flac_filename, len(pcm_bytes), os.path.getsize(flac_filename)
+
+
+def log_compression_stats(future):
+    try:
+        flac_filename, original_size_bytes, compressed_size_bytes = future.result()
+    except Exception as e:
+        logger.error("❌ An error occurred during FLAC encoding: %s", e)
+        return
+
+    logger.info("✅ Lossless FLAC file saved: %s (PCM %.2f KB -> FLAC %.2f KB, %.2f%%)",
+                flac_filename, original_size_bytes / 1024, compressed_size_bytes / 1024,
+                compressed_size_bytes / max(1, original_size_bytes) * 100)
+
+
+class FlacStream:
+    """One open FLAC file that a session's chunks are appended to."""
+
+    __slots__ = ('session_id', 'sample_rate', 'filename', 'file', 'frames', 'lock')
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.sample_rate = None
+        self.filename = None
+        self.file = None
+        self.frames = 0
+        self.lock = threading.Lock()
+
+    def append(self, audio_int16, sample_rate):
+        with self.lock:
+            # A rate change mid-session starts a new file
+            if self.file is not None and sample_rate != self.sample_rate:
+                self._finalize()
+            if self.file is None:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                self.filename = os.path.join(UPLOAD_DIR, f"session_{timestamp}_{self.session_id}.flac")
+                self.file = sf.SoundFile(self.filename, 'w', samplerate=sample_rate, channels=1,
+                                         format='FLAC', subtype='PCM_16')
+                self.sample_rate = sample_rate
+                self.frames = 0
+                logger.info("Opened session FLAC stream: %s", self.filename)
+            self.file.write(audio_int16)
+            self.frames += len(audio_int16)
+
+    def _finalize(self):
+        self.file.close()
+        self.file = None
+        seconds = self.frames / self.sample_rate
+        size = os.path.getsize(self.filename)
+        logger.info("✅ Session FLAC finalized: %s (%.1fs, %.2f KB, %.2f%% of PCM)",
+                    self.filename, seconds, size / 1024, size / max(1, self.frames * 2) * 100)
+
+    def finalize(self):
+        with self.lock:
+            if self.file is not None:
+                self._finalize()
+
+
+encoder_pool = None
+# Downmix, DC removal and resampling shared with the transcription workers
+preprocessor = AudioPreprocessor(STORE_SAMPLE_RATE or None)
+# Each session carries its FLAC stream and, for compressed input, its WebM decoder
+sessions = SessionRegistry(idle_timeout=SESSION_IDLE_TIMEOUT, state=FlacStream)
+
+
+def finalize_idle_streams():
+    """Close FLAC streams of sessions that stopped sending audio."""
+    while True:
+        time.sleep(5)
+        for _, session in sessions.evict_idle():
+            try:
+                session.state.finalize()
+            except Exception as e:
+                logger.error("❌ Failed to finalize FLAC stream: %s", e)
+
+
 # --- Socket.IO Event Handlers ---
 @sio.event
 def connect():
-    print("✅ Successfully connected to Node.js server.")
+    logger.info("✅ Successfully connected to Node.js server.")
     # Identify this client as part of the 'store' group
     sio.emit('identify_python', {
-        'secret': PYTHON_SECRET_KEY,
+        'apiKey': PYTHON_SECRET_KEY,
         'group': 'store'
     })
 
 @sio.event
 def connect_error(data):
-    print(f"❌ Connection to Node.js server failed: {data}")
+    logger.error("❌ Connection to Node.js server failed: %s", data)
 
 @sio.event
 def disconnect():
-    print("Disconnected from Node.js server.")
+    logger.info("Disconnected from Node.js server.")
+
+@sio.on('session_ended')
+def on_session_ended(data):
+    session = sessions.pop(data['browserSocketId'])
+    if session:
+        session.state.finalize()
 
 @sio.on('audio_to_python')
 def on_audio_to_python(data):
@@ -46,64 +153,80 @@ def on_audio_to_python(data):
     It compresses the audio to FLAC and saves it.
     """
     browser_socket_id = data['browserSocketId']
-    print(f"\n🎧 Received audio from browser client: {browser_socket_id} for storage...")
-    
+    logger.debug("🎧 Received audio from browser client: %s for storage", browser_socket_id)
+
     try:
-        # 1. Get the raw audio data (Float32)
-        audio_float32 = np.array(data['audioFloat32'], dtype=np.float32)
-        
-        # 2. Convert from Float32 to Int16 PCM
-        # pydub works with raw bytes, and 16-bit PCM is standard.
-        audio_int16 = (audio_float32 * 32767).astype(np.int16)
-
-        # 3. Create a pydub AudioSegment from the raw data
-        # We must provide the exact parameters of the incoming audio.
-        audio_segment = AudioSegment.from_raw(
-            audio_int16.tobytes(),
-            sample_width=2,         # 2 bytes = 16-bit
-            frame_rate=16000,       # 16kHz from browser
-            channels=1              # Mono from browser
-        )
-        
-        # 4. Define filename and export to FLAC
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # 1. Normalize to mono at the storage rate, then clamp to Int16 PCM,
+        #    one chunk of a session at a time and in the order they were sent
+        session = sessions.get(browser_socket_id)
+        with session.lock:
+            skipped = session.wait_turn(data.get('seq'))
+            if skipped is None:
+                logger.warning("Dropping chunk %s from %s: it arrived after newer audio",
+                               data.get('seq'), browser_socket_id)
+                return
+            if is_encoded(data):
+                if session.decoder is None:
+                    session.decoder = WebmStreamDecoder()
+                elif skipped:
+                    session.decoder.resync()
+                try:
+                    samples, rate = decode_encoded(data, session.decoder)
+                except MissingHeader as e:
+                    logger.warning("%s; not storing %s until it starts a new recording", e, browser_socket_id)
+                    return
+                for warning in session.decoder.warnings:
+                    logger.warning("%s: %s", browser_socket_id, warning)
+                if not len(samples):
+                    return
+                audio, sample_rate = preprocessor.process(samples, rate)
+            else:
+                audio, sample_rate = preprocessor.payload(data)
+            audio_int16 = to_int16(audio)
+
+            # 2a. Session mode: append to the session's open FLAC stream
+            if STORE_MODE == 'session':
+                session.state.append(audio_int16, sample_rate)
+                return
+
+        # 2b. Chunk mode: compress to its own file on the encoder pool
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         flac_filename = os.path.join(UPLOAD_DIR, f"audio_{timestamp}_{browser_socket_id[:5]}.flac")
-        
-        print(f"Compressing to FLAC: {flac_filename}...")
-        
-        # This one line does the lossless compression, as you described.
-        audio_segment.export(flac_filename, format="flac")
-        
-        print(f"✅ Lossless FLAC file saved.")
-
-        # --- Optional: Show compression results ---
-        original_size_bytes = len(audio_int16.tobytes())
-        compressed_size_bytes = os.path.getsize(flac_filename)
-        
-        if original_size_bytes > 0:
-            print(f"--- Compression Stats ---")
-            print(f"  Original PCM size:    {original_size_bytes / 1024:.2f} KB")
-            print(f"  Compressed FLAC size: {compressed_size_bytes / 1024:.2f} KB")
-            print(f"  Ratio (FLAC/PCM):     {(compressed_size_bytes / original_size_bytes) * 100:.2f}%")
+        logger.debug("Compressing to FLAC: %s", flac_filename)
+        future = encoder_pool.submit(encode_flac, flac_filename, audio_int16.tobytes(), sample_rate)
+        future.add_done_callback(log_compression_stats)
 
-    except Exception as e:
-        print(f"❌ An error occurred during audio processing/saving: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("❌ An error occurred during audio processing/saving")
 
 # --- Main Entry Point ---
 if __name__ == '__main__':
-    print("🚀 Starting FLAC Storage Client...")
-    print(f"Will save compressed audio to: {UPLOAD_DIR}")
-    print("NOTE: This script requires 'pydub' (pip install pydub) and 'ffmpeg'.")
-    
+    logging.basicConfig(
+        level=getattr(logging, LOG_LEVEL.upper(), logging.INFO),
+        format="%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+    )
+    logger.info("🚀 Starting FLAC Storage Client...")
+    logger.info("Will save compressed audio to: %s (mode: %s)", UPLOAD_DIR, STORE_MODE)
+
+    threading.Thread(target=finalize_idle_streams, daemon=True).start()
+    if STORE_MODE != 'session':
+        encoder_pool = ProcessPoolExecutor(max_workers=FLAC_WORKERS)
+        logger.info("FLAC encoder pool: %d processes", FLAC_WORKERS)
+
     while True:
         try:
-            print(f"Attempting to connect to Node.js server at {NODE_SERVER_URL}...")
+            logger.info("Attempting to connect to Node.js server at %s...", NODE_SERVER_URL)
             sio.connect(NODE_SERVER_URL, transports=['websocket'])
             sio.wait()
         except socketio.exceptions.ConnectionError as e:
-            print(f"Connection failed: {e}. Retrying in 5 seconds...")
+            logger.warning("Connection failed: %s. Retrying in 5 seconds...", e)
             time.sleep(5)
         except KeyboardInterrupt:
-            print("\n👋 Shutting down storage client...")
-            break
\ No newline at end of file
+            logger.info("👋 Shutting down storage client...")
+            break
+
+    # Make sure every file on disk is a complete FLAC
+    for _, session in sessions.evict_idle(now=float('inf')):
+        session.state.finalize()
+    if encoder_pool:
+        encoder_pool.shutdown(wait=True)
@@ -0,0 +1,16 @@
+import os
+from asr_backends import WhisperBackend
+from cascade import CascadeBackend
+from worker_engine import run_worker
+
+# --- Configuration ---
+# Every chunk goes through the small model; only low-confidence ones reach
+# the large one (thresholds: CASCADE_MIN_LOGPROB, CASCADE_MAX_COMPRESSION,
+# CASCADE_NO_SPEECH in cascade.py)
+CASCADE_SMALL = os.getenv("CASCADE_SMALL", "base")
+CASCADE_LARGE = os.getenv("CASCADE_LARGE", "large")
+
+# --- Main Entry Point ---
+if __name__ == '__main__':
+    # Both models load in this process, on the GPU when there is one
+    run_worker(CascadeBackend(WhisperBackend(CASCADE_SMALL), WhisperBackend(CASCADE_LARGE)), group='whisper')
@@ -0,0 +1,13 @@
+from asr_backends import NemoBackend
+from worker_engine import run_worker
+
+# --- Configuration ---
+# Choose one of the available models based on your needs:
+# - 'stt_en_conformer_ctc_small'  (fastest, lower accuracy)
+# - 'stt_en_conformer_ctc_medium' (balanced)
+# - 'stt_en_conformer_ctc_large'  (slowest, highest accuracy)
+MODEL_NAME = "stt_en_conformer_ctc_small"
+
+# --- Main Entry Point ---
+if __name__ == '__main__':
+    run_worker(NemoBackend(MODEL_NAME), group='wave2vec')
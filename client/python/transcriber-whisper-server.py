@@ -0,0 +1,22 @@
+import os
+from asr_backends import WhisperServerBackend
+from worker_engine import run_worker
+
+# --- Configuration ---
+# whisper.cpp servers started as in note-scribble.md (ggml Malay models, -l ms)
+WHISPER_SERVERS = os.getenv("WHISPER_SERVERS", "http://127.0.0.1:8011,http://127.0.0.1:8012")
+
+# Concurrent sessions are fanned out over the servers in one batch
+MAX_BATCH_SIZE = 8
+BATCH_WINDOW_MS = 30
+
+# --- Main Entry Point ---
+if __name__ == '__main__':
+    # Inference happens in the servers, so a light warm-up is enough
+    run_worker(
+        WhisperServerBackend(WHISPER_SERVERS),
+        group='whisper',
+        max_batch_size=MAX_BATCH_SIZE,
+        batch_window_ms=BATCH_WINDOW_MS,
+        warm_up_passes=1
+    )
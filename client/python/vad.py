@@ -0,0 +1,126 @@
+import threading
+
+import numpy as np
+
+# --- Voice Activity Detection ---
+# A cheap, fully vectorized gate that runs before any model sees a chunk.
+# Frames are scored on log energy and zero-crossing rate against an adaptive
+# noise floor; chunks with no speech are skipped outright and speech chunks
+# are trimmed of leading/trailing silence.
+
+EPSILON = 1e-10
+
+
+class NoiseFloor:
+    """Adaptive background level (dBFS) of one audio stream, e.g. one browser session."""
+
+    __slots__ = ('db',)
+
+    def __init__(self, db):
+        self.db = db
+
+
+def frame_view(audio, frame_length):
+    """Non-overlapping frames as a (n_frames, frame_length) view (tail dropped)."""
+    n_frames = len(audio) // frame_length
+    return audio[:n_frames * frame_length].reshape(n_frames, frame_length)
+
+
+class EnergyVAD:
+    """
+    Energy + zero-crossing-rate VAD with an adaptive noise floor.
+
+    A frame is speech when its energy is `margin_db` above the noise floor
+    (and above `min_energy_db`), unless it looks like broadband noise: a
+    zero-crossing rate above `max_zcr` needs another 10 dB to count. Speech
+    frames are extended by `hangover_ms` on both sides so word edges and
+    short pauses survive trimming.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, margin_db=12.0,
+                 min_energy_db=-55.0, max_zcr=0.35, min_speech_ms=200,
+                 hangover_ms=300, noise_adapt=0.1):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.min_energy_db = min_energy_db
+        self.max_zcr = max_zcr
+        self.min_speech_frames = max(1, int(min_speech_ms / frame_ms))
+        self.hangover_frames = int(hangover_ms / frame_ms)
+        self.noise_adapt = noise_adapt
+        # Used when the caller doesn't keep a floor per stream (see new_floor())
+        self.noise_floor = NoiseFloor(min_energy_db)
+
+        self._lock = threading.Lock() # Counters are shared by every caller
+        self.chunks_seen = 0
+        self.chunks_skipped = 0
+        self.seconds_in = 0.0
+        self.seconds_removed = 0.0
+
+    def frame_features(self, audio):
+        """Per-frame log energy (dBFS) and zero-crossing rate."""
+        frames = frame_view(audio, self.frame_length)
+        energy_db = 10 * np.log10(np.mean(np.square(frames, dtype=np.float32), axis=1) + EPSILON)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.frame_length
+        return energy_db, zcr
+
+    def new_floor(self):
+        """A fresh noise floor for one stream; concurrent streams each need their own."""
+        return NoiseFloor(self.min_energy_db)
+
+    def speech_mask(self, audio, floor=None):
+        """Boolean speech flag per frame (hangover applied); adapts `floor`."""
+        floor = floor or self.noise_floor
+        energy_db, zcr = self.frame_features(audio)
+        if not len(energy_db):
+            return energy_db.astype(bool)
+
+        # The quietest tenth of the chunk tracks the background level: follow
+        # it down immediately, but rise slowly so long speech isn't absorbed
+        background = float(np.percentile(energy_db, 10))
+        if background < floor.db:
+            floor.db = background
+        else:
+            floor.db += self.noise_adapt * (background - floor.db)
+        threshold = max(floor.db + self.margin_db, self.min_energy_db)
+
+        mask = (energy_db > threshold) & ((zcr < self.max_zcr) | (energy_db > threshold + 10))
+        if self.hangover_frames and mask.any():
+            window = np.ones(2 * self.hangover_frames + 1)
+            mask = np.convolve(mask, window, mode='same') > 0
+        return mask
+
+    def trim(self, audio, floor=None):
+        """
+        Return the speech part of `audio` (a view, no copy), or None when the
+        chunk holds too little speech to be worth transcribing. `floor` is
+        the stream's NoiseFloor (the VAD's own when omitted).
+        """
+        seconds = len(audio) / self.sample_rate
+        mask = self.speech_mask(audio, floor)
+        if np.count_nonzero(mask) < self.min_speech_frames:
+            self._count(seconds, seconds, skipped=True)
+            return None
+
+        speech = np.flatnonzero(mask)
+        start = speech[0] * self.frame_length
+        # The frame-less tail is kept if the last frame was speech
+        end = len(audio) if speech[-1] == len(mask) - 1 else (speech[-1] + 1) * self.frame_length
+        self._count(seconds, (len(audio) - (end - start)) / self.sample_rate)
+        return audio[start:end]
+
+    def _count(self, seconds_in, seconds_removed, skipped=False):
+        with self._lock:
+            self.chunks_seen += 1
+            self.chunks_skipped += skipped
+            self.seconds_in += seconds_in
+            self.seconds_removed += seconds_removed
+
+    def stats(self):
+        return {
+            'chunks_seen': self.chunks_seen,
+            'chunks_skipped': self.chunks_skipped,
+            'seconds_in': round(float(self.seconds_in), 3),
+            'seconds_removed': round(float(self.seconds_removed), 3),
+        }
@@ -0,0 +1,283 @@
+import io
+import logging
+
+import numpy as np
+
+# --- Compressed (WebM/Opus) Audio ---
+# Browsers record `audio/webm; codecs=opus` with MediaRecorder. Sending those
+# bytes as they are (payload 'audioEncoded' + 'mimeType') is 20-40x smaller
+# than PCM, but only the first chunk of a recording carries the WebM header;
+# later chunks are bare continuations of the same stream. So each session
+# gets a WebmStreamDecoder that:
+#
+#   - parses the EBML/Matroska structure incrementally, carrying partial
+#     elements over to the next chunk (fast path: no container probing,
+#     just the SimpleBlocks of the audio track),
+#   - keeps one codec context (PyAV) open for the whole recording, so Opus
+#     state continues across chunk boundaries,
+#   - resynchronizes on the next Cluster (or a new header) if a chunk was
+#     lost or corrupt, reporting what it skipped in `warnings`,
+#   - raises MissingHeader when a recording's continuation reaches a decoder
+#     that never saw its header (e.g. the worker restarted mid-recording);
+#     the browser has to start a new recording.
+#
+# Anything that isn't a WebM stream (ogg, mp4, wav files) goes through
+# decode_container(), which lets FFmpeg probe and decode a complete file.
+# PyAV is imported lazily, so PCM-only deployments don't need it.
+
+logger = logging.getLogger(__name__)
+
+EBML = 0x1A45DFA3
+SEGMENT = 0x18538067
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+CODEC_PRIVATE = 0x63A2
+CLUSTER = 0x1F43B675
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+
+# Elements whose children we need; everything else is skipped by size
+MASTERS = {SEGMENT, TRACKS, TRACK_ENTRY, CLUSTER, BLOCK_GROUP}
+AUDIO_TRACK = 2
+CODECS = {'A_OPUS': 'opus', 'A_VORBIS': 'vorbis'}
+CLUSTER_MAGIC = CLUSTER.to_bytes(4, 'big')
+EBML_MAGIC = EBML.to_bytes(4, 'big')
+UNKNOWN_SIZE = -1
+# Only Segment and Cluster grow large; any other element claiming more is corrupt
+MAX_ELEMENT_SIZE = 4 * 1024 * 1024
+
+
+class NeedMoreData(Exception):
+    """The buffer ends inside an element header; wait for the next chunk."""
+
+
+class MissingHeader(ValueError):
+    """Continuation data reached a decoder that never saw the stream's header."""
+
+
+def _read_vint(buffer, position, keep_marker):
+    """EBML variable-length integer at `position` -> (value, length)."""
+    if position >= len(buffer):
+        raise NeedMoreData
+    first = buffer[position]
+    if first == 0:
+        raise ValueError("Invalid EBML variable-length integer")
+    length = 8 - first.bit_length() + 1
+    if position + length > len(buffer):
+        raise NeedMoreData
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in buffer[position + 1:position + length]:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = UNKNOWN_SIZE # All ones: size not known (live MediaRecorder streams)
+    return value, length
+
+
+def is_encoded(data):
+    return data.get('audioEncoded') is not None
+
+
+class WebmStreamDecoder:
+    """Incremental WebM demuxer + persistent audio decoder for one session."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._skip = 0 # Bytes of an uninteresting element still to discard
+        self._resync = False
+        self._has_header = False
+        self._reported_missing = False
+        self.warnings = [] # What the last feed() had to skip
+        self._reset_tracks()
+
+    def _reset_tracks(self):
+        self.codec = None
+        self.sample_rate = None
+        self._track = None
+        self._track_entry = {}
+        self._context = None
+
+    # --- Demuxing ---
+    def feed(self, data):
+        """Decode the next chunk of the stream; returns (float32 mono, sample_rate)."""
+        self.warnings = []
+        if data[:4] == EBML_MAGIC:
+            # A new recording always starts a chunk; drop whatever the last one left
+            self._buffer.clear()
+            self._skip = 0
+            self._resync = False
+            self._has_header = True
+        elif not self._has_header:
+            # Without the header there's no codec setup to decode with
+            if not self._reported_missing:
+                self._reported_missing = True
+                raise MissingHeader("Audio stream started without its WebM header")
+            return np.zeros(0, dtype=np.float32), 48000
+        self._buffer += data
+        pieces = []
+        position = self._parse(pieces)
+        del self._buffer[:position]
+        if not pieces:
+            return np.zeros(0, dtype=np.float32), self.sample_rate or 48000
+        return np.concatenate(pieces), self.sample_rate
+
+    def resync(self):
+        """Chunks were lost upstream: discard the partial element and wait for the next Cluster."""
+        self._buffer.clear()
+        self._skip = 0
+        self._resync = True
+
+    def _corrupt(self, reason):
+        logger.warning("Corrupt WebM data (%s); skipping to the next cluster", reason)
+        self.warnings.append(f"Skipped damaged audio ({reason})")
+        self._resync = True
+
+    def _parse(self, pieces):
+        buffer = self._buffer
+        position = 0
+        if self._skip:
+            skipped = min(self._skip, len(buffer))
+            self._skip -= skipped
+            position = skipped
+
+        while position < len(buffer):
+            if self._resync:
+                found = buffer.find(CLUSTER_MAGIC, position)
+                if found < 0:
+                    return max(position, len(buffer) - len(CLUSTER_MAGIC) + 1)
+                position, self._resync = found, False
+            try:
+                element, id_length = _read_vint(buffer, position, keep_marker=True)
+                size, size_length = _read_vint(buffer, position + id_length, keep_marker=False)
+            except NeedMoreData:
+                return position
+            except ValueError as e:
+                self._corrupt(e)
+                position += 1
+                continue
+
+            start = position + id_length + size_length
+            if element == EBML:
+                # A new recording (header) on the same session: start over
+                self._reset_tracks()
+            if element in MASTERS:
+                if element == TRACK_ENTRY:
+                    self._track_entry = {}
+                position = start # Descend: children follow directly
+                continue
+            if size == UNKNOWN_SIZE:
+                self._resync = True
+                position = start
+                continue
+            if size > MAX_ELEMENT_SIZE:
+                self._corrupt(f"{size}-byte element")
+                position += 1
+                continue
+
+            end = start + size
+            if element in (SIMPLE_BLOCK, BLOCK, CODEC_ID, CODEC_PRIVATE, TRACK_NUMBER, TRACK_TYPE):
+                if end > len(buffer):
+                    return position # Wait for the whole element
+                try:
+                    self._element(element, bytes(buffer[start:end]), pieces)
+                except ValueError as e:
+                    self._corrupt(e)
+                position = end
+            elif end > len(buffer):
+                # Skip without buffering (Cues, Tags, Void, video, ...)
+                self._skip = end - len(buffer)
+                return len(buffer)
+            else:
+                position = end
+        return position
+
+    def _element(self, element, data, pieces):
+        if element in (SIMPLE_BLOCK, BLOCK):
+            self._block(data, pieces)
+        elif element == CODEC_ID:
+            self._track_entry['codec'] = data.rstrip(b'\0').decode('ascii', 'replace')
+        elif element == CODEC_PRIVATE:
+            self._track_entry['private'] = data
+        else:
+            self._track_entry['number' if element == TRACK_NUMBER else 'type'] = int.from_bytes(data, 'big')
+        if element not in (SIMPLE_BLOCK, BLOCK):
+            self._maybe_open_track()
+
+    def _maybe_open_track(self):
+        entry = self._track_entry
+        if self._context is not None or entry.get('type', AUDIO_TRACK) != AUDIO_TRACK:
+            return
+        if entry.get('codec') not in CODECS or 'number' not in entry:
+            return
+        if entry['codec'] == 'A_OPUS' and 'private' not in entry:
+            return # OpusHead comes in CodecPrivate; wait for it
+        import av
+        context = av.CodecContext.create(CODECS[entry['codec']], 'r')
+        if 'private' in entry:
+            context.extradata = entry['private']
+        self._context = context
+        self._track = entry['number']
+        self.codec = CODECS[entry['codec']]
+
+    def _block(self, data, pieces):
+        try:
+            track, length = _read_vint(data, 0, keep_marker=False)
+        except NeedMoreData:
+            raise ValueError("Truncated WebM block") from None
+        if track != self._track or self._context is None:
+            return
+        if len(data) < length + 3:
+            raise ValueError("Truncated WebM block")
+        flags = data[length + 2]
+        if flags & 0x06:
+            raise ValueError("Laced WebM blocks are not supported")
+        import av
+        try:
+            frames = self._context.decode(av.Packet(data[length + 3:]))
+        except av.error.FFmpegError as e:
+            raise ValueError(f"{self.codec} decode failed: {e}") from e
+        for frame in frames:
+            # The Opus decoder drops the OpusHead pre-skip itself
+            pieces.append(frame_to_mono(frame))
+            self.sample_rate = frame.sample_rate
+
+
+def frame_to_mono(frame):
+    """float32 mono from a decoded PyAV audio frame (planar or packed, float or int)."""
+    array = frame.to_ndarray()
+    channels = len(frame.layout.channels)
+    if not frame.format.is_planar:
+        array = array.reshape(-1, channels).T
+    if array.dtype == np.int16:
+        array = array.astype(np.float32) / 32768.0
+    elif array.dtype == np.int32:
+        array = array.astype(np.float32) / 2147483648.0
+    mono = array.mean(axis=0, dtype=np.float32) if channels > 1 else array[0]
+    return np.ascontiguousarray(mono, dtype=np.float32)
+
+
+def decode_container(data):
+    """Decode a complete audio file of any FFmpeg-supported format -> (float32 mono, sample_rate)."""
+    import av
+    with av.open(io.BytesIO(data)) as container:
+        stream = container.streams.audio[0]
+        pieces = [frame_to_mono(frame) for frame in container.decode(stream)]
+        sample_rate = stream.codec_context.sample_rate
+    if not pieces:
+        return np.zeros(0, dtype=np.float32), sample_rate
+    return np.concatenate(pieces), sample_rate
+
+
+def decode_encoded(data, decoder=None):
+    """
+    Decode an 'audioEncoded' payload. WebM goes through the session's
+    incremental `decoder`; other containers must be complete files.
+    """
+    encoded = data['audioEncoded']
+    mime_type = (data.get('mimeType') or 'audio/webm').lower()
+    if 'webm' in mime_type or 'matroska' in mime_type:
+        return (decoder or WebmStreamDecoder()).feed(encoded)
+    return decode_container(encoded)
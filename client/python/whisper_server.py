@@ -0,0 +1,263 @@
+import io
+import json
+import time
+import uuid
+import logging
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+import numpy as np
+import soundfile as sf
+
+# --- whisper.cpp Server Client ---
+# Talks to one or more `whisper-server` instances (see note-scribble.md):
+#
+#   whisper-server --model models/malaysia-whisper-tiny-model.bin \
+#       --threads 8 --host 127.0.0.1 --port 8011 -l ms
+#
+# Chunks are posted to /inference as in-memory 16-bit WAV bodies, over
+# keep-alive connections kept in a small per-instance pool (no TCP/HTTP
+# setup per chunk). Each request goes to the healthy instance with the
+# fewest requests outstanding. An instance that fails `max_failures`
+# requests in a row is ejected for `eject_seconds`; a background thread
+# probes /health and readmits it once it answers again.
+#
+# whisper_server_standin.py runs a local stand-in server (no model) and,
+# with --check, verifies the pooling, timeouts and error handling here.
+
+logger = logging.getLogger(__name__)
+
+# How a keep-alive connection the server already closed fails on reuse
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class ServerError(Exception):
+    """A whisper-server request failed (connection error or non-200 answer)."""
+
+
+def encode_wav(audio, sample_rate):
+    """float32 mono -> 16-bit PCM WAV bytes, as whisper-server expects."""
+    buffer = io.BytesIO()
+    sf.write(buffer, np.clip(audio, -1.0, 1.0), sample_rate, format='WAV', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+def encode_multipart(fields, file_field, filename, data):
+    """multipart/form-data body and its Content-Type header."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+                 f'filename="{filename}"\r\nContent-Type: audio/wav\r\n\r\n'.encode())
+    parts.append(data)
+    parts.append(f'\r\n--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class ServerInstance:
+    """One whisper-server endpoint with its idle keep-alive connections."""
+
+    def __init__(self, url, timeout=30.0, max_idle=4):
+        parts = urlsplit(url if '://' in url else f'http://{url}')
+        self.url = f'{parts.scheme}://{parts.netloc}'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.timeout = timeout
+        self.max_idle = max_idle
+
+        self.outstanding = 0
+        self.failures = 0 # Consecutive
+        self.ejected_until = 0.0
+        self.served = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.ejected_until
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        """Send one request on a pooled connection; returns (status, body bytes)."""
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        reused = connection is not None
+        if connection is None:
+            connection = self._connect()
+
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            # The server may have closed an idle keep-alive connection; retry once fresh.
+            # Anything else (a timeout above all) would only fail again, twice as slowly.
+            if not reused or not isinstance(e, STALE_CONNECTION_ERRORS):
+                raise ServerError(f"{self.url}: {e}") from e
+            return self.request_fresh(method, path, body, headers)
+
+        if response.will_close:
+            connection.close()
+        else:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(connection)
+                    connection = None
+            if connection is not None:
+                connection.close()
+        return response.status, data
+
+    def request_fresh(self, method, path, body=None, headers=None):
+        connection = self._connect()
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            raise ServerError(f"{self.url}: {e}") from e
+        finally:
+            connection.close()
+        return response.status, data
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class WhisperServerPool:
+    """Least-outstanding-requests balancing over whisper-server instances."""
+
+    def __init__(self, urls, timeout=30.0, max_idle=4, max_failures=3,
+                 eject_seconds=10.0, health_interval=5.0):
+        if not urls:
+            raise ValueError("At least one whisper-server URL is required")
+        self.instances = [ServerInstance(url, timeout, max_idle) for url in urls]
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+
+        self._lock = threading.Lock()
+        self._next = 0 # Rotates ties so idle instances share the load
+        self._stopping = threading.Event()
+        self._health_thread = None
+
+    # --- Balancing ---
+    def _acquire(self, exclude=()):
+        with self._lock:
+            count = len(self.instances)
+            # Start the scan at a rotating offset so ties spread over idle instances
+            self._next = (self._next + 1) % count
+            ordered = [self.instances[(self._next + k) % count] for k in range(count)]
+            ordered = [i for i in ordered if i not in exclude]
+            if not ordered:
+                return None
+            candidates = [i for i in ordered if i.healthy]
+            if candidates:
+                instance = min(candidates, key=lambda i: i.outstanding)
+            else:
+                # Everything is ejected: try the one due back soonest rather than fail outright
+                instance = min(ordered, key=lambda i: i.ejected_until)
+            instance.outstanding += 1
+            return instance
+
+    def _release(self, instance, ok):
+        with self._lock:
+            instance.outstanding -= 1
+            if ok:
+                instance.failures = 0
+                instance.served += 1
+                return
+            instance.failures += 1
+            if instance.failures >= self.max_failures and instance.healthy:
+                instance.ejected_until = time.monotonic() + self.eject_seconds
+                logger.warning("Ejecting %s after %d failed requests (for %.0f s)",
+                               instance.url, instance.failures, self.eject_seconds)
+
+    def post(self, path, body, headers, attempts=2):
+        """POST to the least-loaded instance, failing over to another on error."""
+        tried = []
+        last_error = None
+        for _ in range(min(attempts, len(self.instances))):
+            instance = self._acquire(exclude=tried)
+            if instance is None:
+                break
+            tried.append(instance)
+            try:
+                status, data = instance.request('POST', path, body, headers)
+            except ServerError as e:
+                self._release(instance, ok=False)
+                last_error = e
+                continue
+            if status >= 500:
+                self._release(instance, ok=False)
+                last_error = ServerError(f"{instance.url}{path}: HTTP {status} {data[:200]!r}")
+                continue
+            self._release(instance, ok=True)
+            if status != 200:
+                # A client error (bad request) won't succeed elsewhere either
+                raise ServerError(f"{instance.url}{path}: HTTP {status} {data[:200]!r}")
+            return data
+        raise last_error or ServerError("No whisper-server instance available")
+
+    # --- Health checks ---
+    def check(self, instance):
+        """Probe /health; readmits an ejected instance that answers 200."""
+        try:
+            status, _ = instance.request_fresh('GET', '/health')
+        except ServerError:
+            status = None
+        with self._lock:
+            if status == 200:
+                if not instance.healthy:
+                    logger.info("Readmitting %s", instance.url)
+                instance.failures = 0
+                instance.ejected_until = 0.0
+                return True
+            # /health answers 503 while the model is still loading
+            if instance.healthy:
+                instance.ejected_until = time.monotonic() + self.eject_seconds
+                logger.warning("%s failed its health check (%s)", instance.url, status or 'unreachable')
+            return False
+
+    def check_all(self):
+        return [self.check(instance) for instance in self.instances]
+
+    def _health_loop(self):
+        while not self._stopping.wait(self.health_interval):
+            for instance in self.instances:
+                self.check(instance)
+
+    def start(self):
+        if self._health_thread is None and self.health_interval > 0:
+            self._health_thread = threading.Thread(target=self._health_loop, name="whisper-server-health", daemon=True)
+            self._health_thread.start()
+
+    def close(self):
+        self._stopping.set()
+        if self._health_thread:
+            self._health_thread.join(timeout=1)
+            self._health_thread = None
+        for instance in self.instances:
+            instance.close()
+
+    def status(self):
+        """[(url, healthy, outstanding, served)] for logs and the worker banner."""
+        with self._lock:
+            return [(i.url, i.healthy, i.outstanding, i.served) for i in self.instances]
+
+
+def parse_inference(data):
+    """Text from an /inference answer (response_format=json)."""
+    try:
+        return json.loads(data).get('text', '').strip()
+    except ValueError as e:
+        raise ServerError(f"Unexpected /inference response: {data[:200]!r}") from e
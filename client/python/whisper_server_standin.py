@@ -0,0 +1,341 @@
+import io
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import soundfile as sf
+
+from asr_backends import SAMPLE_RATE, WhisperServerBackend
+from whisper_server import ServerError, ServerInstance, WhisperServerPool, encode_multipart, encode_wav
+
+# --- Stand-in whisper-server ---
+# A local HTTP server speaking the part of whisper.cpp's `whisper-server`
+# API the worker uses (GET /health, POST /inference with a multipart WAV),
+# so WhisperServerBackend can be exercised without a model:
+#
+#   python whisper_server_standin.py --port 8011 --delay 0.2 &
+#   WHISPER_SERVERS=http://127.0.0.1:8011 python transcriber-whisper-server.py
+#
+# It answers with the duration of the WAV it received, and can be made
+# slow (--delay), failing (--status 500) or still loading (--loading).
+#
+#   python whisper_server_standin.py --check
+#
+# starts stand-ins on free ports and checks connection pooling, balancing,
+# timeouts, ejection/readmission and how HTTP errors map to ServerError.
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-answer; that's expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StandInServer:
+    """One stand-in whisper-server on 127.0.0.1 (port 0 picks a free port)."""
+
+    def __init__(self, port=0, delay=0.0, status=200, loading=False, body=None, keep_alive=True):
+        self.delay = delay           # Seconds each /inference takes
+        self.status = status         # HTTP status /inference answers with
+        self.loading = loading       # /health answers 503, like a server still loading its model
+        self.body = body             # Raw /inference body instead of the JSON answer
+        self.keep_alive = keep_alive # False closes every connection without saying so
+
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = _QuietServer(('127.0.0.1', port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # Keep-alive, as whisper-server does
+
+            def setup(self):
+                super().setup()
+                standin._count('connections')
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, body, content_type='application/json'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                if not standin.keep_alive:
+                    self.close_connection = True
+
+            def do_GET(self):
+                if self.path != '/health':
+                    return self._reply(404, b'{"error": "not found"}')
+                if standin.loading:
+                    return self._reply(503, b'{"status": "loading model"}')
+                self._reply(200, b'{"status": "ok"}')
+
+            def do_POST(self):
+                data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path != '/inference':
+                    return self._reply(404, b'{"error": "not found"}')
+                standin._count('requests')
+                time.sleep(standin.delay)
+                if standin.status != 200:
+                    return self._reply(standin.status, b'{"error": "stand-in failure"}')
+                if standin.body is not None:
+                    return self._reply(200, standin.body, 'text/plain')
+                try:
+                    # The WAV runs up to the closing multipart boundary
+                    wav = data[data.index(b'RIFF'):data.rindex(b'\r\n--')]
+                    audio, sample_rate = sf.read(io.BytesIO(wav))
+                except (ValueError, RuntimeError):
+                    return self._reply(400, b'{"error": "failed to read WAV file"}')
+                text = f"{len(audio) / sample_rate:.2f} seconds"
+                self._reply(200, json.dumps({'text': f" {text}\n"}).encode())
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def free_port():
+    """A port nothing is listening on (for an unreachable instance)."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+# --- Checks ---
+def _audio(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def _inference(seconds=1.0):
+    """(body, headers) of an /inference request for `seconds` of silence."""
+    body, content_type = encode_multipart({'response_format': 'json'}, 'file', 'chunk.wav',
+                                          encode_wav(_audio(seconds), SAMPLE_RATE))
+    return body, {'Content-Type': content_type}
+
+
+def _post(pool, seconds=1.0):
+    return pool.post('/inference', *_inference(seconds))
+
+
+def _backend(*servers, **options):
+    backend = WhisperServerBackend(','.join(server.url for server in servers), health_interval=0, **options)
+    backend.load()
+    return backend
+
+
+def check_pooling():
+    server = StandInServer().start()
+    backend = _backend(server)
+    try:
+        texts = [backend.transcribe(_audio(1.5)) for _ in range(10)]
+        assert texts == ['1.50 seconds'] * 10, texts
+        # One connection for the /health probe, one kept alive for every /inference
+        assert server.connections == 2, server.connections
+    finally:
+        backend.close()
+        server.stop()
+
+
+def check_stale_connection():
+    server = StandInServer(keep_alive=False).start()
+    backend = _backend(server)
+    try:
+        # Each pooled connection is dead by the next request; it's retried once on a fresh one
+        assert [backend.transcribe(_audio(1.0)) for _ in range(3)] == ['1.00 seconds'] * 3
+        assert server.requests == 3, server.requests
+    finally:
+        backend.close()
+        server.stop()
+
+
+def check_balancing():
+    servers = [StandInServer(delay=0.1).start() for _ in range(2)]
+    backend = _backend(*servers)
+    try:
+        texts = backend.transcribe_batch([_audio(0.5)] * 8, ['malay-english'] * 8)
+        assert texts == ['0.50 seconds'] * 8, texts
+        assert [server.requests for server in servers] == [4, 4], [server.requests for server in servers]
+    finally:
+        backend.close()
+        for server in servers:
+            server.stop()
+
+
+def check_timeout():
+    slow, fast = StandInServer(delay=1.0).start(), StandInServer().start()
+    try:
+        instance = ServerInstance(slow.url, timeout=0.3)
+        started = time.monotonic()
+        try:
+            instance.request('POST', '/inference', *_inference())
+        except ServerError:
+            pass
+        else:
+            raise AssertionError("A request past the timeout didn't raise ServerError")
+        assert time.monotonic() - started < 0.9
+        instance.close()
+
+        # A timeout on a pooled connection isn't retried like a stale one
+        instance = ServerInstance(fast.url, timeout=0.3)
+        instance.request('POST', '/inference', *_inference())
+        fast.delay = 1.0
+        try:
+            instance.request('POST', '/inference', *_inference())
+        except ServerError:
+            pass
+        else:
+            raise AssertionError("A request past the timeout didn't raise ServerError")
+        assert fast.requests == 2, fast.requests
+        fast.delay = 0.0
+        instance.close()
+
+        # With a healthy instance next to it, the slow one's timeouts fail over
+        pool = WhisperServerPool([slow.url, fast.url], timeout=0.3, max_failures=1, health_interval=0)
+        for _ in range(4):
+            _post(pool)
+        healthy = {url: ok for url, ok, _, _ in pool.status()}
+        assert not healthy[slow.url] and healthy[fast.url], healthy
+        pool.close()
+    finally:
+        slow.stop()
+        fast.stop()
+
+
+def check_error_mapping():
+    failing, working = StandInServer(status=500).start(), StandInServer().start()
+    rejecting, garbled = StandInServer(status=400).start(), StandInServer(body=b'<html>oops</html>').start()
+    try:
+        # 5xx: fail over, then eject the failing instance
+        pool = WhisperServerPool([failing.url, working.url], max_failures=2, eject_seconds=60, health_interval=0)
+        for _ in range(6):
+            _post(pool)
+        assert failing.requests == 2 and working.requests == 6, (failing.requests, working.requests)
+        pool.close()
+
+        # 4xx: raised at once; retrying elsewhere wouldn't help and the instance stays in
+        pool = WhisperServerPool([rejecting.url], max_failures=1, health_interval=0)
+        try:
+            _post(pool)
+        except ServerError as e:
+            assert 'HTTP 400' in str(e), e
+        else:
+            raise AssertionError("HTTP 400 didn't raise ServerError")
+        assert rejecting.requests == 1 and pool.status()[0][1]
+        pool.close()
+
+        # An answer that isn't whisper-server JSON
+        backend = _backend(garbled)
+        try:
+            backend.transcribe(_audio(1.0))
+        except ServerError as e:
+            assert 'Unexpected /inference response' in str(e), e
+        else:
+            raise AssertionError("A non-JSON answer didn't raise ServerError")
+        backend.close()
+
+        # Unreachable: a ServerError, and the other instance takes the request
+        dead = f'http://127.0.0.1:{free_port()}'
+        pool = WhisperServerPool([dead], health_interval=0)
+        try:
+            _post(pool)
+        except ServerError:
+            pass
+        else:
+            raise AssertionError("An unreachable instance didn't raise ServerError")
+        pool.close()
+        pool = WhisperServerPool([dead, working.url], health_interval=0)
+        assert json.loads(_post(pool, 2.0))['text'].strip() == '2.00 seconds'
+        pool.close()
+    finally:
+        for server in (failing, working, rejecting, garbled):
+            server.stop()
+
+
+def check_health():
+    server = StandInServer(loading=True).start()
+    try:
+        backend = WhisperServerBackend(server.url, health_interval=0)
+        try:
+            backend.load()
+        except ConnectionError:
+            pass
+        else:
+            raise AssertionError("load() succeeded with no server ready")
+
+        pool = WhisperServerPool([server.url], eject_seconds=60, health_interval=0.05)
+        pool.start()
+        time.sleep(0.2)
+        assert not pool.status()[0][1], "A loading server wasn't ejected"
+        server.loading = False
+        time.sleep(0.2)
+        assert pool.status()[0][1], "A recovered server wasn't readmitted"
+        pool.close()
+    finally:
+        server.stop()
+
+
+CHECKS = [check_pooling, check_stale_connection, check_balancing, check_timeout, check_error_mapping, check_health]
+
+
+def run_checks():
+    failed = 0
+    for check in CHECKS:
+        name = check.__name__[len('check_'):]
+        try:
+            check()
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+        else:
+            print(f"✅ {name}")
+    return failed
+
+
+# --- Main Entry Point ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stand-in whisper-server for testing WhisperServerBackend.")
+    parser.add_argument('--check', action='store_true', help="Run the pooling/timeout/error checks and exit")
+    parser.add_argument('--port', type=int, default=8011)
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds each /inference takes")
+    parser.add_argument('--status', type=int, default=200, help="HTTP status /inference answers with")
+    parser.add_argument('--loading', action='store_true', help="Answer /health with 503")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(1 if run_checks() else 0)
+
+    server = StandInServer(args.port, args.delay, args.status, args.loading)
+    print(f"🚀 Stand-in whisper-server on {server.url} (delay {args.delay} s, status {args.status})")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.server.server_close()
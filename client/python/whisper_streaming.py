@@ -0,0 +1,117 @@
+import re
+import threading
+
+from sessions import AudioRing
+
+# --- Rolling-Context Streaming ---
+# Each session keeps a rolling audio buffer that is re-transcribed as new
+# chunks arrive, with the already-committed text passed as the prompt.
+# A word is committed only once two consecutive windows agree on it (local
+# agreement), so words split at chunk edges settle instead of being mangled
+# or duplicated. Everything after the agreed prefix is sent as tentative text.
+
+
+def _normalize(word):
+    return re.sub(r'[^\w]', '', word.lower())
+
+
+def agreed_prefix(previous, current):
+    """Number of leading words two hypotheses agree on (ignoring case/punctuation)."""
+    count = 0
+    for (_, _, a), (_, _, b) in zip(previous, current):
+        if _normalize(a) != _normalize(b):
+            break
+        count += 1
+    return count
+
+
+class RollingSession:
+    """Streaming state for one browser session."""
+
+    __slots__ = ('audio', 'committed', 'committed_until', 'hypothesis', 'language_mode', 'lock')
+
+    def __init__(self, capacity):
+        self.audio = AudioRing(capacity) # preallocated; audio.first is the session-time sample of audio[0]
+        self.committed = []         # committed words, oldest first
+        self.committed_until = 0.0  # session time (s) where committed text ends
+        self.hypothesis = []        # previous window's uncommitted (start, end, word)
+        self.language_mode = 'malay-english'
+        self.lock = threading.Lock()
+
+
+class RollingTranscriber:
+    """
+    Drives local-agreement streaming on top of a word-timestamp transcriber.
+
+    `transcribe_words(audio, prompt, language_mode)` must return
+    [(start, end, word), ...] with times relative to the start of `audio`.
+    """
+
+    PROMPT_WORDS = 100
+
+    def __init__(self, transcribe_words, sample_rate=16000, max_buffer=15.0,
+                 overlap=1.0, prompt_chars=200):
+        self.transcribe_words = transcribe_words
+        self.sample_rate = sample_rate
+        self.max_buffer = max_buffer
+        self.overlap = overlap
+        self.prompt_chars = prompt_chars
+        # Room for the forced-commit bound (2 x max_buffer) plus one more chunk;
+        # anything beyond that drops the oldest audio
+        self.capacity = int((2 * max_buffer + 5.0) * sample_rate)
+
+    def new_session(self):
+        return RollingSession(self.capacity)
+
+    def feed(self, session, audio):
+        """Add a chunk; return (newly committed text, tentative text)."""
+        session.audio.append(audio)
+        prompt = ' '.join(session.committed)[-self.prompt_chars:]
+
+        buffer_start = session.audio.first / self.sample_rate
+        words = [
+            (start + buffer_start, end + buffer_start, word.strip())
+            for start, end, word in self.transcribe_words(session.audio.array(), prompt, session.language_mode)
+            if word.strip()
+        ]
+        # The overlap region is re-transcribed; skip words already committed
+        words = [w for w in words if (w[0] + w[1]) / 2 > session.committed_until]
+
+        count = agreed_prefix(session.hypothesis, words)
+        newly_committed, tentative = words[:count], words[count:]
+
+        if newly_committed:
+            session.committed_until = newly_committed[-1][1]
+
+        # Never let an unstable (or silent) stream grow the buffer without
+        # bound: past twice the limit, commit everything heard so far
+        buffer_seconds = len(session.audio) / self.sample_rate
+        if not newly_committed and buffer_seconds > 2 * self.max_buffer:
+            newly_committed, tentative = words, []
+            session.committed_until = buffer_start + buffer_seconds
+
+        session.committed.extend(word for _, _, word in newly_committed)
+        # Only the tail is ever used as a prompt
+        del session.committed[:-self.PROMPT_WORDS]
+        session.hypothesis = tentative
+
+        if buffer_seconds > self.max_buffer:
+            self._trim(session)
+
+        return (' '.join(word for _, _, word in newly_committed),
+                ' '.join(word for _, _, word in tentative))
+
+    def _trim(self, session):
+        # Keep `overlap` seconds of committed audio as acoustic context
+        cut_time = session.committed_until - self.overlap
+        cut = int(cut_time * self.sample_rate) - session.audio.first
+        if cut > 0:
+            session.audio.discard(cut)
+
+    def flush(self, session):
+        """Commit whatever is still tentative and return it."""
+        text = ' '.join(word for _, _, word in session.hypothesis)
+        session.committed.extend(word for _, _, word in session.hypothesis)
+        session.hypothesis = []
+        session.audio.clear()
+        return text
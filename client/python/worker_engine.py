@@ -0,0 +1,645 @@
+import socketio
+import os
+import time
+import logging
+import argparse
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+from preprocess import AudioPreprocessor
+from webm_audio import MissingHeader, WebmStreamDecoder, decode_encoded, is_encoded
+from sessions import SessionRegistry
+from asr_backends import BACKENDS, DEVICE_BACKENDS, SAMPLE_RATE, create_backend
+from batching import Job, SILENCE, END
+from vad import EnergyVAD
+from storage import BackgroundWriter, ChunkFileStore, ChunkRecord, FSYNC_POLICIES
+from archive import ArchiveStore
+from result_cache import ResultCache, CachedBackend
+from worker_runtime import JobQueue, InferenceRuntime, QueueFull, OVERFLOW_POLICIES
+from language_tagging import process_mixed_language
+from metrics import WorkerMetrics
+from replica_pool import ReplicaPool, REPLICAS, REPLICA_THREADS, replica_budget
+from cascade import CascadeBackend
+import devices
+from devices import PRECISIONS
+
+logger = logging.getLogger("worker")
+
+# --- Configuration ---
+load_dotenv() # Load from .env file
+NODE_SERVER_URL = os.getenv("NODE_SERVER_URL", "http://localhost:3000")
+PYTHON_SECRET_KEY = os.getenv("PYTHON_SECRET_KEY") # From server-latest.js
+# Micro-batching (1 = transcribe every chunk on arrival)
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1"))
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "30"))
+# Bounded job queue between the socket handler and inference threads
+QUEUE_MAXSIZE = int(os.getenv("QUEUE_MAXSIZE", "32"))
+QUEUE_OVERFLOW = os.getenv("QUEUE_OVERFLOW", "drop_oldest") # drop_oldest | coalesce | reject
+# (streaming backends always use 1: their per-session state needs chunks in order)
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "1"))
+# Skip/trim non-speech before inference (VAD=0 sends every chunk to the model)
+VAD_ENABLED = os.getenv("VAD", "1") == "1"
+# Background persistence: 'archive' appends to rotating segment files,
+# 'files' writes the legacy audio_<timestamp>.wav/.txt pair per chunk
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "archive") # archive | files
+# Group-commit window, queue bound and fsync policy
+STORAGE_FLUSH_INTERVAL = float(os.getenv("STORAGE_FLUSH_INTERVAL", "0.5"))
+STORAGE_QUEUE_MAXSIZE = int(os.getenv("STORAGE_QUEUE_MAXSIZE", "256"))
+STORAGE_FSYNC = os.getenv("STORAGE_FSYNC", "none") # none | batch
+# Content-hash result cache in front of chunk backends (0 disables); with a
+# directory set, results also persist across restarts in results.sqlite
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "10000"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR")
+# How often idle sessions are evicted (and streaming backends flushed)
+HOUSEKEEPING_INTERVAL = float(os.getenv("HOUSEKEEPING_INTERVAL", "5"))
+# Per-session state (WebM decoder, VAD floor, and the streaming backend's
+# rolling audio): dropped after this long without audio. Live sessions are
+# capped at MAX_SESSIONS and at what fits the backend's per-session memory
+# in SESSION_MEMORY_MB
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "60"))
+SESSION_MEMORY_MB = float(os.getenv("SESSION_MEMORY_MB", "512"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "5000"))
+# Error code telling the page to start a new MediaRecorder stream (fresh WebM header)
+RESTART_RECORDING = 'restart_recording'
+# Warm-up passes on synthetic audio before announcing readiness (0 skips)
+WARMUP_PASSES = int(os.getenv("WARMUP_PASSES", "2"))
+WARMUP_SECONDS = float(os.getenv("WARMUP_SECONDS", "3.0"))
+# Load/capacity heartbeat to the relay every N seconds (0 disables)
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", "5"))
+# Prometheus-style /metrics on this local port (0 disables; give each worker its own)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# DEBUG logs every chunk and transcription; INFO only lifecycle events
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+
+def configure_logging(level=LOG_LEVEL):
+    logging.basicConfig(
+        level=getattr(logging, str(level).upper(), logging.INFO),
+        format="%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+    )
+
+
+# --- Transcription Cleanup ---
+def enhance_transcription(text, language_mode='malay-english', highlight=False):
+    """Clean up the raw transcription text for display"""
+    text = text.strip()
+    if not text:
+        return "[No speech detected]"
+
+    # Capitalize first letter
+    text = text[0].upper() + text[1:]
+    if highlight:
+        return process_mixed_language(text, language_mode)
+    return text
+
+
+# --- Speech Gating and Session Markers ---
+# Shared with benchmark.py, so the replay runs the same gating and marker
+# traffic through the JobQueue as the worker.
+def gate_chunk(vad, job, floor, streaming):
+    """
+    Run the VAD on a job (against the session's noise `floor`). A silent
+    chunk becomes a SILENCE marker, answered in queue order without
+    inference (streaming backends end the utterance there); speech is
+    trimmed for chunk-at-a-time backends. Returns False for silence.
+    """
+    speech = vad.trim(job.audio, floor)
+    if speech is None:
+        job.kind = SILENCE
+        return False
+    if not streaming:
+        # Streaming backends keep the full chunk so their timeline stays continuous
+        job.audio = speech
+    return True
+
+
+def marker_job(session_id, language_mode='malay-english', kind=END):
+    """A job with no audio of its own, e.g. END queued behind a session's last chunks."""
+    return Job(session_id, language_mode, np.zeros(0, dtype=np.float32), SAMPLE_RATE, kind)
+
+
+class TranscriptionWorker:
+    """
+    One Socket.IO worker connection in front of one ASR backend.
+
+    Receives 'audio_to_python' chunks from the Node.js relay, transcribes them
+    with the backend, saves audio/text, and sends 'transcription_from_python'.
+    """
+
+    def __init__(self, backend, group='whisper', upload_dir="audio_uploads",
+                 highlight_languages=False, emit_empty=True,
+                 max_batch_size=MAX_BATCH_SIZE, batch_window_ms=BATCH_WINDOW_MS,
+                 queue_maxsize=QUEUE_MAXSIZE, queue_overflow=QUEUE_OVERFLOW,
+                 inference_threads=INFERENCE_THREADS, vad=VAD_ENABLED,
+                 storage_backend=STORAGE_BACKEND, storage_flush_interval=STORAGE_FLUSH_INTERVAL,
+                 storage_fsync=STORAGE_FSYNC, cache_size=RESULT_CACHE_SIZE, cache_dir=RESULT_CACHE_DIR,
+                 metrics_port=METRICS_PORT, warm_up_passes=WARMUP_PASSES, warm_up_seconds=WARMUP_SECONDS,
+                 replicas=REPLICAS, replica_threads=REPLICA_THREADS, heartbeat_interval=HEARTBEAT_INTERVAL,
+                 server_url=NODE_SERVER_URL, secret_key=PYTHON_SECRET_KEY):
+        # N model processes behind this one connection, one inference thread each
+        replicas, replica_threads = replica_budget(replicas, replica_threads)
+        if replicas > 1 and backend.streaming:
+            logger.warning("%s keeps per-session state in one process; ignoring replicas=%d",
+                           backend.describe(), replicas)
+        elif replicas > 1:
+            backend = ReplicaPool(backend, replicas, replica_threads)
+            inference_threads = max(inference_threads, replicas)
+
+        # Identical chunks skip the model; streaming backends are stateful and
+        # their output depends on more than the chunk, so they bypass it
+        self.cache = None
+        if cache_size > 0 and not backend.streaming:
+            self.cache = ResultCache(
+                max_entries=cache_size,
+                disk_path=os.path.join(cache_dir, 'results.sqlite') if cache_dir else None
+            )
+            backend = CachedBackend(backend, self.cache)
+        self.backend = backend
+        self.group = group
+        self.upload_dir = upload_dir
+        self.highlight_languages = highlight_languages
+        self.emit_empty = emit_empty
+        self.server_url = server_url
+        self.secret_key = secret_key
+        # Any input rate/channel count -> 16 kHz mono float32 before VAD and the model
+        self.preprocessor = AudioPreprocessor(SAMPLE_RATE)
+        # One Session per browser (language mode, VAD floor, WebM decoder). The
+        # memory cap counts what the backend preallocates per streaming
+        # session, and the backend keeps no more sessions than the worker and
+        # drops them on the same idle clock
+        self.sessions = SessionRegistry(SESSION_IDLE_TIMEOUT, MAX_SESSIONS, int(SESSION_MEMORY_MB * 1024 * 1024),
+                                        backend.session_bytes)
+        backend.limit_sessions(self.sessions.max_sessions, self.sessions.idle_timeout)
+        self.vad = EnergyVAD(SAMPLE_RATE) if vad else None
+        self.metrics = WorkerMetrics()
+        self.metrics_port = metrics_port
+        self.warm_up_passes = warm_up_passes
+        self.warm_up_seconds = warm_up_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.boot_timings = {}
+
+        # Audio/text are persisted by a writer thread, after the result is sent
+        if storage_backend == 'archive':
+            store = ArchiveStore(upload_dir, model_name=backend.describe())
+        elif storage_backend == 'files':
+            store = ChunkFileStore(upload_dir)
+        else:
+            raise ValueError(f"Unknown storage backend '{storage_backend}'. Choose 'archive' or 'files'.")
+        self.writer = BackgroundWriter(
+            store,
+            maxsize=STORAGE_QUEUE_MAXSIZE,
+            flush_interval=storage_flush_interval,
+            fsync=storage_fsync,
+            metrics=self.metrics
+        )
+
+        # The socket handler only decodes and queues; inference runs on
+        # dedicated threads that micro-batch sessions when max_batch_size > 1
+        self.job_queue = JobQueue(maxsize=queue_maxsize, overflow=queue_overflow)
+        self.runtime = InferenceRuntime(
+            backend,
+            self.job_queue,
+            on_result=self.send_result,
+            on_error=lambda job, e: self.send_error(job.session_id, e),
+            on_complete=self.save_chunk,
+            num_workers=inference_threads,
+            max_batch=max_batch_size,
+            window_ms=batch_window_ms,
+            metrics=self.metrics
+        )
+        self.metrics.gauge('asr_queue_depth', "Chunks waiting for inference", lambda: self.job_queue.depth)
+        self.metrics.gauge('asr_in_flight', "Chunks being transcribed", lambda: self.runtime.in_flight)
+        if self.runtime.order is not None:
+            self.metrics.gauge('asr_results_held', "Results waiting for an earlier chunk of their session",
+                               self.runtime.order.waiting)
+        self.metrics.gauge('asr_sessions', "Browser sessions with live state", lambda: len(self.sessions))
+        self.metrics.gauge('asr_session_limit', "Live sessions allowed by MAX_SESSIONS and SESSION_MEMORY_MB",
+                           lambda: self.sessions.max_sessions)
+        self.metrics.gauge('asr_storage_queued', "Records waiting to be persisted", lambda: self.writer.stats()['queued'])
+        if self.cache is not None:
+            self.metrics.gauge('asr_cache_hits', "Result cache hits (memory + disk)",
+                               lambda: self.cache.hits + self.cache.disk_hits)
+            self.metrics.gauge('asr_cache_misses', "Result cache misses", lambda: self.cache.misses)
+        self.metrics.gauge('asr_ready', "1 once the model is loaded, warm and announced",
+                           lambda: int(self._ready.is_set()))
+        for phase in ('import', 'load', 'warm_up'):
+            self.metrics.gauge(f'asr_boot_{phase}_seconds', f"Boot time spent in {phase.replace('_', '-')}",
+                               lambda phase=phase: self.boot_timings.get(phase, 0.0))
+        self.backend.register_metrics(self.metrics)
+
+        # --- Initialize Socket.IO Client ---
+        self.sio = socketio.Client()
+        self.sio.on('connect', self.on_connect)
+        self.sio.on('connect_error', self.on_connect_error)
+        self.sio.on('disconnect', self.on_disconnect)
+        self.sio.on('audio_to_python', self.on_audio_to_python)
+        self.sio.on('session_ended', self.on_session_ended)
+        self._stopping = threading.Event()
+        # Set once the model is loaded and warm; identify_python waits for it
+        self._ready = threading.Event()
+        self._boot_error = None
+        self._identify_lock = threading.Lock()
+
+    # --- Socket.IO Event Handlers ---
+    def on_connect(self):
+        logger.info("✅ Successfully connected to Node.js server.")
+        if self._ready.is_set():
+            self.identify()
+        elif self._boot_error:
+            threading.Thread(target=self.sio.disconnect, daemon=True).start()
+        else:
+            logger.info("⏳ Model still booting; will announce readiness when warm.")
+
+    def identify(self):
+        """Join the relay group, i.e. start receiving audio. Only sent once warm."""
+        with self._identify_lock:
+            if not self.sio.connected:
+                return
+            self.sio.emit('identify_python', {
+                'apiKey': self.secret_key,
+                'group': self.group
+            })
+        logger.info("📣 Announced readiness to group [%s].", self.group)
+
+    def on_connect_error(self, data):
+        logger.error("❌ Connection to Node.js server failed: %s", data)
+
+    def on_disconnect(self):
+        logger.info("Disconnected from Node.js server.")
+
+    def on_audio_to_python(self, data):
+        browser_socket_id = data['browserSocketId']
+        language_mode = data.get('language', 'malay-english')
+
+        self.metrics.chunks_received.inc()
+        logger.debug("🎤 Audio from %s, language mode %s (queue depth: %d)",
+                     browser_socket_id, language_mode, self.job_queue.depth)
+
+        try:
+            session = self.sessions.get(browser_socket_id)
+            # One chunk of a session at a time, in the order the relay numbered them
+            with session.lock:
+                skipped = session.wait_turn(data.get('seq'))
+                if skipped is None:
+                    logger.warning("Dropping chunk %s from %s: it arrived after newer audio",
+                                   data.get('seq'), browser_socket_id)
+                    return
+                started = time.monotonic()
+                session.language_mode = language_mode
+                if is_encoded(data):
+                    if session.decoder is None:
+                        session.decoder = WebmStreamDecoder()
+                    elif skipped:
+                        session.decoder.resync() # Chunks were lost on the way
+                    try:
+                        samples, rate = decode_encoded(data, session.decoder)
+                    except MissingHeader as e:
+                        self.send_error(browser_socket_id, f"{e}; please restart recording", RESTART_RECORDING)
+                        return
+                    for warning in session.decoder.warnings:
+                        self.send_error(browser_socket_id, warning)
+                    if not len(samples):
+                        return # Header only, or waiting on the rest of a block
+                    audio_data, sample_rate = self.preprocessor.process(samples, rate)
+                else:
+                    audio_data, sample_rate = self.preprocessor.payload(data)
+                self.metrics.stage['decode'].observe(time.monotonic() - started)
+                job = Job(browser_socket_id, language_mode, audio_data, sample_rate)
+                if self.vad:
+                    if session.vad is None:
+                        session.vad = self.vad.new_floor()
+                    self.gate_speech(job, session.vad)
+                dropped = self.job_queue.put(job)
+        except QueueFull as e:
+            self.metrics.chunks_dropped.inc()
+            self.send_error(browser_socket_id, e)
+            return
+        except Exception as e:
+            logger.exception("Could not queue audio from %s", browser_socket_id)
+            self.send_error(browser_socket_id, e)
+            return
+
+        for job in dropped:
+            self.metrics.chunks_dropped.inc()
+            self.send_error(job.session_id, "Chunk dropped: worker is overloaded")
+
+    def gate_speech(self, job, floor):
+        """gate_chunk() with the worker's VAD timing and skip counters."""
+        started = time.monotonic()
+        speech = gate_chunk(self.vad, job, floor, self.backend.streaming)
+        self.metrics.stage['vad'].observe(time.monotonic() - started)
+        if not speech:
+            self.metrics.chunks_skipped.inc()
+            logger.debug("🔇 Skipped silent chunk (%d/%d skipped so far)",
+                         self.vad.chunks_skipped, self.vad.chunks_seen)
+
+    def on_session_ended(self, data):
+        """The browser disconnected: flush whatever its streaming session still holds."""
+        session_id = data['browserSocketId']
+        session = self.sessions.pop(session_id)
+        if self.backend.streaming:
+            # Queued behind the session's last chunks, so they are transcribed first
+            language_mode = session.language_mode if session else 'malay-english'
+            self.job_queue.put(marker_job(session_id, language_mode, END))
+
+    def send_result(self, job, raw_transcription, is_final=True):
+        """Post-process and emit one transcription (partial when not is_final)."""
+        stage = self.metrics.stage
+        try:
+            logger.debug("📝 %s transcription for %s: %s", "Final" if is_final else "Partial",
+                         job.session_id, raw_transcription)
+            if is_final and not raw_transcription and not self.emit_empty:
+                return
+
+            started = time.monotonic()
+            processed_transcription = enhance_transcription(
+                raw_transcription, job.language_mode, self.highlight_languages
+            )
+            emitting = time.monotonic()
+            stage['postprocess'].observe(emitting - started)
+
+            self.sio.emit('transcription_from_python', {
+                'transcript': processed_transcription,
+                'browserSocketId': job.session_id,
+                'raw_transcript': raw_transcription,
+                'is_final': is_final
+            })
+            stage['emit'].observe(time.monotonic() - emitting)
+            if is_final:
+                self.metrics.final_results.inc()
+            else:
+                self.metrics.partial_results.inc()
+
+        except Exception as e:
+            logger.exception("Could not send transcription to %s", job.session_id)
+            self.send_error(job.session_id, e)
+
+    def save_chunk(self, job, results):
+        """Persist a transcribed chunk once, with the final text it produced (if any)."""
+        if not len(job.audio):
+            return # Flushes carry no audio of their own
+        started = time.monotonic()
+        raw_transcription = ' '.join(text for text, is_final in results if is_final and text)
+        processed_transcription = None
+        if self.highlight_languages:
+            processed_transcription = enhance_transcription(raw_transcription, job.language_mode, True)
+        # Saved off the hot path by the writer thread
+        record = ChunkRecord(job.session_id, job.audio, job.sample_rate, raw_transcription, processed_transcription)
+        if not self.writer.submit(record):
+            logger.warning("⚠️ Storage queue full, chunk from %s not saved.", job.session_id)
+        self.metrics.stage['persist'].observe(time.monotonic() - started)
+
+    def send_error(self, browser_socket_id, error, code=None):
+        """Report an error to the browser; `code` (e.g. RESTART_RECORDING) tells the page how to react."""
+        self.metrics.errors.inc()
+        logger.error("❌ An error occurred during transcription: %s", error)
+        payload = {'browserSocketId': browser_socket_id, 'error': str(error)}
+        if code:
+            payload['code'] = code
+        try:
+            self.sio.emit('transcription_error', payload)
+        except Exception as e:
+            logger.error("❌ Could not report error to Node.js server: %s", e)
+
+    # --- Main Loop ---
+    def run(self):
+        # Add a quick check to make sure the key loaded
+        if not self.secret_key:
+            raise ValueError("PYTHON_SECRET_KEY not found in .env file. Please create it.")
+
+        # The model boots in the background while the socket connects; the
+        # relay only learns about this worker once it is warm
+        threading.Thread(target=self._boot, name="boot", daemon=True).start()
+        if self.metrics_port:
+            self.metrics.registry.serve(self.metrics_port)
+            logger.info("📈 Metrics at http://127.0.0.1:%d/metrics", self.metrics_port)
+
+        while not self._stopping.is_set():
+            try:
+                logger.info("Attempting to connect to Node.js server at %s...", self.server_url)
+                self.sio.connect(self.server_url, transports=['websocket'])
+                self.sio.wait()
+            except socketio.exceptions.ConnectionError as e:
+                logger.warning("Connection failed: %s. Retrying in 5 seconds...", e)
+                self._stopping.wait(5)
+            except KeyboardInterrupt:
+                logger.info("👋 Shutting down...")
+                break
+
+        self._stopping.set()
+        if self.sio.connected:
+            self.sio.disconnect()
+        self.runtime.stop()
+        self.backend.close()
+        logger.info("Saving queued audio/transcriptions...")
+        self.writer.close()
+        if self.cache is not None:
+            self.cache.close()
+        self.metrics.registry.close()
+        logger.info("Queue stats: %s", self.stats())
+        if self._boot_error:
+            raise RuntimeError(f"{self.backend.describe()} failed to start") from self._boot_error
+
+    def _boot(self):
+        """Import, load and warm up the model, then announce readiness."""
+        try:
+            logger.info("Loading %s...", self.backend.describe())
+            self.boot_timings = self.backend.boot(
+                warm_up_passes=self.warm_up_passes,
+                warm_up_seconds=self.warm_up_seconds,
+                batch_size=self.runtime.max_batch
+            )
+        except Exception as e:
+            logger.exception("❌ Could not load %s", self.backend.describe())
+            self._boot_error = e
+            self._stopping.set()
+            self.sio.disconnect()
+            return
+
+        timings = self.boot_timings
+        runtime_info = self.backend.runtime_info()
+        logger.info("✅ %s ready%s in %.2f s (import %.2f s, load %.2f s, warm-up %.2f s for %d x %.1f s passes)",
+                    self.backend.describe(), f" on {runtime_info}" if runtime_info else "",
+                    sum(timings.values()), timings['import'], timings['load'], timings['warm_up'],
+                    self.warm_up_passes, self.warm_up_seconds)
+        if self.warm_up_passes:
+            # Each pass is one single chunk, plus one full batch when batching
+            batch = self.runtime.max_batch
+            audio_seconds = self.warm_up_passes * self.warm_up_seconds * (1 + (batch if batch > 1 else 0))
+            logger.info("Warm-up speed: RTF %.3f", timings['warm_up'] / audio_seconds)
+        if self.backend.config:
+            logger.info("Precision: %s", self.backend.config.tradeoff())
+
+        self.writer.start()
+        self.runtime.start()
+        threading.Thread(target=self._housekeeping, name="housekeeping", daemon=True).start()
+        if self.heartbeat_interval > 0:
+            threading.Thread(target=self._heartbeat_loop, name="heartbeat", daemon=True).start()
+        logger.info("Inference threads: %d, queue: %d chunks (%s)",
+                    self.runtime.num_workers, self.job_queue.maxsize, self.job_queue.overflow)
+        if self.runtime.max_batch > 1:
+            logger.info("Micro-batching up to %d chunks per %.0f ms window.",
+                        self.runtime.max_batch, self.runtime.window * 1000)
+        if self.cache is not None:
+            logger.info("Result cache: %d entries%s", self.cache.max_entries,
+                        " (persistent)" if self.cache.persistent else "")
+
+        self._ready.set()
+        self.identify()
+
+    def _housekeeping(self):
+        """Evict idle sessions, and flush streaming backend sessions that have gone quiet."""
+        while not self._stopping.wait(HOUSEKEEPING_INTERVAL):
+            now = time.monotonic()
+            for session_id, session in self.sessions.evict_idle(now):
+                # Pushed out by the session cap while still sending: its stream can't continue
+                if session.decoder is not None and now - session.last_active < SESSION_IDLE_TIMEOUT:
+                    self.send_error(session_id, "Worker is at its session limit; please restart recording",
+                                    RESTART_RECORDING)
+            try:
+                for session_id, language_mode, results in self.backend.evict_idle():
+                    for text, is_final in results:
+                        self.send_result(marker_job(session_id, language_mode), text, is_final)
+            except Exception:
+                logger.exception("❌ Error evicting idle sessions")
+
+    def heartbeat(self):
+        """Current load and capacity, as sent in 'worker_heartbeat'."""
+        recent = self.metrics.recent.snapshot()
+        return {
+            'group': self.group,
+            'model': self.backend.describe(),
+            'device': self.backend.runtime_info(),
+            'queue_depth': self.job_queue.depth,
+            'queue_maxsize': self.job_queue.maxsize,
+            'in_flight': self.runtime.in_flight,
+            'inference_threads': self.runtime.num_workers,
+            'sessions': len(self.sessions),
+            # Over the last minute: model time per second of audio, and queue wait
+            'rtf': recent['rtf'],
+            'avg_wait_ms': recent['avg_wait_ms'],
+            'chunks': recent['chunks'],
+            'dropped': self.job_queue.dropped + self.job_queue.rejected,
+            'interval': self.heartbeat_interval,
+            'sent_at': time.time(),
+        }
+
+    def _heartbeat_loop(self):
+        """Tell the relay how loaded this worker is, so it can alert and shed load."""
+        while True:
+            # Only once identified; the relay ignores heartbeats from unknown sockets
+            if self._ready.is_set() and self.sio.connected:
+                try:
+                    self.sio.emit('worker_heartbeat', self.heartbeat())
+                except Exception as e:
+                    logger.warning("Could not send heartbeat: %s", e)
+            if self._stopping.wait(self.heartbeat_interval):
+                return
+
+    def stats(self):
+        """Queue depth, wait times and overflow counters for this worker."""
+        stats = self.job_queue.stats()
+        stats['in_flight'] = self.runtime.in_flight
+        if self.vad:
+            stats['vad'] = self.vad.stats()
+        stats['storage'] = self.writer.stats()
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        backend_stats = self.backend.stats()
+        if backend_stats:
+            stats['backend'] = backend_stats
+        return stats
+
+
+def run_worker(backend, group='whisper', log_level=LOG_LEVEL, **kwargs):
+    """Entry point used by the transcriber-*.py scripts."""
+    configure_logging(log_level)
+    TranscriptionWorker(backend, group=group, **kwargs).run()
+
+
+# --- Main Entry Point ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a transcription worker with any ASR backend.")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='whisper')
+    parser.add_argument('--model', help="Model name, size or path for the backend")
+    parser.add_argument('--device', help="Torch device (auto, cuda, cpu) for backends that take one")
+    parser.add_argument('--precision', choices=('auto',) + PRECISIONS,
+                        help="float16/bfloat16/int8/float32 (auto: float16 on GPU, int8 on CPU)")
+    parser.add_argument('--cpu-threads', type=int, help="Torch intra-op threads on CPU (default: all cores)")
+    parser.add_argument('--group', default='whisper', help="Relay group to join (whisper, wave2vec)")
+    parser.add_argument('--upload-dir', default="audio_uploads")
+    parser.add_argument('--highlight', action='store_true', help="Wrap output in Malay/English HTML spans")
+    parser.add_argument('--streaming', action='store_true', help="Rolling-context streaming (whisper backend)")
+    parser.add_argument('--cascade-to', metavar='MODEL',
+                        help="Redo low-confidence chunks with this larger model (whisper backend, e.g. large)")
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--batch-window-ms', type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument('--queue-maxsize', type=int, default=QUEUE_MAXSIZE)
+    parser.add_argument('--queue-overflow', choices=OVERFLOW_POLICIES, default=QUEUE_OVERFLOW)
+    parser.add_argument('--inference-threads', type=int, default=INFERENCE_THREADS)
+    parser.add_argument('--no-vad', dest='vad', action='store_false', default=VAD_ENABLED)
+    parser.add_argument('--storage-backend', choices=('archive', 'files'), default=STORAGE_BACKEND)
+    parser.add_argument('--storage-flush-interval', type=float, default=STORAGE_FLUSH_INTERVAL)
+    parser.add_argument('--storage-fsync', choices=FSYNC_POLICIES, default=STORAGE_FSYNC)
+    parser.add_argument('--cache-size', type=int, default=RESULT_CACHE_SIZE, help="Result cache entries (0 disables)")
+    parser.add_argument('--cache-dir', default=RESULT_CACHE_DIR, help="Persist cached results in this directory")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, help="Serve /metrics on this port (0 disables)")
+    parser.add_argument('--warm-up-passes', type=int, default=WARMUP_PASSES)
+    parser.add_argument('--warm-up-seconds', type=float, default=WARMUP_SECONDS)
+    parser.add_argument('--replicas', default=REPLICAS, help="Model processes behind this connection (a count or 'auto')")
+    parser.add_argument('--replica-threads', type=int, default=REPLICA_THREADS,
+                        help="Torch threads per replica (default: cores / replicas)")
+    parser.add_argument('--heartbeat-interval', type=float, default=HEARTBEAT_INTERVAL,
+                        help="Seconds between load heartbeats to the relay (0 disables)")
+    parser.add_argument('--log-level', default=LOG_LEVEL, choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'))
+    args = parser.parse_args()
+    if (args.device or args.precision) and args.backend not in DEVICE_BACKENDS:
+        parser.error(f"--device/--precision apply only to: {', '.join(DEVICE_BACKENDS)}")
+    if args.streaming and args.backend != 'whisper':
+        parser.error("--streaming applies only to the whisper backend")
+
+    backend_kwargs = {}
+    if args.model:
+        backend_kwargs['model_name'] = args.model
+    if args.device:
+        backend_kwargs['device'] = args.device
+    if args.precision:
+        backend_kwargs['precision'] = args.precision
+    if args.cpu_threads:
+        devices.CPU_THREADS = args.cpu_threads
+    if args.streaming:
+        backend_kwargs['streaming'] = True
+
+    backend = create_backend(args.backend, **backend_kwargs)
+    if args.cascade_to:
+        # Thresholds come from CASCADE_MIN_LOGPROB / CASCADE_MAX_COMPRESSION / CASCADE_NO_SPEECH
+        try:
+            backend = CascadeBackend(backend, create_backend(args.backend, **dict(backend_kwargs, model_name=args.cascade_to)))
+        except ValueError as e:
+            parser.error(f"--cascade-to: {e}")
+
+    run_worker(
+        backend,
+        group=args.group,
+        upload_dir=args.upload_dir,
+        highlight_languages=args.highlight,
+        max_batch_size=args.max_batch_size,
+        batch_window_ms=args.batch_window_ms,
+        queue_maxsize=args.queue_maxsize,
+        queue_overflow=args.queue_overflow,
+        inference_threads=args.inference_threads,
+        vad=args.vad,
+        storage_backend=args.storage_backend,
+        storage_flush_interval=args.storage_flush_interval,
+        storage_fsync=args.storage_fsync,
+        cache_size=args.cache_size,
+        cache_dir=args.cache_dir,
+        metrics_port=args.metrics_port,
+        warm_up_passes=args.warm_up_passes,
+        warm_up_seconds=args.warm_up_seconds,
+        replicas=args.replicas,
+        replica_threads=args.replica_threads,
+        heartbeat_interval=args.heartbeat_interval,
+        log_level=args.log_level
+    )
@@ -0,0 +1,533 @@
+import time
+import logging
+import argparse
+import threading
+from collections import deque
+
+import numpy as np
+
+from batching import AUDIO, SILENCE, END, Job, group_by_language
+
+logger = logging.getLogger(__name__)
+
+# --- Overflow Policies ---
+# What to do with a new chunk when the job queue is full:
+#   drop_oldest - discard the chunk that has waited longest (favours fresh audio)
+#   coalesce    - append the audio to a queued chunk from the same session,
+#                 rejecting only when that session has nothing queued
+#   reject      - refuse the new chunk (the worker reports transcription_error)
+DROP_OLDEST = 'drop_oldest'
+COALESCE = 'coalesce'
+REJECT = 'reject'
+OVERFLOW_POLICIES = (DROP_OLDEST, COALESCE, REJECT)
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.put() when a chunk is rejected."""
+
+
+class JobQueue:
+    """
+    Bounded, thread-safe queue of Jobs between the socket handler and inference.
+
+    Also keeps the counters needed to see backpressure: current depth, how
+    long jobs waited before inference, and how many were dropped, coalesced
+    or rejected.
+    """
+
+    def __init__(self, maxsize=32, overflow=DROP_OLDEST):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'. Choose from: {', '.join(OVERFLOW_POLICIES)}")
+        self.maxsize = maxsize
+        self.overflow = overflow
+
+        self._jobs = deque()
+        self._held = 0 # jobs that count against maxsize (all but END markers)
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.dropped = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.dequeued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def __len__(self):
+        return len(self._jobs)
+
+    @property
+    def depth(self):
+        """Chunks counted against maxsize (queued END markers are not)."""
+        return self._held
+
+    def put(self, job):
+        """
+        Queue a job. Returns the list of jobs dropped to make room (usually
+        empty); raises QueueFull if the job itself was rejected.
+        """
+        dropped = []
+        with self._cond:
+            if self._closed:
+                raise QueueFull("Worker is shutting down")
+
+            # Every job holding a chunk counts against the bound (SILENCE markers
+            # keep theirs for the archive); END markers carry no audio and must
+            # not be lost
+            if job.kind != END and self._held >= self.maxsize:
+                oldest = next((queued for queued in self._jobs if queued.kind != END), None)
+                if self.overflow == DROP_OLDEST and oldest is not None:
+                    self._jobs.remove(oldest)
+                    self._held -= 1
+                    dropped.append(oldest)
+                    self.dropped += 1
+                elif self.overflow == COALESCE and self._coalesce(job):
+                    return dropped
+                else:
+                    self.rejected += 1
+                    raise QueueFull(f"Worker queue is full ({self.maxsize} chunks waiting)")
+
+            self._jobs.append(job)
+            if job.kind != END:
+                self._held += 1
+            self._cond.notify()
+        return dropped
+
+    def _coalesce(self, job):
+        # The session's newest queued job absorbs the audio, unless it is a
+        # marker (or another language): the audio can't jump ahead of it
+        if job.kind != AUDIO:
+            return False
+        for queued in reversed(self._jobs):
+            if queued.session_id != job.session_id:
+                continue
+            if queued.kind != AUDIO or queued.language_mode != job.language_mode:
+                return False
+            queued.audio = np.concatenate((queued.audio, job.audio))
+            self.coalesced += 1
+            return True
+        return False
+
+    def get_batch(self, max_items=1, window=0.0, claim=None):
+        """
+        Block for the first job, then keep gathering until `window` seconds
+        after it was queued or until `max_items` are available. Returns []
+        once the queue is closed and drained. `claim(batch)` runs under the
+        queue lock, so callers can record the dequeue order atomically.
+        """
+        with self._cond:
+            while not self._closed and not self._jobs:
+                self._cond.wait()
+            if not self._jobs:
+                return []
+
+            if max_items > 1 and window > 0:
+                deadline = self._jobs[0].enqueued_at + window
+                while not self._closed and len(self._jobs) < max_items:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            count = min(len(self._jobs), max_items)
+            batch = [self._jobs.popleft() for _ in range(count)]
+            self._held -= sum(1 for job in batch if job.kind != END)
+
+            now = time.monotonic()
+            for job in batch:
+                wait = now - job.enqueued_at
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            self.dequeued += len(batch)
+            if claim is not None:
+                claim(batch)
+        return batch
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            'depth': self.depth,
+            'end_markers': len(self._jobs) - self._held,
+            'maxsize': self.maxsize,
+            'overflow': self.overflow,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+            'avg_wait_ms': (self.total_wait / self.dequeued * 1000) if self.dequeued else 0.0,
+            'max_wait_ms': self.max_wait * 1000,
+        }
+
+
+class SessionOrder:
+    """
+    Releases results in per-session queue order.
+
+    With several inference threads (or replicas) a session's later chunk can
+    finish before an earlier one. Jobs are registered in dequeue order;
+    complete(job, deliver) holds `deliver` until every earlier job of the
+    same session has been delivered. Only one thread delivers for a session
+    at a time, and callbacks run outside the lock.
+    """
+
+    def __init__(self):
+        self._sessions = {} # session_id -> deque of [job, deliver or None]
+        self._slots = {} # id(job) -> its slot
+        self._draining = set()
+        self._lock = threading.Lock()
+
+    def register(self, jobs):
+        with self._lock:
+            for job in jobs:
+                slot = [job, None]
+                self._sessions.setdefault(job.session_id, deque()).append(slot)
+                self._slots[id(job)] = slot
+
+    def complete(self, job, deliver):
+        session_id = job.session_id
+        with self._lock:
+            slot = self._slots.pop(id(job), None)
+            if slot is None: # Not registered: nothing to order against
+                pending = None
+            else:
+                slot[1] = deliver
+                if session_id in self._draining:
+                    return
+                self._draining.add(session_id)
+                pending = self._sessions[session_id]
+        if pending is None:
+            deliver()
+            return
+
+        while True:
+            with self._lock:
+                if not pending or pending[0][1] is None:
+                    self._draining.discard(session_id)
+                    if not pending:
+                        del self._sessions[session_id]
+                    return
+                _, ready = pending.popleft()
+            ready()
+
+    def waiting(self):
+        """Finished results held back behind an earlier, unfinished chunk."""
+        with self._lock:
+            return sum(1 for pending in self._sessions.values() for _, ready in pending if ready)
+
+
+class InferenceRuntime:
+    """
+    Dedicated inference threads fed from a JobQueue.
+
+    The Socket.IO handler only decodes and queues; these threads pull jobs
+    (micro-batched across sessions when max_batch > 1), run the backend, and
+    hand each result back via on_result(job, text, is_final) or
+    on_error(job, exc); on_complete(job, results) then runs once per
+    successful job with all of its results. Streaming backends are fed one
+    chunk at a time and may return several partial/final results per chunk.
+    With more than one thread, results are released in per-session order
+    (SessionOrder).
+
+    Streaming backends always get a single thread: SessionOrder orders
+    delivery, not processing, and their per-session state must see a
+    session's chunks in the order they were queued.
+    """
+
+    def __init__(self, backend, job_queue, on_result, on_error, on_complete=None,
+                 num_workers=1, max_batch=1, window_ms=0, metrics=None):
+        if backend.streaming and num_workers > 1:
+            logger.warning("%s keeps per-session state; using 1 inference thread instead of %d",
+                           backend.describe(), num_workers)
+            num_workers = 1
+        self.backend = backend
+        self.metrics = metrics
+        self.queue = job_queue
+        self.on_result = on_result
+        self.on_error = on_error
+        self.on_complete = on_complete
+        self.num_workers = num_workers
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self.in_flight = 0
+        self.order = SessionOrder() if num_workers > 1 else None
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for index in range(self.num_workers):
+            thread = threading.Thread(target=self._run, name=f"inference-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stop accepting work, finish what is queued, then join the threads."""
+        self.queue.close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _run(self):
+        while True:
+            batch = self.queue.get_batch(self.max_batch, self.window,
+                                         claim=self.order.register if self.order else None)
+            if not batch:
+                return
+            for group in group_by_language(batch):
+                self._run_group(group)
+
+    def _deliver(self, job, results=(), error=None):
+        """Hand a job's results (or error) to the callbacks, in session order."""
+        def deliver():
+            if error is not None:
+                self.on_error(job, error)
+                return
+            for text, is_final in results:
+                self.on_result(job, text, is_final)
+            if self.on_complete is not None:
+                self.on_complete(job, results)
+
+        if self.order is None:
+            deliver()
+        else:
+            self.order.complete(job, deliver)
+
+    def _observe(self, jobs, started):
+        """Record queue wait per job and one inference sample for the call."""
+        if self.metrics is None:
+            return
+        elapsed = time.monotonic() - started
+        self.metrics.observe_inference(
+            elapsed,
+            sum(len(job.audio) / job.sample_rate for job in jobs),
+            [started - job.enqueued_at for job in jobs]
+        )
+
+    def _run_group(self, group):
+        if self.backend.streaming:
+            for job in group:
+                self._run_stream(job)
+            return
+
+        audio_jobs = [job for job in group if job.kind == AUDIO]
+        texts, error = {}, None
+        if audio_jobs:
+            with self._lock:
+                self.in_flight += len(audio_jobs)
+            started = time.monotonic()
+            try:
+                if len(audio_jobs) == 1:
+                    job = audio_jobs[0]
+                    results = [self.backend.transcribe(job.audio, job.language_mode)]
+                else:
+                    results = self.backend.transcribe_batch(
+                        [job.audio for job in audio_jobs],
+                        [job.language_mode for job in audio_jobs]
+                    )
+                texts = dict(zip(map(id, audio_jobs), results))
+            except Exception as e:
+                logger.exception("Inference failed for %d chunk(s)", len(audio_jobs))
+                error = e
+            finally:
+                with self._lock:
+                    self.in_flight -= len(audio_jobs)
+            if error is None:
+                self._observe(audio_jobs, started)
+
+        # Deliver in queue order; a silent chunk is answered with empty text
+        for job in group:
+            if job.kind == SILENCE:
+                self._deliver(job, [('', True)])
+            elif job.kind != AUDIO:
+                self._deliver(job)
+            elif error is not None:
+                self._deliver(job, error=error)
+            else:
+                self._deliver(job, [(texts[id(job)], True)])
+
+    def _run_stream(self, job):
+        if job.kind != AUDIO:
+            # Silence ends the utterance, a disconnect ends the session: flush either way
+            try:
+                self._deliver(job, self.backend.end_session(job.session_id))
+            except Exception as e:
+                logger.exception("Could not flush streaming session %s", job.session_id)
+                self._deliver(job, error=e)
+            return
+
+        with self._lock:
+            self.in_flight += 1
+        started = time.monotonic()
+        try:
+            results = self.backend.transcribe_stream(job.session_id, job.audio, job.language_mode)
+        except Exception as e:
+            logger.exception("Streaming inference failed for session %s", job.session_id)
+            self._deliver(job, error=e)
+            return
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        self._observe((job,), started)
+        self._deliver(job, results)
+
+
+# --- Checks ---
+# The overflow policies and the ordered release are easy to break and hard
+# to see break in production, so they can be checked without a model:
+#
+#   python worker_runtime.py --check
+
+def _job(session_id, kind=AUDIO, samples=4, language_mode='malay-english'):
+    audio = np.zeros(samples, dtype=np.float32) if kind != END else None
+    return Job(session_id, language_mode, audio, 16000, kind)
+
+
+def _drain(job_queue):
+    return job_queue.get_batch(max_items=len(job_queue)) if len(job_queue) else []
+
+
+def check_drop_oldest():
+    job_queue = JobQueue(maxsize=2, overflow=DROP_OLDEST)
+    end, first, second = _job('a', END), _job('a'), _job('b', SILENCE)
+    for job in (end, first, second):
+        assert job_queue.put(job) == []
+    # END markers don't count against the bound and are never the one dropped
+    newest = _job('c')
+    assert job_queue.put(newest) == [first]
+    assert job_queue.depth == 2 and len(job_queue) == 3, job_queue.stats()
+    assert _drain(job_queue) == [end, second, newest]
+    assert job_queue.dropped == 1, job_queue.stats()
+
+
+def check_reject():
+    job_queue = JobQueue(maxsize=1, overflow=REJECT)
+    job_queue.put(_job('a'))
+    for kind in (AUDIO, SILENCE):
+        try:
+            job_queue.put(_job('b', kind))
+        except QueueFull:
+            pass
+        else:
+            raise AssertionError(f"A {kind} job was queued past maxsize")
+    # An END marker is still accepted on a full queue
+    job_queue.put(_job('b', END))
+    assert len(job_queue) == 2 and job_queue.rejected == 2, job_queue.stats()
+
+
+def check_coalesce():
+    job_queue = JobQueue(maxsize=2, overflow=COALESCE)
+    first, other = _job('a', samples=4), _job('b')
+    job_queue.put(first)
+    job_queue.put(other)
+    job_queue.put(_job('a', samples=3))
+    assert len(job_queue) == 2 and len(first.audio) == 7, len(first.audio)
+    # A session with nothing queued has nothing to merge into
+    try:
+        job_queue.put(_job('c'))
+    except QueueFull:
+        pass
+    else:
+        raise AssertionError("A chunk with nothing to coalesce into was queued")
+    assert job_queue.coalesced == 1 and job_queue.rejected == 1, job_queue.stats()
+
+
+def check_coalesce_boundaries():
+    # The new audio may only merge into the session's newest queued job
+    cases = {
+        'silence marker': [_job('a'), _job('a', SILENCE)],
+        'end marker': [_job('a'), _job('b'), _job('a', END)],
+        'language mode': [_job('a'), _job('a', language_mode='english-only')],
+    }
+    for name, queued in cases.items():
+        job_queue = JobQueue(maxsize=len([job for job in queued if job.kind != END]), overflow=COALESCE)
+        for job in queued:
+            job_queue.put(job)
+        for job in (_job('a'), _job('a', SILENCE)):
+            try:
+                job_queue.put(job)
+            except QueueFull:
+                pass
+            else:
+                raise AssertionError(f"A {job.kind} chunk coalesced past a {name}")
+        assert all(len(job.audio) == 4 for job in queued if job.kind != END), name
+        assert job_queue.coalesced == 0, name
+
+
+def check_session_order():
+    job_queue = JobQueue(maxsize=8)
+    order = SessionOrder()
+    jobs = [_job('a'), _job('b'), _job('a'), _job('a')]
+    for job in jobs:
+        job_queue.put(job)
+    assert job_queue.get_batch(max_items=4, claim=order.register) == jobs
+    a1, b1, a2, a3 = jobs
+
+    delivered = []
+    order.complete(a3, lambda: delivered.append('a3'))
+    order.complete(a2, lambda: delivered.append('a2'))
+    assert delivered == [] and order.waiting() == 2, delivered
+    # Another session isn't held back by session a
+    order.complete(b1, lambda: delivered.append('b1'))
+    assert delivered == ['b1'], delivered
+    order.complete(a1, lambda: delivered.append('a1'))
+    assert delivered == ['b1', 'a1', 'a2', 'a3'], delivered
+    assert order.waiting() == 0
+
+    # A job that was never registered is delivered straight away
+    order.complete(_job('a'), lambda: delivered.append('unregistered'))
+    assert delivered[-1] == 'unregistered', delivered
+
+
+def check_session_order_threads():
+    order = SessionOrder()
+    first, second = _job('a'), _job('a')
+    order.register([first, second])
+
+    delivering, release = threading.Event(), threading.Event()
+    delivered = []
+
+    def deliver_first():
+        delivering.set()
+        release.wait(5)
+        delivered.append(('first', threading.current_thread().name))
+
+    thread = threading.Thread(target=order.complete, args=(first, deliver_first), name='drainer')
+    thread.start()
+    assert delivering.wait(5)
+    # The session is being drained elsewhere: completing returns without delivering
+    order.complete(second, lambda: delivered.append(('second', threading.current_thread().name)))
+    assert delivered == [], delivered
+    release.set()
+    thread.join(5)
+    assert delivered == [('first', 'drainer'), ('second', 'drainer')], delivered
+
+
+CHECKS = [check_drop_oldest, check_reject, check_coalesce, check_coalesce_boundaries,
+          check_session_order, check_session_order_threads]
+
+
+def run_checks():
+    failed = 0
+    for check in CHECKS:
+        name = check.__name__[len('check_'):]
+        try:
+            check()
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+        else:
+            print(f"✅ {name}")
+    return failed
+
+
+# --- Main Entry Point ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Job queue and session ordering for the workers.")
+    parser.add_argument('--check', action='store_true', help="Run the overflow/coalescing/ordering checks and exit")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(1 if run_checks() else 0)
+    parser.print_help()
@@ -40,6 +40,24 @@ let backendClients = {
 // Map for rate-limiting browser clients
 const clientRateLimit = new Map();
 
+// Latest 'worker_heartbeat' per group (queue depth, in-flight, rolling RTF, ...)
+const workerHeartbeats = {};
+// A heartbeat older than this many of its own intervals no longer counts
+const HEARTBEAT_STALE_INTERVALS = 3;
+
+function isSaturated(group) {
+    const heartbeat = workerHeartbeats[group];
+    if (!heartbeat) {
+        return false;
+    }
+    const age = Date.now() - heartbeat.receivedAt;
+    if (age > HEARTBEAT_STALE_INTERVALS * (heartbeat.interval || 5) * 1000) {
+        return false;
+    }
+    // Queue full: the chunk would only push out (or be refused behind) older audio
+    return heartbeat.queue_maxsize > 0 && heartbeat.queue_depth >= heartbeat.queue_maxsize;
+}
+
 // --- Admin API for Key Generation ---
 app.use(bodyParser.json());
 app.post('/admin/generate-key', async (req, res) => {
@@ -70,6 +88,19 @@ app.post('/admin/generate-key', async (req, res) => {
     }
 });
 
+// --- Worker Load (heartbeats) for monitoring ---
+app.get('/workers', (req, res) => {
+    if (req.get('X-Admin-Secret') !== ADMIN_SECRET_KEY) {
+        return res.status(403).json({ error: "Invalid admin secret" });
+    }
+    const now = Date.now();
+    const workers = Object.entries(workerHeartbeats).map(([group, heartbeat]) => {
+        const { receivedAt, ...fields } = heartbeat;
+        return { ...fields, group, age_ms: now - receivedAt, saturated: isSaturated(group) };
+    });
+    res.json({ workers });
+});
+
 // Serve the 'public' folder (for index.html, etc.)
 app.use(express.static(path.join(__dirname, 'public')));
 
@@ -118,42 +149,67 @@ io.on('connection', (socket) => {
     }
     clientRateLimit.set(socket.id, now);
 
-    if (!data || !Array.isArray(data.audioFloat32) || !data.language) {
+    // Audio arrives as compressed recorder output (WebM/Opus, decoded by the
+    // workers), a binary PCM frame, or a JSON float list
+    const hasEncoded = data && Buffer.isBuffer(data.audioEncoded);
+    const hasFrame = data && Buffer.isBuffer(data.audioFrame);
+    if (!data || (!hasEncoded && !hasFrame && !Array.isArray(data.audioFloat32)) || !data.language) {
       console.error(`Invalid data from browser: ${socket.id}`);
       socket.emit('transcription_error', { message: "Invalid data format." });
       return;
     }
 
     const payload = {
-      audioFloat32: data.audioFloat32,
       browserSocketId: socket.id,
       language: data.language
     };
+    if (hasEncoded) {
+      payload.audioEncoded = data.audioEncoded;
+      payload.mimeType = typeof data.mimeType === 'string' ? data.mimeType : 'audio/webm';
+    } else if (hasFrame) {
+      payload.audioFrame = data.audioFrame;
+    } else {
+      payload.audioFloat32 = data.audioFloat32;
+      payload.sampleRate = data.sampleRate;
+    }
 
     let transcriptionServiceUsed = false;
+    let group = null;
+    if (payload.language === 'malay-english' || payload.language === 'malay-only') {
+      group = 'whisper';
+    } else if (payload.language === 'english-only') {
+      group = 'wave2vec';
+    }
+
+    // 1. Refuse audio a saturated worker would only drop (before it is stored or numbered)
+    if (group && backendClients[group] && isSaturated(group)) {
+      console.warn(`Worker [${group}] is saturated; refusing audio from ${socket.id}`);
+      socket.emit('transcription_error', { message: "Transcription service is busy, please retry shortly." });
+      return;
+    }
 
-    // 1. Send to 'store' if connected
+    // 2. Number the chunks actually relayed: workers handle them on separate
+    //    threads and use the sequence to restore order, so a gap means a
+    //    chunk was really lost
+    if (backendClients.store || (group && backendClients[group])) {
+      socket.audioSeq = (socket.audioSeq || 0) + 1;
+      payload.seq = socket.audioSeq;
+    }
+
+    // 3. Send to 'store' if connected
     if (backendClients.store) {
       console.log(`Relaying audio to 'store' client...`);
       io.to(backendClients.store).emit('audio_to_python', payload);
     }
 
-    // 2. Route to correct transcription worker
-    if (payload.language === 'malay-english' || payload.language === 'malay-only') {
-      if (backendClients.whisper) {
-        console.log(`Relaying audio to 'whisper' client...`);
-        io.to(backendClients.whisper).emit('audio_to_python', payload);
-        transcriptionServiceUsed = true;
-      }
-    } else if (payload.language === 'english-only') {
-      if (backendClients.wave2vec) {
-        console.log(`Relaying audio to 'wave2vec' client...`);
-        io.to(backendClients.wave2vec).emit('audio_to_python', payload);
-        transcriptionServiceUsed = true;
-      }
+    // 4. Route to correct transcription worker
+    if (group && backendClients[group]) {
+      console.log(`Relaying audio to '${group}' client...`);
+      io.to(backendClients[group]).emit('audio_to_python', payload);
+      transcriptionServiceUsed = true;
     }
 
-    // 3. Handle errors if no worker is connected
+    // 5. Handle errors if no worker is connected
     if (!transcriptionServiceUsed) {
         if (!backendClients.whisper && !backendClients.wave2vec) {
              console.error("❌ No Python transcription clients are connected.");
@@ -174,10 +230,33 @@ io.on('connection', (socket) => {
 
     console.log(`📝 Received transcription from Python for browser: ${data.browserSocketId}`);
     io.to(data.browserSocketId).emit('transcription_result', {
-      transcript: data.transcript
+      transcript: data.transcript,
+      // Streaming workers send partial hypotheses before the final text
+      is_final: data.is_final !== false
     });
   });
 
+  // --- Worker Error Relaying (e.g. chunk rejected by a full worker queue) ---
+  socket.on('transcription_error', (data) => {
+    if (!socket.backendGroup || !data || !data.browserSocketId) {
+        return;
+    }
+    io.to(data.browserSocketId).emit('transcription_error', {
+      message: data.error || "Transcription failed.",
+      // e.g. 'restart_recording': the worker can't continue this WebM stream
+      code: data.code
+    });
+  });
+
+  // --- Worker Heartbeats ---
+  socket.on('worker_heartbeat', (data) => {
+    // Only the socket currently serving the group speaks for it
+    if (!socket.backendGroup || !data || backendClients[socket.backendGroup] !== socket.id) {
+        return;
+    }
+    workerHeartbeats[socket.backendGroup] = { ...data, socketId: socket.id, receivedAt: Date.now() };
+  });
+
   // --- Disconnect Handling ---
   socket.on('disconnect', () => {
     console.log('Client disconnected:', socket.id);
@@ -187,6 +266,17 @@ io.on('connection', (socket) => {
     if (socket.backendGroup) { 
       console.log(`Backend client [${socket.backendGroup}] has disconnected.`);
       backendClients[socket.backendGroup] = null;
+      const heartbeat = workerHeartbeats[socket.backendGroup];
+      if (heartbeat && heartbeat.socketId === socket.id) {
+        delete workerHeartbeats[socket.backendGroup];
+      }
+    } else {
+      // A browser left: let workers flush and free its per-session state
+      for (const workerId of Object.values(backendClients)) {
+        if (workerId) {
+          io.to(workerId).emit('session_ended', { browserSocketId: socket.id });
+        }
+      }
     }
   });
 